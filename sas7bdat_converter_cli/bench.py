@@ -0,0 +1,326 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from sas7bdat_converter_cli.reader import SasReader
+
+# The output suffix for each command that can be benchmarked
+BENCH_COMMANDS = {
+    "to-csv": ".csv",
+    "to-excel": ".xlsx",
+    "to-json": ".json",
+    "to-xml": ".xml",
+    "to-parquet": ".parquet",
+    "to-arrow": ".arrow",
+}
+
+# The commands that accept --date-format and --datetime-format
+DATE_FORMAT_COMMANDS = ("to-csv", "to-excel", "to-json", "to-xml")
+
+_XPT_RECORD_LENGTH = 80
+_XPT_HEADER = "HEADER RECORD*******{}HEADER RECORD!!!!!!!{}"
+
+
+@dataclass(frozen=True)
+class DatasetSpec:
+    """The shape of a synthetic dataset."""
+
+    rows: int = 100_000
+    columns: int = 20
+    string_ratio: float = 0.25
+    date_ratio: float = 0.0
+    string_length: int = 16
+    # The number of distinct values in each character column, None makes every value random
+    string_cardinality: int | None = None
+    seed: int = 0
+
+    @property
+    def name(self) -> str:
+        name = (
+            f"synthetic_{self.rows}x{self.columns}"
+            f"_s{round(self.string_ratio * 100)}_d{round(self.date_ratio * 100)}"
+        )
+        return name if self.string_cardinality is None else f"{name}_c{self.string_cardinality}"
+
+
+@dataclass(frozen=True)
+class BenchResult:
+    """The timing and memory use of one conversion."""
+
+    dataset: str
+    command: str
+    rows: int
+    input_bytes: int
+    output_bytes: int
+    seconds: float
+    peak_rss_bytes: int | None
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.input_bytes / 1_000_000 / self.seconds if self.seconds else 0.0
+
+
+def synthetic_dataframe(spec: DatasetSpec) -> pd.DataFrame:
+    """Generate a DataFrame with a mix of numeric, character, and date columns."""
+    rng = np.random.default_rng(spec.seed)
+    string_columns = round(spec.columns * spec.string_ratio)
+    date_columns = min(round(spec.columns * spec.date_ratio), spec.columns - string_columns)
+    letters = np.array(list("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"))
+
+    data: dict[str, np.ndarray] = {}
+    for i in range(spec.columns):
+        name = f"C{i:05d}"
+        if i < string_columns:
+            count = spec.rows if spec.string_cardinality is None else spec.string_cardinality
+            lengths = rng.integers(1, spec.string_length + 1, count)
+            chars = rng.choice(letters, (count, spec.string_length))
+            values = np.array(
+                ["".join(row[:length]) for row, length in zip(chars, lengths)], dtype=object
+            )
+            data[name] = (
+                values
+                if spec.string_cardinality is None
+                else values[rng.integers(0, count, spec.rows)]
+            )
+        elif i < string_columns + date_columns:
+            data[name] = rng.integers(-3_653, 25_000, spec.rows).astype(np.float64)
+        else:
+            values = rng.normal(1_000, 250, spec.rows).round(rng.integers(0, 6))
+            values[rng.random(spec.rows) < 0.02] = np.nan
+            data[name] = values
+
+    df = pd.DataFrame(data)
+    df.attrs["date_columns"] = list(df.columns[string_columns : string_columns + date_columns])
+    return df
+
+
+def write_xpt(
+    df: pd.DataFrame, file_path: Path, dataset_name: str = "BENCH", version: int = 5
+) -> None:
+    """Write a DataFrame to a SAS XPORT version 5 or 8 file.
+
+    Object columns are written as character variables and all other columns as numeric
+    variables. Columns listed in `df.attrs["date_columns"]` are given the DATE9. format and
+    `df.attrs["labels"]` can map columns to labels. Version 5 cuts names to 8 characters and
+    labels to 40, version 8 keeps names up to 32 characters and labels of any length.
+
+    XPORT has no row count, so readers treat blank 8 byte words in the last record as padding
+    when a row is 80 bytes or shorter. Keep synthetic rows longer than that.
+    """
+    if version not in (5, 8):
+        raise ValueError(f"Unsupported XPORT version: {version}")
+    date_columns = set(df.attrs.get("date_columns", []))
+    labels: dict[str, str] = df.attrs.get("labels", {})
+    names = (
+        ("LIBRARY ", "MEMBER  ", "DSCRPTR ", "NAMESTR ", "OBS     ")
+        if version == 5
+        else ("LIBV8   ", "MEMBV8  ", "DSCPTV8 ", "NAMSTV8 ", "OBSV8   ")
+    )
+    now = datetime.now().strftime("%d%b%y:%H:%M:%S").upper()
+    variables: list[tuple[str, int, int, int, np.ndarray]] = []
+    position = 0
+    for name in df.columns:
+        if df[name].dtype == object:
+            encoded = df[name].fillna("").astype(str).str.encode("latin-1")
+            length = max(int(encoded.str.len().max() or 0), 1)
+            variables.append((name, 2, length, position, encoded.to_numpy(dtype=f"S{length}")))
+        else:
+            values = _ieee_to_ibm(df[name].to_numpy(dtype=np.float64))
+            variables.append((name, 1, 8, position, values))
+        position += variables[-1][2]
+
+    with open(file_path, "wb") as f:
+        f.write(_xpt_records(_XPT_HEADER.format(names[0], "0" * 30 + "  ")))
+        f.write(
+            _xpt_records(f"{'SAS':<8}{'SAS':<8}{'SASLIB':<8}{'9.4':<8}{'bench':<8}{'':24}{now}")
+        )
+        f.write(_xpt_records(now))
+        f.write(_xpt_records(_XPT_HEADER.format(names[1], "0" * 17 + "16" + "0" * 8 + "140  ")))
+        f.write(_xpt_records(_XPT_HEADER.format(names[2], "0" * 30 + "  ")))
+        member_name = f"{dataset_name[:8]:<8}" if version == 5 else f"{dataset_name[:32]:<32}"
+        padding = " " * 24 if version == 5 else ""
+        f.write(
+            _xpt_records(
+                f"{'SAS':<8}{member_name}{'SASDATA':<8}{'9.4':<8}{'bench':<8}{padding}{now}"
+            )
+        )
+        f.write(_xpt_records(f"{now}{'':16}{'':40}{'':8}"))
+        count = (
+            f"{len(variables):04d}" + "0" * 20
+            if version == 5
+            else f"{len(variables):06d}" + "0" * 18
+        )
+        f.write(_xpt_records(_XPT_HEADER.format(names[3], "000000" + count + "  ")))
+
+        namestrs = bytearray()
+        long_labels = bytearray()
+        long_label_count = 0
+        for number, (name, var_type, length, var_position, _) in enumerate(variables, start=1):
+            var_format = "DATE" if name in date_columns else ""
+            var_format_length = 9 if var_format else 0
+            label = labels.get(name, "")
+            namestrs += np.array([var_type, 0, length, number], dtype=">i2").tobytes()
+            namestrs += f"{name[:8]:<8}{label[:40]:<40}{var_format:<8}".encode("latin-1")
+            namestrs += np.array([var_format_length, 0, 0], dtype=">i2").tobytes()
+            namestrs += b"\x00\x00" + b" " * 8 + np.array([0, 0], dtype=">i2").tobytes()
+            namestrs += np.array([var_position], dtype=">i4").tobytes()
+            if version == 5:
+                namestrs += b"\x00" * 52
+            else:
+                namestrs += f"{name[:32]:<32}".encode("latin-1")
+                namestrs += np.array([len(label)], dtype=">i2").tobytes() + b"\x00" * 18
+                if len(label) > 40:
+                    long_label_count += 1
+                    long_labels += np.array([number, len(name), len(label)], ">i2").tobytes()
+                    long_labels += (name + label).encode("latin-1")
+        f.write(_pad(bytes(namestrs), b"\x00"))
+        if long_labels:
+            f.write(_xpt_records(_XPT_HEADER.format("LABELV8 ", f"{long_label_count:<32}")))
+            f.write(_pad(bytes(long_labels), b" "))
+
+        f.write(_xpt_records(_XPT_HEADER.format(names[4], "0" * 30 + "  ")))
+        fields = np.zeros(len(df), dtype=[(f"f{i}", f"S{x[2]}") for i, x in enumerate(variables)])
+        for i, (_, var_type, length, _, values) in enumerate(variables):
+            if var_type == 2:
+                fields[f"f{i}"] = np.char.ljust(values, length)
+            else:
+                fields[f"f{i}"] = values
+        records = fields.tobytes()
+        f.write(_pad(records, b" "))
+
+
+def _ieee_to_ibm(values: np.ndarray) -> np.ndarray:
+    """Convert IEEE doubles to 8 byte IBM 370 hex floats, missing values become SAS missing."""
+    missing = np.isnan(values)
+    zero = values == 0
+    fraction, exponent = np.frexp(np.where(missing | zero, 1.0, np.abs(values)))
+    hex_exponent = -(-exponent // 4)
+    mantissa = np.ldexp(fraction, 56 + exponent - 4 * hex_exponent).astype(np.uint64)
+    sign = np.where(values < 0, 0x80, 0).astype(np.uint64)
+    result = (sign | (hex_exponent + 64).astype(np.uint64)) << np.uint64(56) | mantissa
+    result[zero] = 0
+    result[missing] = np.uint64(ord(".")) << np.uint64(56)
+    return result.astype(">u8").view("S8")
+
+
+def _xpt_records(text: str) -> bytes:
+    return _pad(text.encode("ascii"), b" ")
+
+
+def _pad(data: bytes, fill: bytes) -> bytes:
+    remainder = len(data) % _XPT_RECORD_LENGTH
+    return data + fill * (_XPT_RECORD_LENGTH - remainder) if remainder else data
+
+
+def write_synthetic_xpt(spec: DatasetSpec, file_path: Path) -> None:
+    """Generate a synthetic dataset and write it to an xpt file in another process.
+
+    On Linux a process starts with the peak RSS of the one that started it, so building the
+    dataset in this process would raise every peak RSS measured by run_command.
+    """
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        executor.submit(_write_synthetic_xpt, spec, file_path).result()
+
+
+def _write_synthetic_xpt(spec: DatasetSpec, file_path: Path) -> None:
+    write_xpt(synthetic_dataframe(spec), file_path)
+
+
+def run_command(
+    command: str, source: Path, work_dir: Path, options: Sequence[str] = ()
+) -> BenchResult:
+    """Time one CLI command in a new process and record its peak memory use.
+
+    Running each conversion in its own process includes the interpreter and import start up in
+    the time, the same as calling the CLI, and gives a peak RSS for just that conversion.
+    `options` are passed to the command after the file paths.
+    """
+    export_file = work_dir / f"{source.stem}{BENCH_COMMANDS[command]}"
+    args = [sys.executable, "-m", "sas7bdat_converter_cli", command, str(source), str(export_file)]
+    args += options
+    with tempfile.TemporaryFile() as stderr:
+        start = time.perf_counter()
+        process = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=stderr)
+        peak_rss: int | None = None
+        if hasattr(os, "wait4"):
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            # ru_maxrss is in bytes on macOS and kilobytes everywhere else
+            peak_rss = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+        else:  # pragma: no cover
+            process.wait()
+        seconds = time.perf_counter() - start
+
+        if process.returncode != 0:
+            stderr.seek(0)
+            message = stderr.read().decode(errors="replace").strip().splitlines()
+            raise RuntimeError(
+                f"{command} failed for {source.name}: {message[-1] if message else ''}"
+            )
+
+    with SasReader(source) as reader:
+        rows = reader.row_count
+
+    result = BenchResult(
+        dataset=source.name,
+        command=command,
+        rows=rows,
+        input_bytes=source.stat().st_size,
+        output_bytes=export_file.stat().st_size,
+        seconds=seconds,
+        peak_rss_bytes=peak_rss,
+    )
+    export_file.unlink()
+
+    return result
+
+
+def run_bench(
+    sources: list[Path],
+    commands: list[str],
+    work_dir: Path,
+    *,
+    repeat: int = 1,
+    date_format: str | None = None,
+    datetime_format: str | None = None,
+    dictionary_encode: bool = False,
+) -> list[BenchResult]:
+    """Run every command against every source file, keeping the fastest of `repeat` runs.
+
+    The date and datetime formats are passed to the commands that support them. With
+    `dictionary_encode` each command is also run with --dictionary-encode, reported as a
+    separate command, to compare the time and memory use of both.
+    """
+    date_options = []
+    if date_format:
+        date_options += ["--date-format", date_format]
+    if datetime_format:
+        date_options += ["--datetime-format", datetime_format]
+
+    variants = [[], ["--dictionary-encode"]] if dictionary_encode else [[]]
+    results = []
+    for source in sources:
+        for command in commands:
+            for variant in variants:
+                options = (date_options if command in DATE_FORMAT_COMMANDS else []) + variant
+                runs = [run_command(command, source, work_dir, options) for _ in range(repeat)]
+                fastest = min(runs, key=lambda x: x.seconds)
+                results.append(replace(fastest, command=" ".join([command, *variant])))
+
+    return results
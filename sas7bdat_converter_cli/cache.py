@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import uuid
+from dataclasses import dataclass
+from functools import cache
+from importlib import metadata
+from pathlib import Path
+from typing import Any
+
+from sas7bdat_converter_cli.manifest import options_dict
+from sas7bdat_converter_cli.options import ConversionOptions
+
+DEFAULT_CACHE_MAX_BYTES = 10 * 1024**3
+
+# Changed when the output written for the same source and options changes
+_CACHE_FORMAT = 1
+
+# The packages whose versions are part of the key, a new version can write different output
+_KEY_PACKAGES = ("sas7bdat-converter-cli", "sas7bdat-converter", "pandas", "pyarrow", "openpyxl")
+
+# Options that only change how the source is read, the file written is the same without them
+_READ_OPTIONS = ("memory_map", "buffer_chunks", "input_format")
+
+_SIZE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+# The Linux ioctl that makes a file share the blocks of another until either is changed
+_FICLONE = 0x40049409
+
+
+@dataclass
+class CacheEntry:
+    """A converted file stored in the cache, and what's needed to report its metrics."""
+
+    key: str
+    file_type: str
+    size: int
+    rows: int | None
+    columns: int | None
+    last_used: float
+
+
+@dataclass
+class CacheStats:
+    entries: int
+    size_bytes: int
+    max_bytes: int
+
+
+class ConversionCache:
+    """A directory of converted files shared by every run that uses it.
+
+    Entries are keyed by the sha256 of the source's contents, the output file type, the
+    conversion options, and the versions of the packages that write the output, so the same
+    dataset converted from any path is a hit. A hit is placed at the export file as a reflink
+    where the file system supports it, otherwise as a hard link or, across file systems, a copy.
+    The stored files are read only because a hard linked export file shares them.
+
+    Each entry is a data file and a json file with its details, whose modification time is when
+    the entry was last used. After a file is added the least recently used entries are removed
+    until the cache fits in `max_bytes`.
+
+    Several processes can use the cache at once. Files are written under a temporary name and
+    renamed into place, and an entry removed by another process while it's being read is a miss.
+    """
+
+    def __init__(self, path: Path, max_bytes: int = DEFAULT_CACHE_MAX_BYTES) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self._entries_dir = path / "entries"
+        self._temp_dir = path / "tmp"
+
+    def key(self, source_sha256: str, file_type: str, options: ConversionOptions) -> str:
+        data = {
+            "format": _CACHE_FORMAT,
+            "source": source_sha256,
+            "file_type": file_type,
+            "options": {
+                name: value
+                for name, value in options_dict(options).items()
+                if name not in _READ_OPTIONS
+            },
+            "versions": _package_versions(),
+        }
+        return hashlib.sha256(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get(self, key: str, export_file: Path) -> CacheEntry | None:
+        """Place the file for a key at the export file, returns None if it isn't cached."""
+        data_file, info_file = self._files(key)
+        temp_file = export_file.with_name(f".{export_file.name}.{uuid.uuid4().hex}.cache")
+        try:
+            entry = _read_entry(info_file)
+            if data_file.stat().st_size != entry.size:
+                return None
+
+            _clone(data_file, temp_file, link=True)
+            os.replace(temp_file, export_file)
+            os.utime(info_file)
+        except (OSError, ValueError, KeyError, TypeError):
+            temp_file.unlink(missing_ok=True)
+            return None
+
+        return entry
+
+    def put(
+        self,
+        key: str,
+        export_file: Path,
+        file_type: str,
+        rows: int | None = None,
+        columns: int | None = None,
+    ) -> None:
+        """Add a copy of a converted file to the cache, then remove entries until it fits.
+
+        Failing to add the file, for example because the disk is full, doesn't affect the export
+        file.
+        """
+        data_file, info_file = self._files(key)
+        try:
+            self._entries_dir.mkdir(parents=True, exist_ok=True)
+            self._temp_dir.mkdir(parents=True, exist_ok=True)
+            size = export_file.stat().st_size
+            # The details are written first, so a data file is never left without them
+            _write_atomic(
+                self._temp_dir,
+                info_file,
+                json.dumps(
+                    {"file_type": file_type, "size": size, "rows": rows, "columns": columns}
+                ).encode("utf-8"),
+            )
+            temp_file = _temp_file(self._temp_dir)
+            try:
+                # Never hard link, the export file would become read only
+                _clone(export_file, temp_file, link=False)
+                temp_file.chmod(0o444)
+                os.replace(temp_file, data_file)
+            finally:
+                temp_file.unlink(missing_ok=True)
+        except OSError:
+            return
+
+        self.evict()
+
+    def entries(self) -> list[CacheEntry]:
+        """The entries in the cache, least recently used first."""
+        entries = []
+        for info_file in self._entries_dir.glob("*.json"):
+            try:
+                entries.append(_read_entry(info_file))
+            except (OSError, ValueError, KeyError, TypeError):
+                continue
+
+        return sorted(entries, key=lambda x: x.last_used)
+
+    def evict(self) -> None:
+        """Remove the least recently used entries until the cache fits in its maximum size."""
+        entries = self.entries()
+        size = sum(x.size for x in entries)
+        for entry in entries:
+            if size <= self.max_bytes:
+                break
+            self._remove(entry.key)
+            size -= entry.size
+
+    def stats(self) -> CacheStats:
+        entries = self.entries()
+        return CacheStats(len(entries), sum(x.size for x in entries), self.max_bytes)
+
+    def clear(self) -> int:
+        """Remove every entry and any files left by interrupted writes, returns the number of
+        entries removed.
+        """
+        entries = self.entries()
+        for entry in entries:
+            self._remove(entry.key)
+        for directory in (self._entries_dir, self._temp_dir):
+            if directory.exists():
+                for file in directory.iterdir():
+                    file.unlink(missing_ok=True)
+
+        return len(entries)
+
+    def _files(self, key: str) -> tuple[Path, Path]:
+        return self._entries_dir / key, self._entries_dir / f"{key}.json"
+
+    def _remove(self, key: str) -> None:
+        data_file, info_file = self._files(key)
+        data_file.unlink(missing_ok=True)
+        info_file.unlink(missing_ok=True)
+
+
+def default_cache_dir() -> Path:
+    """The cache directory used when none is given, under XDG_CACHE_HOME or ~/.cache."""
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "sas7bdat-converter"
+
+
+def parse_size(size: str) -> int:
+    """Parse a number of bytes with an optional K, M, G, or T suffix, such as 500M."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*", size, re.IGNORECASE)
+    if match is None:
+        raise ValueError(f"Invalid size: {size}, expected a number like 500M or 10G")
+    return int(float(match[1]) * _SIZE_UNITS[match[2].upper()])
+
+
+def _read_entry(info_file: Path) -> CacheEntry:
+    with open(info_file) as f:
+        data: dict[str, Any] = json.load(f)
+    return CacheEntry(
+        key=info_file.stem,
+        file_type=data["file_type"],
+        size=data["size"],
+        rows=data["rows"],
+        columns=data["columns"],
+        last_used=info_file.stat().st_mtime,
+    )
+
+
+def _write_atomic(temp_dir: Path, file_path: Path, data: bytes) -> None:
+    temp_file = _temp_file(temp_dir)
+    try:
+        temp_file.write_bytes(data)
+        os.replace(temp_file, file_path)
+    finally:
+        temp_file.unlink(missing_ok=True)
+
+
+def _temp_file(temp_dir: Path) -> Path:
+    # Unique across processes and threads so concurrent writes never share a file
+    return temp_dir / uuid.uuid4().hex
+
+
+def _clone(source: Path, target: Path, link: bool) -> None:
+    """Make the target a copy of the source as cheaply as the file system allows."""
+    if _reflink(source, target):
+        return
+
+    if link:
+        try:
+            os.link(source, target)
+            return
+        except OSError:
+            pass
+
+    shutil.copyfile(source, target)
+
+
+def _reflink(source: Path, target: Path) -> bool:
+    try:
+        import fcntl
+    except ImportError:
+        return False
+
+    with open(source, "rb") as source_file, open(target, "wb") as target_file:
+        try:
+            fcntl.ioctl(target_file.fileno(), _FICLONE, source_file.fileno())
+            return True
+        except OSError:
+            pass
+
+    target.unlink()
+    return False
+
+
+@cache
+def _package_versions() -> dict[str, str | None]:
+    versions: dict[str, str | None] = {}
+    for name in _KEY_PACKAGES:
+        try:
+            versions[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            versions[name] = None
+
+    return versions
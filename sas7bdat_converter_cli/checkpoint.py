@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+from sas7bdat_converter_cli.manifest import options_dict
+from sas7bdat_converter_cli.options import ConversionOptions
+
+# How often a streaming conversion records how far it has got
+CHECKPOINT_SECONDS = 10.0
+
+
+@dataclass
+class Checkpoint:
+    """How far a streaming conversion got writing its partial export file.
+
+    `rows_read` is the number of rows of the source, before any filtering, whose output is in the
+    first `bytes` bytes of the partial file, and `rows_written` the number of rows that output
+    holds. The source is identified by its size and modification time, hashing a large file
+    each time a conversion resumes would cost more than it saves.
+    """
+
+    source_size: int
+    source_mtime_ns: int
+    file_type: str
+    options: dict[str, Any]
+    rows_read: int = 0
+    rows_written: int = 0
+    bytes: int = 0
+
+    @classmethod
+    def start(cls, source: Path, file_type: str, options: ConversionOptions) -> Checkpoint:
+        stat = source.stat()
+        return cls(stat.st_size, stat.st_mtime_ns, file_type, options_dict(options))
+
+    @classmethod
+    def load(cls, path: Path) -> Checkpoint | None:
+        """Load a checkpoint, returning None if there isn't one or it can't be read."""
+        try:
+            with open(path) as f:
+                return cls(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def continues(self, other: Checkpoint) -> bool:
+        """Check if this checkpoint was saved converting the same source in the same way."""
+        return (
+            self.source_size == other.source_size
+            and self.source_mtime_ns == other.source_mtime_ns
+            and self.file_type == other.file_type
+            and self.options == other.options
+        )
+
+    def save(self, path: Path) -> None:
+        """Write the checkpoint, replacing the previous one in a single step."""
+        temp_path = path.with_name(f"{path.name}.tmp")
+        with open(temp_path, "w") as f:
+            json.dump(asdict(self), f)
+        os.replace(temp_path, path)
+
+
+def checkpoint_file(export_file: Path) -> Path:
+    """The path of the checkpoint kept while converting to an export file, output.csv.checkpoint."""
+    return export_file.with_name(f"{export_file.name}.checkpoint")
@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import bz2
+import gzip
+import io
+import lzma
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import IO, Any, BinaryIO, Union
+
+# The lowest and highest level each codec accepts
+COMPRESSION_LEVELS = {"gzip": (0, 9), "bz2": (1, 9), "xz": (0, 9), "zstd": (1, 22)}
+
+# The codecs that can compress with more than one thread
+THREADED_COMPRESSION = ("zstd",)
+
+# The amount of uncompressed data written to each zstd frame
+_ZSTD_FRAME_BYTES = 4 * 1024 * 1024
+
+Target = Union[Path, BinaryIO, IO[bytes]]
+
+
+def check_compression(
+    compress: str | None, level: int | None = None, threads: int | None = None
+) -> None:
+    """Raise a ValueError if the level or number of threads can't be used with the codec."""
+    if compress is not None and compress not in COMPRESSION_LEVELS:
+        raise ValueError(f"Unsupported compression: {compress}")
+
+    if level is not None:
+        if compress is None:
+            raise ValueError("A compression level can only be used with compression")
+        low, high = COMPRESSION_LEVELS[compress]
+        if not low <= level <= high:
+            raise ValueError(f"The {compress} compression level must be from {low} to {high}")
+
+    if threads is not None and threads > 1 and compress not in THREADED_COMPRESSION:
+        raise ValueError(f"Only {', '.join(THREADED_COMPRESSION)} can compress with threads")
+
+
+def open_output(
+    target: Target,
+    compress: str | None = None,
+    level: int | None = None,
+    threads: int | None = None,
+) -> Any:
+    """Open a file for writing bytes, compressing them as they're written if requested.
+
+    `target` is the path of the file or a binary file to write the compressed stream to, which
+    is left open when the returned file is closed so more streams can be added after it. The
+    codecs are gzip, bz2, xz, and zstd, `level` defaults to the highest level for gzip and bz2
+    and the default of the library for the others.
+    """
+    check_compression(compress, level, threads)
+    if compress is None:
+        if isinstance(target, Path):
+            return open(target, "wb")
+        return _Unclosed(target)
+    if compress == "gzip":
+        level = 9 if level is None else level
+        if isinstance(target, Path):
+            return GzipWriter(open(target, "wb"), level)
+        return GzipWriter(target, level, close_raw=False)
+    if compress == "bz2":
+        return bz2.BZ2File(target, "wb", compresslevel=9 if level is None else level)
+    if compress == "xz":
+        return lzma.LZMAFile(target, "wb", preset=level)
+
+    if isinstance(target, Path):
+        return ZstdWriter(open(target, "wb"), level, threads)
+    return ZstdWriter(target, level, threads, close_raw=False)
+
+
+def open_text_output(
+    target: Target,
+    compress: str | None = None,
+    level: int | None = None,
+    threads: int | None = None,
+) -> io.TextIOWrapper:
+    """Open a file for writing utf-8 text, compressing it as it's written if requested."""
+    return io.TextIOWrapper(
+        open_output(target, compress, level, threads), encoding="utf-8", newline=""
+    )
+
+
+def open_input(file_path: Path, compress: str | None = None) -> Any:
+    """Open a file written by open_output for reading the uncompressed bytes."""
+    if compress is None:
+        return open(file_path, "rb")
+    if compress == "gzip":
+        return gzip.open(file_path, "rb")
+    if compress == "bz2":
+        return bz2.open(file_path, "rb")
+    if compress == "xz":
+        return lzma.open(file_path, "rb")
+    if compress == "zstd":
+        import pyarrow as pa
+
+        # pyarrow's streams can't read lines on their own
+        return io.BufferedReader(pa.input_stream(str(file_path), compression="zstd"))
+
+    raise ValueError(f"Unsupported compression: {compress}")
+
+
+class ZstdWriter(io.BufferedIOBase):
+    """Compresses the bytes written to it as a series of zstd frames.
+
+    Each frame holds up to _ZSTD_FRAME_BYTES of data and is compressed on its own, so with
+    `threads` above 1 the frames are compressed by a pool of threads while more data is written,
+    the same way zstd -T works. The frames are still written in order, and a file made of
+    several frames decompresses as one stream. Flushing ends the current frame so everything
+    written so far can be read back.
+    """
+
+    def __init__(
+        self,
+        raw: IO[bytes],
+        level: int | None = None,
+        threads: int | None = None,
+        close_raw: bool = True,
+    ) -> None:
+        import pyarrow as pa
+
+        super().__init__()
+        self._raw = raw
+        self._close_raw = close_raw
+        self._codec = pa.Codec("zstd", compression_level=level)
+        self._block = bytearray()
+        self._threads = threads or 1
+        self._executor = (
+            ThreadPoolExecutor(max_workers=self._threads) if self._threads > 1 else None
+        )
+        self._frames: deque[Future[bytes]] = deque()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        if self.closed:
+            raise ValueError("write to closed file")
+
+        view = memoryview(data).cast("B")
+        self._block += view
+        while len(self._block) >= _ZSTD_FRAME_BYTES:
+            frame = bytes(self._block[:_ZSTD_FRAME_BYTES])
+            del self._block[:_ZSTD_FRAME_BYTES]
+            self._add_frame(frame)
+        return len(view)
+
+    def flush(self) -> None:
+        if self.closed:
+            return
+
+        if self._block:
+            self._add_frame(bytes(self._block))
+            self._block.clear()
+        while self._frames:
+            self._raw.write(self._frames.popleft().result())
+        self._raw.flush()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+
+        try:
+            # Flushes the last frame
+            super().close()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+            if self._close_raw:
+                self._raw.close()
+
+    def _add_frame(self, data: bytes) -> None:
+        if self._executor is None:
+            self._raw.write(self._codec.compress(data, asbytes=True))
+            return
+
+        # Keep at most two frames per thread in memory waiting to be written
+        while len(self._frames) >= 2 * self._threads:
+            self._raw.write(self._frames.popleft().result())
+        self._frames.append(self._executor.submit(self._codec.compress, data, asbytes=True))
+
+
+class GzipWriter(gzip.GzipFile):
+    """Writes a gzip member with no file name or modification time in its header.
+
+    GzipFile records the name of the file it writes to, which is the partial file a conversion
+    writes before renaming it, so the same data always compresses to the same bytes.
+    """
+
+    def __init__(self, raw: IO[bytes], level: int, close_raw: bool = True) -> None:
+        super().__init__(filename="", mode="wb", compresslevel=level, fileobj=raw, mtime=0)
+        self._raw = raw
+        self._close_raw = close_raw
+
+    def close(self) -> None:
+        try:
+            super().close()
+        finally:
+            if self._close_raw:
+                self._raw.close()
+
+
+class _Unclosed(io.BufferedIOBase):
+    """Writes to a file without closing it when it's closed."""
+
+    def __init__(self, raw: IO[bytes]) -> None:
+        super().__init__()
+        self._raw = raw
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        return self._raw.write(data)
+
+    def flush(self) -> None:
+        if not self.closed:
+            self._raw.flush()
@@ -0,0 +1,706 @@
+from __future__ import annotations
+
+import os
+import time
+from collections.abc import Callable, Sequence
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import ExitStack, closing
+from dataclasses import dataclass, field
+from fnmatch import fnmatch
+from functools import partial
+from pathlib import Path
+from typing import IO
+
+from sas7bdat_converter_cli import checkpoint
+from sas7bdat_converter_cli.cache import ConversionCache
+from sas7bdat_converter_cli.checkpoint import Checkpoint, checkpoint_file
+from sas7bdat_converter_cli.compression import check_compression
+from sas7bdat_converter_cli.manifest import Fingerprint, Manifest, hash_file
+from sas7bdat_converter_cli.metrics import FileMetrics, MetricsLog, peak_memory, reset_peak_memory
+from sas7bdat_converter_cli.options import (
+    DEFAULT_BUFFER_CHUNKS,
+    DEFAULT_CHUNK_SIZE,
+    ConversionOptions,
+    export_suffix,
+    part_file,
+    partial_file,
+)
+from sas7bdat_converter_cli.reader import SasReader, Shard, plan_shards
+from sas7bdat_converter_cli.writers import (
+    COMPRESSED_FILE_TYPES,
+    TEXT_DATE_FILE_TYPES,
+    WRITERS,
+    ResumableWriter,
+)
+
+SOURCE_SUFFIXES = (".sas7bdat", ".xpt")
+
+# A file type and the path to write it to, the path is a directory when converting directories
+Target = tuple[str, Path]
+
+# The sas7bdat_converter function used for each file type when the file isn't streamed. The
+# library is only imported when one of them is needed. xlsx and xml files are always streamed,
+# building the whole workbook or document in memory is too slow for large files. xpt files are
+# always streamed too, XportFile decodes them faster than the library.
+CONVERTERS = {
+    "csv": "to_csv",
+    "json": "to_json",
+}
+
+
+@dataclass
+class FileResult:
+    """The outcome of converting a single file to one or more file types."""
+
+    source: Path
+    export_files: list[Path]
+    error: str | None = None
+    skipped: bool = False
+    metrics: list[FileMetrics] = field(default_factory=list)
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class ConversionSummary:
+    """The combined results of converting a directory of files."""
+
+    results: list[FileResult] = field(default_factory=list)
+
+    @property
+    def converted(self) -> int:
+        return len([x for x in self.results if x.succeeded and not x.skipped])
+
+    @property
+    def skipped(self) -> int:
+        return len([x for x in self.results if x.skipped])
+
+    @property
+    def failed(self) -> list[FileResult]:
+        return [x for x in self.results if not x.succeeded]
+
+
+def find_sources(
+    dir: Path,
+    *,
+    recursive: bool = False,
+    include: Sequence[str] = (),
+    exclude: Sequence[str] = (),
+) -> list[Path]:
+    """Find the sas7bdat and xpt files in a directory, and its subdirectories if `recursive`.
+
+    `include` and `exclude` are globs matched against the path of each file relative to `dir`,
+    where * also matches /. A glob without a / can also match just the file name. When `include`
+    is set only files matching one of its globs are found, files matching a glob in `exclude`
+    are left out.
+    """
+    files = dir.rglob("*") if recursive else dir.iterdir()
+    return sorted(
+        x
+        for x in files
+        if x.is_file()
+        and x.suffix in SOURCE_SUFFIXES
+        and (not include or _matches(x.relative_to(dir), include))
+        and not _matches(x.relative_to(dir), exclude)
+    )
+
+
+def _matches(path: Path, globs: Sequence[str]) -> bool:
+    return any(
+        fnmatch(path.as_posix(), x) or ("/" not in x and fnmatch(path.name, x)) for x in globs
+    )
+
+
+def convert_file(
+    file_type: str,
+    source: Path,
+    export_file: Path,
+    options: ConversionOptions = ConversionOptions(),
+    *,
+    resume: bool = False,
+    cache: ConversionCache | None = None,
+) -> FileMetrics:
+    """Convert a single sas7bdat or xpt file to the requested file type.
+
+    The export file is written under a temporary name and renamed once it's complete. When
+    `resume` is True the file is streamed and continues from the checkpoint left by an earlier
+    conversion that stopped part way, see stream_file.
+
+    When `cache` is set and it has the same file converted with the same options, the cached
+    file is placed at the export file instead and the status is cached. Otherwise the converted
+    file is added to the cache.
+
+    Returns the time taken, the size of the data, and the peak memory use of the conversion.
+    """
+    if cache is not None:
+        return _convert_cached(cache, file_type, source, export_file, options, resume)
+
+    if options.streaming or resume or file_type not in CONVERTERS or _is_xpt(source, options):
+        return stream_file(source, [(file_type, export_file)], options, resume=resume)[0]
+
+    metrics = FileMetrics(str(source), str(export_file), file_type, bytes_in=source.stat().st_size)
+    reset_peak_memory()
+    start = time.perf_counter()
+    import sas7bdat_converter
+
+    converter = getattr(sas7bdat_converter, CONVERTERS[file_type])
+    temp_file = partial_file(export_file, file_type)
+    try:
+        converter(sas7bdat_file=source, export_file=temp_file)
+    except BaseException:
+        temp_file.unlink(missing_ok=True)
+        raise
+    os.replace(temp_file, export_file)
+    metrics.total_seconds = time.perf_counter() - start
+    with SasReader(source) as reader:
+        metrics.rows = reader.row_count
+        metrics.columns = len(reader.columns)
+
+    metrics.bytes_out = export_file.stat().st_size
+    metrics.peak_memory_bytes = peak_memory()
+
+    return metrics
+
+
+def _is_xpt(source: Path, options: ConversionOptions) -> bool:
+    return (options.input_format or source.suffix.lower()[1:]) == "xpt"
+
+
+def convert_targets(
+    source: Path,
+    targets: Sequence[Target],
+    options: ConversionOptions = ConversionOptions(),
+    *,
+    resume: bool = False,
+    cache: ConversionCache | None = None,
+) -> list[FileMetrics]:
+    """Convert a file to every target, decoding it only once when there is more than one.
+
+    `resume` and `cache` only apply to a single target, see convert_file.
+    """
+    if len(targets) == 1:
+        file_type, export_file = targets[0]
+        return [convert_file(file_type, source, export_file, options, resume=resume, cache=cache)]
+
+    return stream_file(source, targets, options)
+
+
+def _convert_cached(
+    cache: ConversionCache,
+    file_type: str,
+    source: Path,
+    export_file: Path,
+    options: ConversionOptions,
+    resume: bool,
+) -> FileMetrics:
+    start = time.perf_counter()
+    key = cache.key(hash_file(source), file_type, options)
+    entry = cache.get(key, export_file)
+    if entry is None:
+        metrics = convert_file(file_type, source, export_file, options, resume=resume)
+        cache.put(key, export_file, file_type, metrics.rows, metrics.columns)
+        return metrics
+
+    return FileMetrics(
+        str(source),
+        str(export_file),
+        file_type,
+        status="cached",
+        rows=entry.rows,
+        columns=entry.columns,
+        bytes_in=source.stat().st_size,
+        bytes_out=entry.size,
+        total_seconds=time.perf_counter() - start,
+    )
+
+
+def stream_file(
+    source: Path,
+    targets: Sequence[Target],
+    options: ConversionOptions,
+    shard: Shard | None = None,
+    *,
+    resume: bool = False,
+) -> list[FileMetrics]:
+    """Convert a file one chunk of rows at a time so memory is bounded by the chunk size.
+
+    Each chunk is read and decoded once and then written to every target. Reading, decoding,
+    and writing run as a pipeline, see SasReader.iter_chunks. Returns the metrics for each
+    target, the time spent reading is shared by all of them. If `shard` is set only its rows
+    are converted.
+
+    Each target is written to a partial file, output.partial.csv, which is renamed to the export
+    file once it's complete. When the whole file is converted to a single csv or uncompressed
+    ndjson target a checkpoint of the rows written is saved next to the export file every
+    CHECKPOINT_SECONDS. If the conversion fails the partial file and checkpoint are kept once a
+    checkpoint has been saved, or when `resume` is True, otherwise the partial file is removed.
+    When `resume` is True and they match the source and options the conversion continues from
+    the checkpoint, otherwise it starts from the beginning.
+    """
+    _check_streaming([x[0] for x in targets], options)
+    temp_files = [
+        partial_file(export_file, file_type, options.compress) for file_type, export_file in targets
+    ]
+    progress: Checkpoint | None = None
+    saved: Checkpoint | None = None
+    if shard is None and len(targets) == 1 and WRITERS[targets[0][0]].resumable(options):
+        checkpoint_path = checkpoint_file(targets[0][1])
+        progress = Checkpoint.start(source, targets[0][0], options)
+        if resume:
+            saved = Checkpoint.load(checkpoint_path)
+            if not (
+                saved
+                and saved.continues(progress)
+                and temp_files[0].exists()
+                and temp_files[0].stat().st_size >= saved.bytes
+            ):
+                saved = None
+
+    bytes_in = source.stat().st_size
+    reset_peak_memory()
+    start = time.perf_counter()
+    chunk_size = options.chunk_size or DEFAULT_CHUNK_SIZE
+    buffer_chunks = (
+        DEFAULT_BUFFER_CHUNKS if options.buffer_chunks is None else options.buffer_chunks
+    )
+    rows = 0
+    checkpointed = False
+    try:
+        with SasReader(
+            source,
+            options.columns,
+            options.where,
+            options.memory_map,
+            options.date_format,
+            options.datetime_format,
+            options.time_format,
+            options.input_format,
+            options.dictionary_encode,
+        ) as reader:
+            if shard is not None:
+                reader.seek(shard)
+            if saved is not None:
+                # Drop anything written after the checkpoint and carry on from there
+                os.truncate(temp_files[0], saved.bytes)
+                reader.seek_row(saved.rows_read)
+                rows = saved.rows_written
+            with ExitStack() as stack:
+                if saved is None:
+                    writers = [
+                        stack.enter_context(
+                            WRITERS[file_type](temp_file, reader.column_info, options)
+                        )
+                        for (file_type, _), temp_file in zip(targets, temp_files)
+                    ]
+                else:
+                    writer_class = WRITERS[targets[0][0]]
+                    writers = [
+                        stack.enter_context(
+                            writer_class(temp_files[0], reader.column_info, options, append=True)
+                        )
+                    ]
+                for writer in writers:
+                    chunk_size = writer.align_chunk_size(chunk_size, len(reader.columns))
+                checkpoint_time = time.perf_counter()
+                with closing(reader.iter_chunks(chunk_size, buffer_chunks)) as chunks:
+                    for chunk in chunks:
+                        for writer in writers:
+                            writer.write(chunk)
+                        rows += len(chunk)
+                        if (
+                            progress is not None
+                            and isinstance(writers[0], ResumableWriter)
+                            and time.perf_counter() - checkpoint_time
+                            >= checkpoint.CHECKPOINT_SECONDS
+                        ):
+                            progress.bytes = writers[0].flush()
+                            progress.rows_read = reader.position
+                            progress.rows_written = rows
+                            progress.save(checkpoint_path)
+                            checkpointed = True
+                            checkpoint_time = time.perf_counter()
+    except BaseException:
+        if not (checkpointed or resume):
+            for temp_file in temp_files:
+                temp_file.unlink(missing_ok=True)
+        raise
+
+    for (_, export_file), temp_file in zip(targets, temp_files):
+        os.replace(temp_file, export_file)
+    if progress is not None:
+        checkpoint_path.unlink(missing_ok=True)
+
+    total_seconds = time.perf_counter() - start
+    peak_memory_bytes = peak_memory()
+
+    return [
+        FileMetrics(
+            str(source),
+            str(export_file),
+            file_type,
+            rows=rows,
+            columns=len(reader.columns),
+            bytes_in=bytes_in,
+            bytes_out=export_file.stat().st_size,
+            read_seconds=reader.timer.seconds["read"],
+            convert_seconds=reader.timer.seconds["convert"] + writer.timer.seconds["convert"],
+            write_seconds=writer.timer.seconds["write"],
+            total_seconds=total_seconds,
+            peak_memory_bytes=peak_memory_bytes,
+        )
+        for (file_type, export_file), writer in zip(targets, writers)
+    ]
+
+
+def convert_stream(
+    file_type: str,
+    source: Path | IO[bytes],
+    export_file: Path | IO[bytes],
+    options: ConversionOptions,
+) -> FileMetrics:
+    """Convert a file read from a stream, such as stdin, or write it to one, such as stdout.
+
+    Streams are read and written from start to end, a chunk of rows at a time, so a conversion
+    can be part of a shell pipeline without the file being stored anywhere. Only json files,
+    which are written as a single object, are held in memory. `options.input_format` has to be
+    set when the source is a stream. An export file that is a path is written to a partial
+    file and renamed once it's complete, like stream_file.
+    """
+    _check_streaming([file_type], options)
+    source_path = source if isinstance(source, Path) else Path("-")
+    temp_file = (
+        partial_file(export_file, file_type, options.compress)
+        if isinstance(export_file, Path)
+        else None
+    )
+    reset_peak_memory()
+    start = time.perf_counter()
+    chunk_size = options.chunk_size or DEFAULT_CHUNK_SIZE
+    buffer_chunks = (
+        DEFAULT_BUFFER_CHUNKS if options.buffer_chunks is None else options.buffer_chunks
+    )
+    rows = 0
+    try:
+        with SasReader(
+            source_path,
+            options.columns,
+            options.where,
+            options.memory_map,
+            options.date_format,
+            options.datetime_format,
+            options.time_format,
+            options.input_format,
+            options.dictionary_encode,
+            stream=None if isinstance(source, Path) else source,
+        ) as reader, WRITERS[file_type](
+            export_file if temp_file is None else temp_file, reader.column_info, options
+        ) as writer:
+            chunk_size = writer.align_chunk_size(chunk_size, len(reader.columns))
+            with closing(reader.iter_chunks(chunk_size, buffer_chunks)) as chunks:
+                for chunk in chunks:
+                    writer.write(chunk)
+                    rows += len(chunk)
+    except BaseException:
+        if temp_file is not None:
+            temp_file.unlink(missing_ok=True)
+        raise
+
+    if not isinstance(export_file, Path):
+        export_file.flush()
+    elif temp_file is not None:
+        os.replace(temp_file, export_file)
+
+    return FileMetrics(
+        str(source_path),
+        str(export_file) if isinstance(export_file, Path) else "-",
+        file_type,
+        rows=rows,
+        columns=len(reader.columns),
+        bytes_in=source.stat().st_size if isinstance(source, Path) else None,
+        bytes_out=export_file.stat().st_size if isinstance(export_file, Path) else None,
+        read_seconds=reader.timer.seconds["read"],
+        convert_seconds=reader.timer.seconds["convert"] + writer.timer.seconds["convert"],
+        write_seconds=writer.timer.seconds["write"],
+        total_seconds=time.perf_counter() - start,
+        peak_memory_bytes=peak_memory(),
+    )
+
+
+def _check_streaming(file_types: Sequence[str], options: ConversionOptions) -> None:
+    check_compression(options.compress, options.compress_level, options.compress_threads)
+    for file_type in file_types:
+        if file_type not in WRITERS:
+            raise ValueError(f"Streaming conversion is not supported for {file_type} files")
+
+        if options.compress is not None and file_type not in COMPRESSED_FILE_TYPES:
+            raise ValueError(f"Compression is not supported for {file_type} files")
+
+        if options.formats_dates and file_type not in TEXT_DATE_FILE_TYPES:
+            raise ValueError(f"Date formats are not supported for {file_type} files")
+
+
+def convert_shards(
+    file_type: str,
+    source: Path,
+    export_file: Path,
+    options: ConversionOptions = ConversionOptions(),
+    *,
+    shards: int,
+    concat: bool = False,
+) -> FileMetrics:
+    """Split a file into ranges of rows and convert each one in its own worker process.
+
+    Each range is written to its own part file next to the export file, output.csv becomes
+    output.part-0000.csv, output.part-0001.csv, and so on. When `concat` is True the parts are
+    joined into the export file and removed. If any worker fails the parts are removed. The file
+    may be split into fewer than `shards` parts, see plan_shards. csv files are only split where
+    pandas starts a new slice of rows, so unless rows are filtered with `where` the joined file
+    is byte for byte the same as converting the file in one go.
+
+    Returns the combined metrics of the parts, the phase timings are added up across the workers.
+    """
+    if file_type not in WRITERS:
+        raise ValueError(f"Streaming conversion is not supported for {file_type} files")
+
+    if concat and not WRITERS[file_type].concatenates:
+        raise ValueError(f"Concatenating shards is not supported for {file_type} files")
+
+    start = time.perf_counter()
+    with SasReader(source, options.columns, input_format=options.input_format) as reader:
+        column_count = len(reader.columns)
+    # Start each shard where the writer would start a chunk so the joined parts are the same as
+    # converting the file in one go
+    align = WRITERS[file_type].align_chunk_size(1, column_count)
+    planned = plan_shards(source, shards, options.input_format, align)
+    parts = [part_file(export_file, file_type, i, options.compress) for i in range(len(planned))]
+    try:
+        if len(planned) == 1:
+            results = [_convert_shard(file_type, source, parts[0], options, planned[0])]
+        else:
+            with ProcessPoolExecutor(max_workers=len(planned)) as executor:
+                futures = [
+                    executor.submit(_convert_shard, file_type, source, part, options, shard)
+                    for part, shard in zip(parts, planned)
+                ]
+                try:
+                    results = [x.result() for x in futures]
+                except BaseException:
+                    executor.shutdown(wait=True, cancel_futures=True)
+                    raise
+    except BaseException:
+        # Remove the parts written by the workers that finished, a part is only useful with
+        # all the others
+        for part in parts:
+            part.unlink(missing_ok=True)
+        raise
+
+    concat_seconds = 0.0
+    if concat:
+        concat_start = time.perf_counter()
+        temp_file = partial_file(export_file, file_type, options.compress)
+        try:
+            WRITERS[file_type].concat(parts, temp_file, options)
+        except BaseException:
+            temp_file.unlink(missing_ok=True)
+            raise
+        os.replace(temp_file, export_file)
+        concat_seconds = time.perf_counter() - concat_start
+        for part in parts:
+            part.unlink()
+
+    def total(name: str) -> float:
+        return sum(getattr(x, name) or 0.0 for x in results)
+
+    return FileMetrics(
+        str(source),
+        str(export_file),
+        file_type,
+        rows=sum(x.rows or 0 for x in results),
+        columns=results[0].columns,
+        bytes_in=source.stat().st_size,
+        bytes_out=export_file.stat().st_size if concat else sum(x.bytes_out or 0 for x in results),
+        read_seconds=total("read_seconds"),
+        convert_seconds=total("convert_seconds"),
+        write_seconds=total("write_seconds") + concat_seconds,
+        total_seconds=time.perf_counter() - start,
+        peak_memory_bytes=max(x.peak_memory_bytes or 0 for x in results),
+    )
+
+
+def convert_dir(
+    dir: Path,
+    targets: Sequence[Target],
+    *,
+    options: ConversionOptions = ConversionOptions(),
+    jobs: int = 1,
+    continue_on_error: bool = False,
+    incremental: bool = False,
+    resume: bool = False,
+    metrics_log: MetricsLog | None = None,
+    recursive: bool = False,
+    include: Sequence[str] = (),
+    exclude: Sequence[str] = (),
+) -> ConversionSummary:
+    """Convert all sas7bdat and xpt files in a directory.
+
+    Each target is a file type and the directory to save those files in. With more than one
+    target each file is decoded once and written to all of them. When `recursive` is True the
+    files in subdirectories are converted too, and their export files are saved in the same
+    subdirectories of each target directory, which are created if needed. `include` and
+    `exclude` select the files, see find_sources.
+
+    Each file is converted on its own so a failure only affects that file. When `jobs` is greater
+    than 1 the files are spread across a pool of worker processes, 0 uses one worker per CPU.
+    The largest files are started first so a large file found late doesn't leave one worker
+    running long after the others have finished. If `continue_on_error` is False the first
+    failure is raised and any conversions that have not started yet are cancelled.
+
+    When `incremental` is True a manifest of the converted files is kept in the output directory
+    and files whose export file is still valid for the same source and options are skipped. It's
+    only supported with a single target.
+
+    When `resume` is True the manifest is kept the same way so a run that stops part way can be
+    run again to convert the remaining files, and each file continues from the checkpoint left
+    by the earlier run, see stream_file.
+
+    When `metrics_log` is set the metrics for each file are appended to it as soon as the file
+    is finished, including skipped and failed files.
+    """
+    if incremental and len(targets) != 1:
+        raise ValueError("Incremental conversion only supports a single file type")
+
+    if resume and len(targets) != 1:
+        raise ValueError("Resuming only supports a single file type")
+
+    track = incremental or resume
+    manifest = Manifest.load(targets[0][1]) if track else None
+    summary = ConversionSummary()
+    tasks = []
+    for source in find_sources(dir, recursive=recursive, include=include, exclude=exclude):
+        relative_dir = source.parent.relative_to(dir)
+        exports = [
+            (
+                file_type,
+                export_path
+                / relative_dir
+                / f"{source.stem}{export_suffix(file_type, options.compress)}",
+            )
+            for file_type, export_path in targets
+        ]
+        key = source.relative_to(dir).as_posix()
+        if manifest and manifest.is_current(key, source, exports[0][1], exports[0][0], options):
+            metrics = [
+                FileMetrics(
+                    str(source),
+                    str(export_file),
+                    file_type,
+                    status="skipped",
+                    bytes_in=source.stat().st_size,
+                    bytes_out=export_file.stat().st_size,
+                )
+                for file_type, export_file in exports
+            ]
+            if metrics_log:
+                for x in metrics:
+                    metrics_log.append(x)
+            summary.results.append(
+                FileResult(source, [x[1] for x in exports], skipped=True, metrics=metrics)
+            )
+        else:
+            for _, export_file in exports:
+                export_file.parent.mkdir(parents=True, exist_ok=True)
+            tasks.append((key, source, exports))
+
+    def handle_result(
+        key: str,
+        source: Path,
+        exports: list[Target],
+        result: Callable[[], tuple[Fingerprint | None, list[FileMetrics]]],
+    ) -> None:
+        export_files = [x[1] for x in exports]
+        try:
+            fingerprint, metrics = result()
+        except Exception as e:
+            if manifest:
+                manifest.remove(key)
+                manifest.save()
+            error = error_message(e)
+            metrics = [
+                FileMetrics(str(source), str(export_file), file_type, status="failed", error=error)
+                for file_type, export_file in exports
+            ]
+            if metrics_log:
+                for x in metrics:
+                    metrics_log.append(x)
+            if not continue_on_error:
+                raise
+            summary.results.append(FileResult(source, export_files, error, metrics=metrics))
+        else:
+            if manifest and fingerprint:
+                manifest.record(key, fingerprint, exports[0][1], exports[0][0], options)
+                manifest.save()
+            if metrics_log:
+                for x in metrics:
+                    metrics_log.append(x)
+            summary.results.append(FileResult(source, export_files, metrics=metrics))
+
+    workers = jobs or os.cpu_count() or 1
+    if workers == 1 or len(tasks) < 2:
+        for key, source, exports in tasks:
+            handle_result(
+                key,
+                source,
+                exports,
+                partial(_convert_task, source, exports, options, track, resume),
+            )
+    else:
+        # The pool starts the tasks in the order they're submitted
+        tasks.sort(key=lambda x: x[1].stat().st_size, reverse=True)
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            futures = {
+                executor.submit(_convert_task, source, exports, options, track, resume): (
+                    key,
+                    source,
+                    exports,
+                )
+                for key, source, exports in tasks
+            }
+            try:
+                for future in as_completed(futures):
+                    handle_result(*futures[future], future.result)
+            except Exception:
+                executor.shutdown(wait=True, cancel_futures=True)
+                raise
+
+    if manifest:
+        manifest.save()
+
+    # Keep the summary in the same order as the files were found regardless of completion order
+    summary.results.sort(key=lambda x: x.source)
+
+    return summary
+
+
+def _convert_task(
+    source: Path,
+    exports: list[Target],
+    options: ConversionOptions,
+    fingerprint: bool,
+    resume: bool = False,
+) -> tuple[Fingerprint | None, list[FileMetrics]]:
+    # The source is fingerprinted before converting so changes made during the conversion cause
+    # the file to be converted again on the next run.
+    result = Fingerprint.from_file(source) if fingerprint else None
+    return result, convert_targets(source, exports, options, resume=resume)
+
+
+def _convert_shard(
+    file_type: str, source: Path, part: Path, options: ConversionOptions, shard: Shard
+) -> FileMetrics:
+    return stream_file(source, [(file_type, part)], options, shard)[0]
+
+
+def error_message(error: Exception) -> str:
+    return str(error) or type(error).__name__
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from typing import Literal
+
+import numpy as np
+import pandas as pd
+
+# The number of days and seconds between the SAS epoch of 1960-01-01 and the unix epoch
+SAS_EPOCH_DAYS = 3653
+SAS_EPOCH_SECONDS = SAS_EPOCH_DAYS * 86_400
+
+# Formats numpy can write itself, along with the unit of the values it writes
+_ISO_FORMATS: dict[str, Literal["D", "s"]] = {"%Y-%m-%d": "D", "%Y-%m-%dT%H:%M:%S": "s"}
+
+
+def sas_dates_to_datetime64(values: np.ndarray) -> np.ndarray:
+    """Convert SAS dates, days since 1960-01-01, to datetime64[D]. Missing values become NaT."""
+    return _to_datetime64(np.floor(values) - SAS_EPOCH_DAYS, "D")
+
+
+def sas_datetimes_to_datetime64(values: np.ndarray) -> np.ndarray:
+    """Convert SAS datetimes, seconds since 1960-01-01, to datetime64[ms]."""
+    return _to_datetime64(np.round(values * 1000) - SAS_EPOCH_SECONDS * 1000, "ms")
+
+
+def sas_times_to_datetime64(values: np.ndarray) -> np.ndarray:
+    """Convert SAS times, seconds since midnight, to datetime64[ms] on 1970-01-01.
+
+    Times of 24 hours or more wrap around to the following days.
+    """
+    return _to_datetime64(np.round(values * 1000), "ms")
+
+
+class DatetimeFormatter:
+    """Formats datetime64 values with a strftime format a whole array at a time.
+
+    Each distinct value is only formatted once, dates and datetimes in SAS datasets usually repeat
+    a lot. The text for up to `cache_size` values is kept so values seen in earlier chunks aren't
+    formatted again, and ISO 8601 formats are written by numpy directly.
+    """
+
+    def __init__(self, date_format: str, cache_size: int = 100_000) -> None:
+        self.date_format = date_format
+        self.cache_size = cache_size
+        self._cache = pd.Series(dtype=object, index=pd.Index([], dtype=np.int64))
+
+    def format(self, values: np.ndarray) -> np.ndarray:
+        """Return an object array of strings for the values, NaT values become None."""
+        codes, uniques = pd.factorize(values)
+        keys = uniques.view(np.int64)
+        formatted = self._cache.reindex(keys).to_numpy(dtype=object)
+        new = pd.isna(formatted)
+        if new.any():
+            formatted[new] = self._format(uniques[new])
+            if len(self._cache) < self.cache_size:
+                self._cache = pd.concat(
+                    [self._cache, pd.Series(formatted[new], index=keys[new], dtype=object)]
+                )
+
+        # factorize gives missing values a code of -1, which picks the None added to the end
+        return np.append(formatted, np.array([None], dtype=object))[codes]
+
+    def _format(self, values: np.ndarray) -> np.ndarray:
+        unit = _ISO_FORMATS.get(self.date_format)
+        if unit is not None:
+            return np.datetime_as_string(values, unit=unit).astype(object)
+        return pd.DatetimeIndex(values).strftime(self.date_format).to_numpy(dtype=object)
+
+
+def _to_datetime64(values: np.ndarray, unit: str) -> np.ndarray:
+    missing = np.isnan(values)
+    result = np.where(missing, 0, values).astype(np.int64).astype(f"M8[{unit}]")
+    result[missing] = np.datetime64("NaT")
+    return result
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+from sas7bdat_converter_cli.conversion import error_message, find_sources
+from sas7bdat_converter_cli.reader import DatasetInfo, SasReader
+
+
+@dataclass
+class InspectionResult:
+    """The metadata of a single file, or the reason it couldn't be read."""
+
+    source: Path
+    info: DatasetInfo | None = None
+    error: str | None = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None
+
+    def to_dict(self) -> dict[str, Any]:
+        if self.info is None:
+            return {"file_path": str(self.source), "error": self.error}
+        return asdict(self.info)
+
+
+def inspect_file(file_path: Path) -> DatasetInfo:
+    """Read the metadata of a sas7bdat or xpt file without reading any of its rows."""
+    with SasReader(file_path) as reader:
+        return reader.info()
+
+
+def inspect_dir(dir: Path, jobs: int = 0) -> list[InspectionResult]:
+    """Read the metadata of all sas7bdat and xpt files in a directory.
+
+    Reading the metadata is a few small reads per file, so the files are read by a pool of `jobs`
+    threads rather than processes, which would each have to import pandas first. 0 uses the
+    default size of a thread pool. A file that can't be read doesn't stop the others.
+    """
+    sources = find_sources(dir)
+    with ThreadPoolExecutor(max_workers=jobs or None) as executor:
+        return list(executor.map(_inspect_result, sources))
+
+
+def _inspect_result(source: Path) -> InspectionResult:
+    try:
+        return InspectionResult(source, inspect_file(source))
+    except Exception as e:
+        return InspectionResult(source, error=error_message(e))
@@ -1,37 +1,316 @@
+import json
+import sys
+import tempfile
+from collections.abc import Callable
+from dataclasses import asdict
+from enum import Enum
 from pathlib import Path
 from typing import Union
 
 from rich.console import Console
-from sas7bdat_converter import dir_to_csv as converter_dir_to_csv
-from sas7bdat_converter import dir_to_excel as converter_dir_to_excel
-from sas7bdat_converter import dir_to_json as converter_dir_to_json
-from sas7bdat_converter import dir_to_xml as converter_dir_to_xml
-from sas7bdat_converter import to_csv as converter_to_csv
-from sas7bdat_converter import to_excel as converter_to_excel
-from sas7bdat_converter import to_json as converter_to_json
-from sas7bdat_converter import to_xml as converter_to_xml
+from rich.table import Table
 from typer import Argument, Exit, Option, Typer, echo
 
+# Only light modules are imported here so --version, --help, and shell completion start quickly.
+# The conversion and benchmark modules import pandas and the file format backends, they are
+# imported by the commands that use them.
+from sas7bdat_converter_cli.cache import ConversionCache, default_cache_dir, parse_size
+from sas7bdat_converter_cli.compression import check_compression
+from sas7bdat_converter_cli.metrics import FileMetrics, MetricsLog
+from sas7bdat_converter_cli.options import (
+    COMPRESSION_SUFFIXES,
+    DEFAULT_CHUNK_SIZE,
+    EXPORT_SUFFIXES,
+    ConversionOptions,
+    compression_of,
+    export_suffix,
+    is_export_file,
+    is_xml_name,
+)
+
 __version__ = "2.0.0"
 
 app = Typer()
+cache_app = Typer(help="Show the size of the conversion cache or remove its files.")
+app.add_typer(cache_app, name="cache")
 console = Console()
+# Progress is shown on stderr so it doesn't mix with a file written to stdout
+err_console = Console(stderr=True)
+
+# The path that reads from stdin or writes to stdout
+STDIO = Path("-")
+
+
+class InputFormat(str, Enum):
+    sas7bdat = "sas7bdat"
+    xpt = "xpt"
+
+
+class ParquetCompression(str, Enum):
+    snappy = "snappy"
+    zstd = "zstd"
+    none = "none"
+
+
+class ArrowCompression(str, Enum):
+    zstd = "zstd"
+    lz4 = "lz4"
+    none = "none"
+
+
+class TextCompression(str, Enum):
+    gzip = "gzip"
+    zstd = "zstd"
+    bz2 = "bz2"
+    xz = "xz"
+    none = "none"
+
+
+class BenchCommand(str, Enum):
+    to_csv = "to-csv"
+    to_excel = "to-excel"
+    to_json = "to-json"
+    to_xml = "to-xml"
+    to_parquet = "to-parquet"
+    to_arrow = "to-arrow"
+
+
+_COLUMNS_OPTION = Option(
+    None,
+    "--columns",
+    help="A comma separated list of the columns to include. Default = All columns",
+    show_default=False,
+)
+_WHERE_OPTION = Option(
+    None,
+    "--where",
+    help="Only include rows matching this expression, for example \"SITE == '001' and AGE >= 18\"",
+    show_default=False,
+)
+_NDJSON_OPTION = Option(
+    False,
+    "--ndjson",
+    help="If set one json object is written per line as the rows are read, so memory use stays bounded and the file can be read while it's being written",
+)
+_COMPRESS_OPTION = Option(
+    None,
+    "--compress",
+    help="Compress the file as it's written. Default = The compression the export file's suffix ends in, .gz, .zst, .bz2, or .xz",
+    show_default=False,
+)
+_DIR_COMPRESS_OPTION = Option(
+    None,
+    "--compress",
+    help="Compress the files as they're written, the suffix of the compression is added to their names. Default = none",
+    show_default=False,
+)
+_COMPRESS_LEVEL_OPTION = Option(
+    None,
+    "--compress-level",
+    help="The level to compress at, higher levels are smaller and slower. gzip 0-9, bz2 1-9, xz 0-9, zstd 1-22. Default = 9 for gzip and bz2, 6 for xz, and 1 for zstd",
+    show_default=False,
+)
+_COMPRESS_THREADS_OPTION = Option(
+    None,
+    "--compress-threads",
+    min=1,
+    help="The number of threads to compress zstd files with, each compresses its own 4 MiB frames. Default = 1",
+    show_default=False,
+)
+_INPUT_FORMAT_OPTION = Option(
+    None,
+    "--input-format",
+    help="The format of the file to convert, required when it's read from stdin. Default = Taken from the file's suffix",
+    show_default=False,
+)
+_XML_ROOT_OPTION = Option(
+    "root",
+    "--root-name",
+    help="The name of the document's root element",
+)
+_XML_ROW_OPTION = Option(
+    "item",
+    "--row-name",
+    help="The name of the element written for each row",
+)
+_XML_ATTRIBUTES_OPTION = Option(
+    False,
+    "--attributes",
+    help="If set each column is written as an attribute of the row's element instead of a child element",
+)
+_MEMORY_MAP_OPTION = Option(
+    False,
+    "--memory-map",
+    help="If set the file is memory mapped and streamed from the mapping instead of being read through a file buffer, parallel workers reading the same file share its pages",
+)
+_DICTIONARY_ENCODE_OPTION = Option(
+    False,
+    "--dictionary-encode",
+    help="If set each distinct value of a character column is decoded once per chunk and shared by the rows that have it, which uses much less memory for repetitive columns. Parquet and Arrow files store the columns as dictionaries, except for those that are mostly unique",
+)
+_DATE_FORMAT_OPTION = Option(
+    None,
+    "--date-format",
+    help="Write date columns as text in this strftime format, for example %Y-%m-%d",
+    show_default=False,
+)
+_DATETIME_FORMAT_OPTION = Option(
+    None,
+    "--datetime-format",
+    help="Write datetime columns as text in this strftime format, for example %Y-%m-%dT%H:%M:%S",
+    show_default=False,
+)
+_TIME_FORMAT_OPTION = Option(
+    None,
+    "--time-format",
+    help="Write time columns as text in this strftime format, for example %H:%M:%S",
+    show_default=False,
+)
+_SHARDS_OPTION = Option(
+    1,
+    "--shards",
+    min=1,
+    help="Split the file into this many ranges of rows and convert them in parallel to numbered part files next to the export file, such as output.part-0000.csv",
+)
+_CONCAT_OPTION = Option(
+    False,
+    "--concat",
+    help="If set the part files written with --shards are joined into the export file",
+)
+_BUFFER_CHUNKS_OPTION = Option(
+    None,
+    "--buffer-chunks",
+    min=0,
+    help="If set the file is streamed, reading and decoding each run in their own thread up to this many chunks ahead of writing. 0 = Run them one after the other. Default = 2 when streaming",
+    show_default=False,
+)
+_RESUME_OPTION = Option(
+    False,
+    "--resume",
+    help="If set and an earlier conversion to the export file stopped part way, continue from its last checkpoint instead of starting over. The file is streamed and written under a temporary name until it's complete",
+)
+_DIR_RESUME_OPTION = Option(
+    False,
+    "--resume",
+    help="If set files finished by an earlier --resume or --incremental run into the output directory are skipped, and a file it stopped part way through continues from its last checkpoint",
+)
+_RECURSIVE_OPTION = Option(
+    False,
+    "--recursive",
+    "-r",
+    help="If set the files in subdirectories are converted too, their output files are saved in the same subdirectories of the output directory",
+)
+_INCLUDE_OPTION = Option(
+    None,
+    "--include",
+    help="Only convert files whose path relative to dir matches this glob, * also matches /, for example 'study1/*/dm.xpt'. A glob without a / can also match the file name. Can be repeated",
+    show_default=False,
+)
+_EXCLUDE_OPTION = Option(
+    None,
+    "--exclude",
+    help="Skip files whose path relative to dir matches this glob, matched the same way as --include. Can be repeated",
+    show_default=False,
+)
+_CACHE_OPTION = Option(
+    False,
+    "--cache",
+    envvar="SAS7BDAT_CONVERTER_CACHE",
+    help="If set the export file is kept in a cache shared by every run, and a file that was already converted with the same options is linked or copied from the cache instead of being converted again. Files linked from the cache are read only",
+)
+_CACHE_DIR_OPTION = Option(
+    None,
+    "--cache-dir",
+    envvar="SAS7BDAT_CONVERTER_CACHE_DIR",
+    help="The directory of the conversion cache. Default = sas7bdat-converter in XDG_CACHE_HOME or ~/.cache",
+    show_default=False,
+)
+_CACHE_MAX_SIZE_OPTION = Option(
+    "10G",
+    "--cache-max-size",
+    envvar="SAS7BDAT_CONVERTER_CACHE_MAX_SIZE",
+    help="The least recently used files are removed from the cache to keep it under this size, such as 500M or 10G",
+)
+_METRICS_FILE_OPTION = Option(
+    None,
+    "--metrics-file",
+    help="Append the timings, row and column counts, sizes, and peak memory use of each file to this JSON Lines file",
+    show_default=False,
+)
 
 
 @app.command()
 def to_csv(
-    file_path: Path = Argument(..., help="Path to the file to convert", show_default=False),
-    export_file: Path = Argument(..., help="Path to the new csv file", show_default=False),
+    file_path: Path = Argument(
+        ..., help="Path to the file to convert, - reads it from stdin", show_default=False
+    ),
+    export_file: Path = Argument(
+        ..., help="Path to the new csv file, - writes it to stdout", show_default=False
+    ),
+    input_format: Union[InputFormat, None] = _INPUT_FORMAT_OPTION,
+    chunk_size: Union[int, None] = Option(
+        None,
+        "--chunk-size",
+        min=1,
+        help="If set the file is streamed to the csv file this many rows at a time instead of being read into memory all at once",
+        show_default=False,
+    ),
+    compress: Union[TextCompression, None] = _COMPRESS_OPTION,
+    compress_level: Union[int, None] = _COMPRESS_LEVEL_OPTION,
+    compress_threads: Union[int, None] = _COMPRESS_THREADS_OPTION,
+    memory_map: bool = _MEMORY_MAP_OPTION,
+    dictionary_encode: bool = _DICTIONARY_ENCODE_OPTION,
+    date_format: Union[str, None] = _DATE_FORMAT_OPTION,
+    datetime_format: Union[str, None] = _DATETIME_FORMAT_OPTION,
+    time_format: Union[str, None] = _TIME_FORMAT_OPTION,
+    columns: Union[str, None] = _COLUMNS_OPTION,
+    where: Union[str, None] = _WHERE_OPTION,
+    shards: int = _SHARDS_OPTION,
+    concat: bool = _CONCAT_OPTION,
+    resume: bool = _RESUME_OPTION,
+    buffer_chunks: Union[int, None] = _BUFFER_CHUNKS_OPTION,
+    cache: bool = _CACHE_OPTION,
+    cache_dir: Union[Path, None] = _CACHE_DIR_OPTION,
+    cache_max_size: str = _CACHE_MAX_SIZE_OPTION,
+    metrics_file: Union[Path, None] = _METRICS_FILE_OPTION,
 ) -> None:
     """Convert a sas7bdat or xpt file to a csv file."""
-    with console.status("Converting file..."):
-        if file_path.suffix != ".sas7bdat" and file_path.suffix != ".xpt":
-            exit("File must be either a sas7bdat file or a xpt file")
+    with err_console.status("Converting file..."):
+        _check_source(file_path, input_format)
 
-        if export_file.suffix != ".csv":
-            exit("The export file must be a csv file")
+        codec = _compression(compress, compress_level, compress_threads, export_file)
+        if export_file != STDIO and not is_export_file(export_file, "csv", codec):
+            exit(f"The export file must be a csv file{_ending_in(codec)}")
 
-        converter_to_csv(sas7bdat_file=file_path, export_file=export_file)
+        if resume and codec:
+            exit("--resume can only be used with uncompressed files")
+
+        options = ConversionOptions(
+            chunk_size=chunk_size,
+            columns=_split_columns(columns),
+            where=where,
+            memory_map=memory_map,
+            dictionary_encode=dictionary_encode,
+            date_format=date_format,
+            datetime_format=datetime_format,
+            time_format=time_format,
+            compress=codec,
+            compress_level=compress_level,
+            compress_threads=compress_threads,
+            buffer_chunks=buffer_chunks,
+            input_format=input_format.value if input_format else None,
+        )
+        _convert_file(
+            "csv",
+            file_path,
+            export_file,
+            options,
+            metrics_file,
+            shards,
+            concat,
+            resume,
+            cache=_conversion_cache(cache_dir, cache_max_size) if cache else None,
+        )
 
 
 @app.command()
@@ -55,32 +334,124 @@ def dir_to_csv(
     verbose: bool = Option(
         False, "--verbose", "-v", help="If set the amount of information printed is increased."
     ),
+    jobs: int = Option(
+        1,
+        "--jobs",
+        "-j",
+        min=0,
+        help="The number of files to convert in parallel. 0 = One per CPU",
+    ),
+    recursive: bool = _RECURSIVE_OPTION,
+    include: Union[list[str], None] = _INCLUDE_OPTION,
+    exclude: Union[list[str], None] = _EXCLUDE_OPTION,
+    incremental: bool = Option(
+        False,
+        "--incremental",
+        help="If set only files that are new or have changed since the last incremental run into the output directory are converted",
+    ),
+    resume: bool = _DIR_RESUME_OPTION,
+    chunk_size: Union[int, None] = Option(
+        None,
+        "--chunk-size",
+        min=1,
+        help="If set each file is streamed to its csv file this many rows at a time instead of being read into memory all at once",
+        show_default=False,
+    ),
+    compress: Union[TextCompression, None] = _DIR_COMPRESS_OPTION,
+    compress_level: Union[int, None] = _COMPRESS_LEVEL_OPTION,
+    compress_threads: Union[int, None] = _COMPRESS_THREADS_OPTION,
+    memory_map: bool = _MEMORY_MAP_OPTION,
+    dictionary_encode: bool = _DICTIONARY_ENCODE_OPTION,
+    date_format: Union[str, None] = _DATE_FORMAT_OPTION,
+    datetime_format: Union[str, None] = _DATETIME_FORMAT_OPTION,
+    time_format: Union[str, None] = _TIME_FORMAT_OPTION,
+    columns: Union[str, None] = _COLUMNS_OPTION,
+    where: Union[str, None] = _WHERE_OPTION,
+    metrics_file: Union[Path, None] = _METRICS_FILE_OPTION,
 ) -> None:
     """Convert a directory containing sas7bdat or xpt files to csv files."""
-    with console.status("Converting files..."):
-        export_path = output_dir or dir
-        converter_dir_to_csv(
-            dir_path=dir,
-            export_path=export_path,
-            continue_on_error=continue_on_error,
-            verbose=verbose,
-        )
+    codec = _compression(compress, compress_level, compress_threads)
+    _convert_dir(
+        "csv",
+        dir,
+        output_dir,
+        continue_on_error,
+        verbose,
+        jobs,
+        recursive,
+        include,
+        exclude,
+        incremental,
+        resume,
+        metrics_file,
+        ConversionOptions(
+            chunk_size=chunk_size,
+            columns=_split_columns(columns),
+            where=where,
+            memory_map=memory_map,
+            dictionary_encode=dictionary_encode,
+            date_format=date_format,
+            datetime_format=datetime_format,
+            time_format=time_format,
+            compress=codec,
+            compress_level=compress_level,
+            compress_threads=compress_threads,
+        ),
+    )
 
 
 @app.command()
 def to_excel(
-    file_path: Path = Argument(..., help="Path to the file to convert", show_default=False),
-    export_file: Path = Argument(..., help="Path to the new Excel file", show_default=False),
+    file_path: Path = Argument(
+        ..., help="Path to the file to convert, - reads it from stdin", show_default=False
+    ),
+    export_file: Path = Argument(
+        ..., help="Path to the new Excel file, - writes it to stdout", show_default=False
+    ),
+    input_format: Union[InputFormat, None] = _INPUT_FORMAT_OPTION,
+    memory_map: bool = _MEMORY_MAP_OPTION,
+    dictionary_encode: bool = _DICTIONARY_ENCODE_OPTION,
+    date_format: Union[str, None] = _DATE_FORMAT_OPTION,
+    datetime_format: Union[str, None] = _DATETIME_FORMAT_OPTION,
+    time_format: Union[str, None] = _TIME_FORMAT_OPTION,
+    columns: Union[str, None] = _COLUMNS_OPTION,
+    where: Union[str, None] = _WHERE_OPTION,
+    shards: int = _SHARDS_OPTION,
+    concat: bool = _CONCAT_OPTION,
+    buffer_chunks: Union[int, None] = _BUFFER_CHUNKS_OPTION,
+    cache: bool = _CACHE_OPTION,
+    cache_dir: Union[Path, None] = _CACHE_DIR_OPTION,
+    cache_max_size: str = _CACHE_MAX_SIZE_OPTION,
+    metrics_file: Union[Path, None] = _METRICS_FILE_OPTION,
 ) -> None:
     """Convert a sas7bdat or xpt file to a xlsx file."""
-    with console.status("Converting file..."):
-        if file_path.suffix != ".sas7bdat" and file_path.suffix != ".xpt":
-            exit("File must be either a sas7bdat file or a xpt file")
+    with err_console.status("Converting file..."):
+        _check_source(file_path, input_format)
 
-        if export_file.suffix != ".xlsx":
+        if export_file != STDIO and export_file.suffix != ".xlsx":
             exit("The export file must be a xlsx file")
 
-        converter_to_excel(sas7bdat_file=file_path, export_file=export_file)
+        options = ConversionOptions(
+            columns=_split_columns(columns),
+            where=where,
+            memory_map=memory_map,
+            dictionary_encode=dictionary_encode,
+            date_format=date_format,
+            datetime_format=datetime_format,
+            time_format=time_format,
+            buffer_chunks=buffer_chunks,
+            input_format=input_format.value if input_format else None,
+        )
+        _convert_file(
+            "xlsx",
+            file_path,
+            export_file,
+            options,
+            metrics_file,
+            shards,
+            concat,
+            cache=_conversion_cache(cache_dir, cache_max_size) if cache else None,
+        )
 
 
 @app.command()
@@ -104,32 +475,125 @@ def dir_to_excel(
     verbose: bool = Option(
         False, "--verbose", "-v", help="If set the amount of information printed is increased."
     ),
+    jobs: int = Option(
+        1,
+        "--jobs",
+        "-j",
+        min=0,
+        help="The number of files to convert in parallel. 0 = One per CPU",
+    ),
+    recursive: bool = _RECURSIVE_OPTION,
+    include: Union[list[str], None] = _INCLUDE_OPTION,
+    exclude: Union[list[str], None] = _EXCLUDE_OPTION,
+    incremental: bool = Option(
+        False,
+        "--incremental",
+        help="If set only files that are new or have changed since the last incremental run into the output directory are converted",
+    ),
+    resume: bool = _DIR_RESUME_OPTION,
+    memory_map: bool = _MEMORY_MAP_OPTION,
+    dictionary_encode: bool = _DICTIONARY_ENCODE_OPTION,
+    date_format: Union[str, None] = _DATE_FORMAT_OPTION,
+    datetime_format: Union[str, None] = _DATETIME_FORMAT_OPTION,
+    time_format: Union[str, None] = _TIME_FORMAT_OPTION,
+    columns: Union[str, None] = _COLUMNS_OPTION,
+    where: Union[str, None] = _WHERE_OPTION,
+    metrics_file: Union[Path, None] = _METRICS_FILE_OPTION,
 ) -> None:
     """Convert a directory of sas7bdat or xpt files to xlsx files."""
-    with console.status("Converting files..."):
-        export_path = output_dir or dir
-        converter_dir_to_excel(
-            dir_path=dir,
-            export_path=export_path,
-            continue_on_error=continue_on_error,
-            verbose=verbose,
-        )
+    _convert_dir(
+        "xlsx",
+        dir,
+        output_dir,
+        continue_on_error,
+        verbose,
+        jobs,
+        recursive,
+        include,
+        exclude,
+        incremental,
+        resume,
+        metrics_file,
+        ConversionOptions(
+            columns=_split_columns(columns),
+            where=where,
+            memory_map=memory_map,
+            dictionary_encode=dictionary_encode,
+            date_format=date_format,
+            datetime_format=datetime_format,
+            time_format=time_format,
+        ),
+    )
 
 
 @app.command()
 def to_json(
-    file_path: Path = Argument(..., help="Path to the file to convert", show_default=False),
-    export_file: Path = Argument(..., help="Path to the new JSON file", show_default=False),
+    file_path: Path = Argument(
+        ..., help="Path to the file to convert, - reads it from stdin", show_default=False
+    ),
+    export_file: Path = Argument(
+        ..., help="Path to the new JSON file, - writes it to stdout", show_default=False
+    ),
+    input_format: Union[InputFormat, None] = _INPUT_FORMAT_OPTION,
+    ndjson: bool = _NDJSON_OPTION,
+    compress: Union[TextCompression, None] = _COMPRESS_OPTION,
+    compress_level: Union[int, None] = _COMPRESS_LEVEL_OPTION,
+    compress_threads: Union[int, None] = _COMPRESS_THREADS_OPTION,
+    memory_map: bool = _MEMORY_MAP_OPTION,
+    dictionary_encode: bool = _DICTIONARY_ENCODE_OPTION,
+    date_format: Union[str, None] = _DATE_FORMAT_OPTION,
+    datetime_format: Union[str, None] = _DATETIME_FORMAT_OPTION,
+    time_format: Union[str, None] = _TIME_FORMAT_OPTION,
+    columns: Union[str, None] = _COLUMNS_OPTION,
+    where: Union[str, None] = _WHERE_OPTION,
+    shards: int = _SHARDS_OPTION,
+    concat: bool = _CONCAT_OPTION,
+    resume: bool = _RESUME_OPTION,
+    buffer_chunks: Union[int, None] = _BUFFER_CHUNKS_OPTION,
+    cache: bool = _CACHE_OPTION,
+    cache_dir: Union[Path, None] = _CACHE_DIR_OPTION,
+    cache_max_size: str = _CACHE_MAX_SIZE_OPTION,
+    metrics_file: Union[Path, None] = _METRICS_FILE_OPTION,
 ) -> None:
     """Convert a sas7bdat or xpt file to a JSON file."""
-    with console.status("Converting file..."):
-        if file_path.suffix != ".sas7bdat" and file_path.suffix != ".xpt":
-            exit("File must be either a sas7bdat file or a xpt file")
+    with err_console.status("Converting file..."):
+        _check_source(file_path, input_format)
+
+        codec = _compression(compress, compress_level, compress_threads, export_file)
+        if export_file != STDIO and not ndjson and not is_export_file(export_file, "json", codec):
+            exit(f"The export file must be a json file{_ending_in(codec)}")
+
+        if export_file != STDIO and ndjson and not is_export_file(export_file, "ndjson", codec):
+            exit(f"The export file must be a ndjson, jsonl, or json file{_ending_in(codec)}")
 
-        if export_file.suffix != ".json":
-            exit("The export file must be a json file")
+        if resume and (not ndjson or codec):
+            exit("--resume can only be used with uncompressed --ndjson files")
 
-        converter_to_json(sas7bdat_file=file_path, export_file=export_file)
+        options = ConversionOptions(
+            columns=_split_columns(columns),
+            where=where,
+            memory_map=memory_map,
+            dictionary_encode=dictionary_encode,
+            date_format=date_format,
+            datetime_format=datetime_format,
+            time_format=time_format,
+            compress=codec,
+            compress_level=compress_level,
+            compress_threads=compress_threads,
+            buffer_chunks=buffer_chunks,
+            input_format=input_format.value if input_format else None,
+        )
+        _convert_file(
+            "ndjson" if ndjson else "json",
+            file_path,
+            export_file,
+            options,
+            metrics_file,
+            shards,
+            concat,
+            resume,
+            _conversion_cache(cache_dir, cache_max_size) if cache else None,
+        )
 
 
 @app.command()
@@ -153,32 +617,132 @@ def dir_to_json(
     verbose: bool = Option(
         False, "--verbose", "-v", help="If set the amount of information printed is increased."
     ),
+    jobs: int = Option(
+        1,
+        "--jobs",
+        "-j",
+        min=0,
+        help="The number of files to convert in parallel. 0 = One per CPU",
+    ),
+    recursive: bool = _RECURSIVE_OPTION,
+    include: Union[list[str], None] = _INCLUDE_OPTION,
+    exclude: Union[list[str], None] = _EXCLUDE_OPTION,
+    incremental: bool = Option(
+        False,
+        "--incremental",
+        help="If set only files that are new or have changed since the last incremental run into the output directory are converted",
+    ),
+    resume: bool = _DIR_RESUME_OPTION,
+    ndjson: bool = _NDJSON_OPTION,
+    compress: Union[TextCompression, None] = _DIR_COMPRESS_OPTION,
+    compress_level: Union[int, None] = _COMPRESS_LEVEL_OPTION,
+    compress_threads: Union[int, None] = _COMPRESS_THREADS_OPTION,
+    memory_map: bool = _MEMORY_MAP_OPTION,
+    dictionary_encode: bool = _DICTIONARY_ENCODE_OPTION,
+    date_format: Union[str, None] = _DATE_FORMAT_OPTION,
+    datetime_format: Union[str, None] = _DATETIME_FORMAT_OPTION,
+    time_format: Union[str, None] = _TIME_FORMAT_OPTION,
+    columns: Union[str, None] = _COLUMNS_OPTION,
+    where: Union[str, None] = _WHERE_OPTION,
+    metrics_file: Union[Path, None] = _METRICS_FILE_OPTION,
 ) -> None:
     """Convert a directory of sas7bdat or xpt files to json files."""
-    with console.status("Converting files..."):
-        export_path = output_dir or dir
-        converter_dir_to_json(
-            dir_path=dir,
-            export_path=export_path,
-            continue_on_error=continue_on_error,
-            verbose=verbose,
-        )
+    codec = _compression(compress, compress_level, compress_threads)
+    _convert_dir(
+        "ndjson" if ndjson else "json",
+        dir,
+        output_dir,
+        continue_on_error,
+        verbose,
+        jobs,
+        recursive,
+        include,
+        exclude,
+        incremental,
+        resume,
+        metrics_file,
+        ConversionOptions(
+            columns=_split_columns(columns),
+            where=where,
+            memory_map=memory_map,
+            dictionary_encode=dictionary_encode,
+            date_format=date_format,
+            datetime_format=datetime_format,
+            time_format=time_format,
+            compress=codec,
+            compress_level=compress_level,
+            compress_threads=compress_threads,
+        ),
+    )
 
 
 @app.command()
 def to_xml(
-    file_path: Path = Argument(..., help="Path to the file to convert", show_default=False),
-    export_file: Path = Argument(..., help="Path to the new XML file", show_default=False),
+    file_path: Path = Argument(
+        ..., help="Path to the file to convert, - reads it from stdin", show_default=False
+    ),
+    export_file: Path = Argument(
+        ..., help="Path to the new XML file, - writes it to stdout", show_default=False
+    ),
+    input_format: Union[InputFormat, None] = _INPUT_FORMAT_OPTION,
+    root_name: str = _XML_ROOT_OPTION,
+    row_name: str = _XML_ROW_OPTION,
+    attributes: bool = _XML_ATTRIBUTES_OPTION,
+    compress: Union[TextCompression, None] = _COMPRESS_OPTION,
+    compress_level: Union[int, None] = _COMPRESS_LEVEL_OPTION,
+    compress_threads: Union[int, None] = _COMPRESS_THREADS_OPTION,
+    memory_map: bool = _MEMORY_MAP_OPTION,
+    dictionary_encode: bool = _DICTIONARY_ENCODE_OPTION,
+    date_format: Union[str, None] = _DATE_FORMAT_OPTION,
+    datetime_format: Union[str, None] = _DATETIME_FORMAT_OPTION,
+    time_format: Union[str, None] = _TIME_FORMAT_OPTION,
+    columns: Union[str, None] = _COLUMNS_OPTION,
+    where: Union[str, None] = _WHERE_OPTION,
+    shards: int = _SHARDS_OPTION,
+    concat: bool = _CONCAT_OPTION,
+    buffer_chunks: Union[int, None] = _BUFFER_CHUNKS_OPTION,
+    cache: bool = _CACHE_OPTION,
+    cache_dir: Union[Path, None] = _CACHE_DIR_OPTION,
+    cache_max_size: str = _CACHE_MAX_SIZE_OPTION,
+    metrics_file: Union[Path, None] = _METRICS_FILE_OPTION,
 ) -> None:
     """Convert a sas7bdat or xpt file to a xml file."""
-    with console.status("Converting file..."):
-        if file_path.suffix != ".sas7bdat" and file_path.suffix != ".xpt":
-            exit("File must be either a sas7bdat file or a xpt file")
+    with err_console.status("Converting file..."):
+        _check_source(file_path, input_format)
 
-        if export_file.suffix != ".xml":
-            exit("The export file must be a XML file")
+        codec = _compression(compress, compress_level, compress_threads, export_file)
+        if export_file != STDIO and not is_export_file(export_file, "xml", codec):
+            exit(f"The export file must be a XML file{_ending_in(codec)}")
 
-        converter_to_xml(sas7bdat_file=file_path, export_file=export_file)
+        _check_xml_names(root_name, row_name)
+
+        options = ConversionOptions(
+            columns=_split_columns(columns),
+            where=where,
+            memory_map=memory_map,
+            dictionary_encode=dictionary_encode,
+            date_format=date_format,
+            datetime_format=datetime_format,
+            time_format=time_format,
+            compress=codec,
+            compress_level=compress_level,
+            compress_threads=compress_threads,
+            xml_root=root_name,
+            xml_row=row_name,
+            xml_attributes=attributes,
+            buffer_chunks=buffer_chunks,
+            input_format=input_format.value if input_format else None,
+        )
+        _convert_file(
+            "xml",
+            file_path,
+            export_file,
+            options,
+            metrics_file,
+            shards,
+            concat,
+            cache=_conversion_cache(cache_dir, cache_max_size) if cache else None,
+        )
 
 
 @app.command()
@@ -202,18 +766,1092 @@ def dir_to_xml(
     verbose: bool = Option(
         False, "--verbose", "-v", help="If set the amount of information printed is increased."
     ),
+    jobs: int = Option(
+        1,
+        "--jobs",
+        "-j",
+        min=0,
+        help="The number of files to convert in parallel. 0 = One per CPU",
+    ),
+    recursive: bool = _RECURSIVE_OPTION,
+    include: Union[list[str], None] = _INCLUDE_OPTION,
+    exclude: Union[list[str], None] = _EXCLUDE_OPTION,
+    incremental: bool = Option(
+        False,
+        "--incremental",
+        help="If set only files that are new or have changed since the last incremental run into the output directory are converted",
+    ),
+    resume: bool = _DIR_RESUME_OPTION,
+    root_name: str = _XML_ROOT_OPTION,
+    row_name: str = _XML_ROW_OPTION,
+    attributes: bool = _XML_ATTRIBUTES_OPTION,
+    compress: Union[TextCompression, None] = _DIR_COMPRESS_OPTION,
+    compress_level: Union[int, None] = _COMPRESS_LEVEL_OPTION,
+    compress_threads: Union[int, None] = _COMPRESS_THREADS_OPTION,
+    memory_map: bool = _MEMORY_MAP_OPTION,
+    dictionary_encode: bool = _DICTIONARY_ENCODE_OPTION,
+    date_format: Union[str, None] = _DATE_FORMAT_OPTION,
+    datetime_format: Union[str, None] = _DATETIME_FORMAT_OPTION,
+    time_format: Union[str, None] = _TIME_FORMAT_OPTION,
+    columns: Union[str, None] = _COLUMNS_OPTION,
+    where: Union[str, None] = _WHERE_OPTION,
+    metrics_file: Union[Path, None] = _METRICS_FILE_OPTION,
 ) -> None:
     """Convert a directory of sas7bdat or xpt files to xml files."""
-    with console.status("Converting files..."):
-        export_path = output_dir or dir
-        converter_dir_to_xml(
-            dir_path=dir,
-            export_path=export_path,
-            continue_on_error=continue_on_error,
-            verbose=verbose,
+    _check_xml_names(root_name, row_name)
+    codec = _compression(compress, compress_level, compress_threads)
+    _convert_dir(
+        "xml",
+        dir,
+        output_dir,
+        continue_on_error,
+        verbose,
+        jobs,
+        recursive,
+        include,
+        exclude,
+        incremental,
+        resume,
+        metrics_file,
+        ConversionOptions(
+            columns=_split_columns(columns),
+            where=where,
+            memory_map=memory_map,
+            dictionary_encode=dictionary_encode,
+            date_format=date_format,
+            datetime_format=datetime_format,
+            time_format=time_format,
+            compress=codec,
+            compress_level=compress_level,
+            compress_threads=compress_threads,
+            xml_root=root_name,
+            xml_row=row_name,
+            xml_attributes=attributes,
+        ),
+    )
+
+
+@app.command()
+def to_parquet(
+    file_path: Path = Argument(
+        ..., help="Path to the file to convert, - reads it from stdin", show_default=False
+    ),
+    export_file: Path = Argument(
+        ..., help="Path to the new Parquet file, - writes it to stdout", show_default=False
+    ),
+    input_format: Union[InputFormat, None] = _INPUT_FORMAT_OPTION,
+    compression: ParquetCompression = Option(
+        ParquetCompression.snappy,
+        "--compression",
+        help="The compression to use for the Parquet file",
+    ),
+    row_group_size: int = Option(
+        DEFAULT_CHUNK_SIZE,
+        "--row-group-size",
+        min=1,
+        help="The number of rows to read and write to each row group at a time",
+    ),
+    memory_map: bool = _MEMORY_MAP_OPTION,
+    dictionary_encode: bool = _DICTIONARY_ENCODE_OPTION,
+    columns: Union[str, None] = _COLUMNS_OPTION,
+    where: Union[str, None] = _WHERE_OPTION,
+    shards: int = _SHARDS_OPTION,
+    concat: bool = _CONCAT_OPTION,
+    buffer_chunks: Union[int, None] = _BUFFER_CHUNKS_OPTION,
+    cache: bool = _CACHE_OPTION,
+    cache_dir: Union[Path, None] = _CACHE_DIR_OPTION,
+    cache_max_size: str = _CACHE_MAX_SIZE_OPTION,
+    metrics_file: Union[Path, None] = _METRICS_FILE_OPTION,
+) -> None:
+    """Convert a sas7bdat or xpt file to a Parquet file."""
+    with err_console.status("Converting file..."):
+        _check_source(file_path, input_format)
+
+        if export_file != STDIO and export_file.suffix != ".parquet":
+            exit("The export file must be a parquet file")
+
+        options = ConversionOptions(
+            chunk_size=row_group_size,
+            codec=compression.value,
+            columns=_split_columns(columns),
+            where=where,
+            memory_map=memory_map,
+            dictionary_encode=dictionary_encode,
+            buffer_chunks=buffer_chunks,
+            input_format=input_format.value if input_format else None,
+        )
+        _convert_file(
+            "parquet",
+            file_path,
+            export_file,
+            options,
+            metrics_file,
+            shards,
+            concat,
+            cache=_conversion_cache(cache_dir, cache_max_size) if cache else None,
         )
 
 
+@app.command()
+def dir_to_parquet(
+    dir: Path = Argument(
+        ..., help="Path to the directory to convert", exists=True, show_default=False
+    ),
+    output_dir: Union[Path, None] = Option(
+        None,
+        "--output-dir",
+        "-o",
+        help="Path to the directory to save the output files. Default = The same directory as dir",
+        show_default=False,
+    ),
+    continue_on_error: bool = Option(
+        False,
+        "--continue-on-error",
+        "-c",
+        help="If set conversion will continue after failures",
+    ),
+    verbose: bool = Option(
+        False, "--verbose", "-v", help="If set the amount of information printed is increased."
+    ),
+    jobs: int = Option(
+        1,
+        "--jobs",
+        "-j",
+        min=0,
+        help="The number of files to convert in parallel. 0 = One per CPU",
+    ),
+    recursive: bool = _RECURSIVE_OPTION,
+    include: Union[list[str], None] = _INCLUDE_OPTION,
+    exclude: Union[list[str], None] = _EXCLUDE_OPTION,
+    incremental: bool = Option(
+        False,
+        "--incremental",
+        help="If set only files that are new or have changed since the last incremental run into the output directory are converted",
+    ),
+    resume: bool = _DIR_RESUME_OPTION,
+    compression: ParquetCompression = Option(
+        ParquetCompression.snappy,
+        "--compression",
+        help="The compression to use for the Parquet files",
+    ),
+    row_group_size: int = Option(
+        DEFAULT_CHUNK_SIZE,
+        "--row-group-size",
+        min=1,
+        help="The number of rows to read and write to each row group at a time",
+    ),
+    memory_map: bool = _MEMORY_MAP_OPTION,
+    dictionary_encode: bool = _DICTIONARY_ENCODE_OPTION,
+    columns: Union[str, None] = _COLUMNS_OPTION,
+    where: Union[str, None] = _WHERE_OPTION,
+    metrics_file: Union[Path, None] = _METRICS_FILE_OPTION,
+) -> None:
+    """Convert a directory of sas7bdat or xpt files to Parquet files."""
+    _convert_dir(
+        "parquet",
+        dir,
+        output_dir,
+        continue_on_error,
+        verbose,
+        jobs,
+        recursive,
+        include,
+        exclude,
+        incremental,
+        resume,
+        metrics_file,
+        ConversionOptions(
+            chunk_size=row_group_size,
+            codec=compression.value,
+            columns=_split_columns(columns),
+            where=where,
+            memory_map=memory_map,
+            dictionary_encode=dictionary_encode,
+        ),
+    )
+
+
+@app.command()
+def to_arrow(
+    file_path: Path = Argument(
+        ..., help="Path to the file to convert, - reads it from stdin", show_default=False
+    ),
+    export_file: Path = Argument(
+        ..., help="Path to the new Arrow file, - writes it to stdout", show_default=False
+    ),
+    input_format: Union[InputFormat, None] = _INPUT_FORMAT_OPTION,
+    compression: ArrowCompression = Option(
+        ArrowCompression.none,
+        "--compression",
+        help="The compression to use for the Arrow file",
+    ),
+    batch_size: int = Option(
+        DEFAULT_CHUNK_SIZE,
+        "--batch-size",
+        min=1,
+        help="The number of rows to read and write to each record batch at a time",
+    ),
+    memory_map: bool = _MEMORY_MAP_OPTION,
+    dictionary_encode: bool = _DICTIONARY_ENCODE_OPTION,
+    columns: Union[str, None] = _COLUMNS_OPTION,
+    where: Union[str, None] = _WHERE_OPTION,
+    shards: int = _SHARDS_OPTION,
+    concat: bool = _CONCAT_OPTION,
+    buffer_chunks: Union[int, None] = _BUFFER_CHUNKS_OPTION,
+    cache: bool = _CACHE_OPTION,
+    cache_dir: Union[Path, None] = _CACHE_DIR_OPTION,
+    cache_max_size: str = _CACHE_MAX_SIZE_OPTION,
+    metrics_file: Union[Path, None] = _METRICS_FILE_OPTION,
+) -> None:
+    """Convert a sas7bdat or xpt file to an Arrow IPC file."""
+    with err_console.status("Converting file..."):
+        _check_source(file_path, input_format)
+
+        if export_file != STDIO and export_file.suffix != ".arrow":
+            exit("The export file must be an arrow file")
+
+        options = ConversionOptions(
+            chunk_size=batch_size,
+            codec=compression.value,
+            columns=_split_columns(columns),
+            where=where,
+            memory_map=memory_map,
+            dictionary_encode=dictionary_encode,
+            buffer_chunks=buffer_chunks,
+            input_format=input_format.value if input_format else None,
+        )
+        _convert_file(
+            "arrow",
+            file_path,
+            export_file,
+            options,
+            metrics_file,
+            shards,
+            concat,
+            cache=_conversion_cache(cache_dir, cache_max_size) if cache else None,
+        )
+
+
+@app.command()
+def dir_to_arrow(
+    dir: Path = Argument(
+        ..., help="Path to the directory to convert", exists=True, show_default=False
+    ),
+    output_dir: Union[Path, None] = Option(
+        None,
+        "--output-dir",
+        "-o",
+        help="Path to the directory to save the output files. Default = The same directory as dir",
+        show_default=False,
+    ),
+    continue_on_error: bool = Option(
+        False,
+        "--continue-on-error",
+        "-c",
+        help="If set conversion will continue after failures",
+    ),
+    verbose: bool = Option(
+        False, "--verbose", "-v", help="If set the amount of information printed is increased."
+    ),
+    jobs: int = Option(
+        1,
+        "--jobs",
+        "-j",
+        min=0,
+        help="The number of files to convert in parallel. 0 = One per CPU",
+    ),
+    recursive: bool = _RECURSIVE_OPTION,
+    include: Union[list[str], None] = _INCLUDE_OPTION,
+    exclude: Union[list[str], None] = _EXCLUDE_OPTION,
+    incremental: bool = Option(
+        False,
+        "--incremental",
+        help="If set only files that are new or have changed since the last incremental run into the output directory are converted",
+    ),
+    resume: bool = _DIR_RESUME_OPTION,
+    compression: ArrowCompression = Option(
+        ArrowCompression.none,
+        "--compression",
+        help="The compression to use for the Arrow files",
+    ),
+    batch_size: int = Option(
+        DEFAULT_CHUNK_SIZE,
+        "--batch-size",
+        min=1,
+        help="The number of rows to read and write to each record batch at a time",
+    ),
+    memory_map: bool = _MEMORY_MAP_OPTION,
+    dictionary_encode: bool = _DICTIONARY_ENCODE_OPTION,
+    columns: Union[str, None] = _COLUMNS_OPTION,
+    where: Union[str, None] = _WHERE_OPTION,
+    metrics_file: Union[Path, None] = _METRICS_FILE_OPTION,
+) -> None:
+    """Convert a directory of sas7bdat or xpt files to Arrow IPC files."""
+    _convert_dir(
+        "arrow",
+        dir,
+        output_dir,
+        continue_on_error,
+        verbose,
+        jobs,
+        recursive,
+        include,
+        exclude,
+        incremental,
+        resume,
+        metrics_file,
+        ConversionOptions(
+            chunk_size=batch_size,
+            codec=compression.value,
+            columns=_split_columns(columns),
+            where=where,
+            memory_map=memory_map,
+            dictionary_encode=dictionary_encode,
+        ),
+    )
+
+
+@app.command()
+def convert(
+    file_path: Path = Argument(..., help="Path to the file to convert", show_default=False),
+    to: list[str] = Option(
+        ...,
+        "--to",
+        help=f"A FORMAT:PATH to write, can be repeated to write several files from a single read of the file. FORMAT is one of {', '.join(EXPORT_SUFFIXES)}",
+        show_default=False,
+    ),
+    chunk_size: Union[int, None] = Option(
+        None,
+        "--chunk-size",
+        min=1,
+        help="The number of rows read at a time when writing more than one file",
+        show_default=False,
+    ),
+    memory_map: bool = _MEMORY_MAP_OPTION,
+    dictionary_encode: bool = _DICTIONARY_ENCODE_OPTION,
+    date_format: Union[str, None] = _DATE_FORMAT_OPTION,
+    datetime_format: Union[str, None] = _DATETIME_FORMAT_OPTION,
+    time_format: Union[str, None] = _TIME_FORMAT_OPTION,
+    columns: Union[str, None] = _COLUMNS_OPTION,
+    where: Union[str, None] = _WHERE_OPTION,
+    buffer_chunks: Union[int, None] = _BUFFER_CHUNKS_OPTION,
+    metrics_file: Union[Path, None] = _METRICS_FILE_OPTION,
+) -> None:
+    """Convert a sas7bdat or xpt file to one or more file types, reading it only once."""
+    with err_console.status("Converting file..."):
+        if file_path.suffix != ".sas7bdat" and file_path.suffix != ".xpt":
+            exit("File must be either a sas7bdat file or a xpt file")
+
+        targets = _parse_targets(to)
+        for file_type, export_file in targets:
+            if not is_export_file(export_file, file_type):
+                exit(f"The export file {export_file} must be a {file_type} file")
+
+        if len({x[1].resolve() for x in targets}) != len(targets):
+            exit("Each --to target must be a different file")
+
+        options = ConversionOptions(
+            chunk_size=chunk_size,
+            columns=_split_columns(columns),
+            where=where,
+            memory_map=memory_map,
+            dictionary_encode=dictionary_encode,
+            date_format=date_format,
+            datetime_format=datetime_format,
+            time_format=time_format,
+            buffer_chunks=buffer_chunks,
+        )
+        _convert_targets(file_path, targets, options, metrics_file)
+
+
+@app.command()
+def dir_convert(
+    dir: Path = Argument(
+        ..., help="Path to the directory to convert", exists=True, show_default=False
+    ),
+    to: list[str] = Option(
+        ...,
+        "--to",
+        help=f"A FORMAT or FORMAT:DIR to write, can be repeated to write several file types from a single read of each file. FORMAT is one of {', '.join(EXPORT_SUFFIXES)}. Default DIR = --output-dir",
+        show_default=False,
+    ),
+    output_dir: Union[Path, None] = Option(
+        None,
+        "--output-dir",
+        "-o",
+        help="Path to the directory to save the output files. Default = The same directory as dir",
+        show_default=False,
+    ),
+    continue_on_error: bool = Option(
+        False,
+        "--continue-on-error",
+        "-c",
+        help="If set conversion will continue after failures",
+    ),
+    verbose: bool = Option(
+        False, "--verbose", "-v", help="If set the amount of information printed is increased."
+    ),
+    jobs: int = Option(
+        1,
+        "--jobs",
+        "-j",
+        min=0,
+        help="The number of files to convert in parallel. 0 = One per CPU",
+    ),
+    recursive: bool = _RECURSIVE_OPTION,
+    include: Union[list[str], None] = _INCLUDE_OPTION,
+    exclude: Union[list[str], None] = _EXCLUDE_OPTION,
+    chunk_size: Union[int, None] = Option(
+        None,
+        "--chunk-size",
+        min=1,
+        help="The number of rows read at a time when writing more than one file type",
+        show_default=False,
+    ),
+    memory_map: bool = _MEMORY_MAP_OPTION,
+    dictionary_encode: bool = _DICTIONARY_ENCODE_OPTION,
+    date_format: Union[str, None] = _DATE_FORMAT_OPTION,
+    datetime_format: Union[str, None] = _DATETIME_FORMAT_OPTION,
+    time_format: Union[str, None] = _TIME_FORMAT_OPTION,
+    columns: Union[str, None] = _COLUMNS_OPTION,
+    where: Union[str, None] = _WHERE_OPTION,
+    metrics_file: Union[Path, None] = _METRICS_FILE_OPTION,
+) -> None:
+    """Convert a directory of sas7bdat or xpt files to one or more file types, reading each once."""
+    targets = _parse_targets(to, output_dir or dir)
+    if len({(export_suffix(x[0]), x[1].resolve()) for x in targets}) != len(targets):
+        exit("Each --to target must write to a different file type or directory")
+
+    _convert_dir_targets(
+        dir,
+        targets,
+        continue_on_error,
+        verbose,
+        jobs,
+        recursive,
+        include,
+        exclude,
+        False,
+        False,
+        metrics_file,
+        ConversionOptions(
+            chunk_size=chunk_size,
+            columns=_split_columns(columns),
+            where=where,
+            memory_map=memory_map,
+            dictionary_encode=dictionary_encode,
+            date_format=date_format,
+            datetime_format=datetime_format,
+            time_format=time_format,
+        ),
+    )
+
+
+@app.command()
+def inspect(
+    file_path: Path = Argument(..., help="Path to the file to inspect", show_default=False),
+    output_json: bool = Option(
+        False, "--json", help="If set the metadata is printed as json instead of tables"
+    ),
+) -> None:
+    """Show the row count, columns, and other metadata of a sas7bdat or xpt file without reading its rows."""
+    if file_path.suffix != ".sas7bdat" and file_path.suffix != ".xpt":
+        exit("File must be either a sas7bdat file or a xpt file")
+
+    from sas7bdat_converter_cli.inspection import inspect_file
+
+    info = inspect_file(file_path)
+    if output_json:
+        echo(json.dumps(asdict(info), indent=2))
+        return
+
+    summary = Table(show_header=False)
+    summary.add_column("Field")
+    summary.add_column("Value")
+    for field, value in (
+        ("File", info.file_path),
+        ("Format", info.format),
+        ("Name", info.name),
+        ("Label", info.label),
+        ("Rows", f"{info.rows:,}"),
+        ("Columns", f"{len(info.columns):,}"),
+        ("Encoding", info.encoding),
+        ("Compression", info.compression),
+        ("Created", info.created),
+        ("Modified", info.modified),
+        ("Size MB", f"{info.size_bytes / 1_000_000:.1f}"),
+    ):
+        summary.add_row(field, value or "")
+    console.print(summary)
+
+    columns = Table()
+    for header in ("Name", "Type", "Format", "Length", "Label"):
+        columns.add_column(header, justify="right" if header == "Length" else "left")
+    for column in info.columns:
+        columns.add_row(column.name, column.type, column.format, str(column.length), column.label)
+    console.print(columns)
+
+
+@app.command()
+def dir_inspect(
+    dir: Path = Argument(
+        ..., help="Path to the directory to inspect", exists=True, show_default=False
+    ),
+    jobs: int = Option(
+        0,
+        "--jobs",
+        "-j",
+        min=0,
+        help="The number of files to inspect in parallel. 0 = The default number of threads",
+    ),
+    output_json: bool = Option(
+        False,
+        "--json",
+        help="If set the metadata of each file is printed as json instead of a table",
+    ),
+) -> None:
+    """Show the row count, columns, and other metadata of each sas7bdat or xpt file in a directory."""
+    from sas7bdat_converter_cli.inspection import inspect_dir
+
+    results = inspect_dir(dir, jobs)
+    if output_json:
+        echo(json.dumps([x.to_dict() for x in results], indent=2))
+    else:
+        table = Table()
+        for header in ("File", "Format", "Rows", "Columns", "Encoding", "Size MB"):
+            table.add_column(
+                header, justify="right" if header in ("Rows", "Columns", "Size MB") else "left"
+            )
+        for result in results:
+            if result.info is None:
+                table.add_row(result.source.name, f"Error: {result.error}", "", "", "", "")
+            else:
+                info = result.info
+                table.add_row(
+                    result.source.name,
+                    info.format,
+                    f"{info.rows:,}",
+                    f"{len(info.columns):,}",
+                    info.encoding or "",
+                    f"{info.size_bytes / 1_000_000:.1f}",
+                )
+        console.print(table)
+
+    if not all(x.succeeded for x in results):
+        raise Exit(1)
+
+
+@cache_app.command("stats")
+def cache_stats(
+    cache_dir: Union[Path, None] = _CACHE_DIR_OPTION,
+    cache_max_size: str = _CACHE_MAX_SIZE_OPTION,
+    output_json: bool = Option(
+        False, "--json", help="If set the statistics are printed as json instead of a table"
+    ),
+) -> None:
+    """Show the number of files in the conversion cache and their size."""
+    conversion_cache = _conversion_cache(cache_dir, cache_max_size)
+    stats = conversion_cache.stats()
+    if output_json:
+        echo(json.dumps({"cache_dir": str(conversion_cache.path), **asdict(stats)}, indent=2))
+        return
+
+    table = Table(show_header=False)
+    table.add_column("Field")
+    table.add_column("Value")
+    table.add_row("Directory", str(conversion_cache.path))
+    table.add_row("Files", f"{stats.entries:,}")
+    table.add_row("Size MB", f"{stats.size_bytes / 1_000_000:.1f}")
+    table.add_row("Maximum size MB", f"{stats.max_bytes / 1_000_000:.1f}")
+    console.print(table)
+
+
+@cache_app.command("clear")
+def cache_clear(cache_dir: Union[Path, None] = _CACHE_DIR_OPTION) -> None:
+    """Remove every file from the conversion cache."""
+    conversion_cache = ConversionCache(cache_dir or default_cache_dir())
+    removed = conversion_cache.clear()
+    console.print(f"Removed {removed} files from {conversion_cache.path}")
+
+
+@app.command()
+def bench(
+    input: Union[list[Path], None] = Option(
+        None,
+        "--input",
+        "-i",
+        help="A sas7bdat or xpt file to benchmark, can be used more than once. Default = A synthetic xpt file",
+        exists=True,
+        dir_okay=False,
+        show_default=False,
+    ),
+    command: Union[list[BenchCommand], None] = Option(
+        None,
+        "--command",
+        help="A command to benchmark, can be used more than once. Default = All to-* commands",
+        show_default=False,
+    ),
+    rows: int = Option(100_000, "--rows", min=1, help="The number of rows in the synthetic file"),
+    column_count: int = Option(
+        20, "--column-count", min=1, help="The number of columns in the synthetic file"
+    ),
+    string_ratio: float = Option(
+        0.25,
+        "--string-ratio",
+        min=0,
+        max=1,
+        help="The fraction of the synthetic columns that are character columns",
+    ),
+    date_ratio: float = Option(
+        0.0,
+        "--date-ratio",
+        min=0,
+        max=1,
+        help="The fraction of the synthetic columns that are date columns",
+    ),
+    string_length: int = Option(
+        16, "--string-length", min=1, help="The maximum length of the synthetic character values"
+    ),
+    string_cardinality: Union[int, None] = Option(
+        None,
+        "--string-cardinality",
+        min=1,
+        help="The number of distinct values in each synthetic character column. Default = Every value is random",
+        show_default=False,
+    ),
+    repeat: int = Option(
+        1, "--repeat", min=1, help="Run each command this many times and report the fastest"
+    ),
+    date_format: Union[str, None] = Option(
+        None,
+        "--date-format",
+        help="Pass this --date-format to the commands that support it",
+        show_default=False,
+    ),
+    datetime_format: Union[str, None] = Option(
+        None,
+        "--datetime-format",
+        help="Pass this --datetime-format to the commands that support it",
+        show_default=False,
+    ),
+    dictionary_encode: bool = Option(
+        False,
+        "--dictionary-encode",
+        help="If set each command is also run with --dictionary-encode to compare the two",
+    ),
+    work_dir: Union[Path, None] = Option(
+        None,
+        "--work-dir",
+        help="Directory for the synthetic and converted files. Default = A temporary directory",
+        file_okay=False,
+        show_default=False,
+    ),
+    output_json: Union[Path, None] = Option(
+        None,
+        "--output-json",
+        help="Also save the results to this json file",
+        show_default=False,
+    ),
+) -> None:
+    """Time the to-* commands and report rows/sec, MB/sec, and peak memory use."""
+    for file_path in input or []:
+        if file_path.suffix != ".sas7bdat" and file_path.suffix != ".xpt":
+            exit("File must be either a sas7bdat file or a xpt file")
+
+    from sas7bdat_converter_cli.bench import DatasetSpec, run_bench, write_synthetic_xpt
+
+    commands = [x.value for x in command or BenchCommand]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        bench_dir = work_dir or Path(temp_dir)
+        bench_dir.mkdir(parents=True, exist_ok=True)
+        sources = list(input or [])
+        if not sources:
+            spec = DatasetSpec(
+                rows=rows,
+                columns=column_count,
+                string_ratio=string_ratio,
+                date_ratio=date_ratio,
+                string_length=string_length,
+                string_cardinality=string_cardinality,
+            )
+            with console.status("Generating synthetic file..."):
+                sources.append(bench_dir / f"{spec.name}.xpt")
+                write_synthetic_xpt(spec, sources[0])
+
+        with console.status("Running benchmarks..."):
+            try:
+                results = run_bench(
+                    sources,
+                    commands,
+                    bench_dir,
+                    repeat=repeat,
+                    date_format=date_format,
+                    datetime_format=datetime_format,
+                    dictionary_encode=dictionary_encode,
+                )
+            except RuntimeError as e:
+                exit(str(e))
+
+    table = Table()
+    for header in ("File", "Command", "Rows", "Seconds", "Rows/sec", "MB/sec", "Peak RSS MB"):
+        table.add_column(header, justify="left" if header in ("File", "Command") else "right")
+    for result in results:
+        table.add_row(
+            result.dataset,
+            result.command,
+            f"{result.rows:,}",
+            f"{result.seconds:.3f}",
+            f"{result.rows_per_second:,.0f}",
+            f"{result.mb_per_second:.1f}",
+            "" if result.peak_rss_bytes is None else f"{result.peak_rss_bytes / 1_000_000:.1f}",
+        )
+    console.print(table)
+
+    if output_json:
+        with open(output_json, "w") as f:
+            json.dump(
+                [
+                    {
+                        **asdict(x),
+                        "rows_per_second": x.rows_per_second,
+                        "mb_per_second": x.mb_per_second,
+                    }
+                    for x in results
+                ],
+                f,
+                indent=2,
+            )
+
+
+@app.command()
+def serve(
+    socket: Union[Path, None] = Option(
+        None,
+        "--socket",
+        help="Listen for jobs on this Unix socket instead of reading them from stdin",
+        show_default=False,
+    ),
+    jobs: int = Option(
+        1,
+        "--jobs",
+        "-j",
+        min=0,
+        help="The number of files to convert in parallel. 0 = One per CPU",
+    ),
+) -> None:
+    """Convert the files in newline delimited json jobs, keeping the workers running between jobs.
+
+    Each job is a json object such as {"id": 1, "command": "to-csv", "file_path": "a.xpt",
+    "export_file": "a.csv", "options": {"chunk_size": 10000}}. A json result with the id, the
+    status, and the metrics for the file is written back for each job as it finishes.
+    """
+    if socket is not None and sys.platform == "win32":
+        exit("--socket isn't supported on Windows, which has no Unix sockets")
+
+    from sas7bdat_converter_cli.server import JobServer
+
+    with JobServer(jobs) as job_server:
+        if socket is None:
+            job_server.serve_stream(sys.stdin.buffer, sys.stdout.buffer)
+            return
+
+        with job_server.socket_server(socket) as unix_server:
+            Console(stderr=True).print(f"Listening on {socket}")
+            try:
+                unix_server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                socket.unlink(missing_ok=True)
+
+
+def _compression(
+    compress: Union[TextCompression, None],
+    level: Union[int, None],
+    threads: Union[int, None],
+    export_file: Union[Path, None] = None,
+) -> Union[str, None]:
+    """The codec to compress text files with, without --compress it's taken from the suffix of
+    the export file.
+    """
+    if compress is None:
+        codec = compression_of(export_file) if export_file else None
+    else:
+        codec = None if compress == TextCompression.none else compress.value
+
+    try:
+        check_compression(codec, level, threads)
+    except ValueError as e:
+        exit(str(e))
+
+    return codec
+
+
+def _check_source(file_path: Path, input_format: Union[InputFormat, None]) -> None:
+    if input_format is not None:
+        return
+
+    if file_path == STDIO:
+        exit("--input-format is required when reading from stdin")
+
+    if file_path.suffix != ".sas7bdat" and file_path.suffix != ".xpt":
+        exit("File must be either a sas7bdat file or a xpt file")
+
+
+def _check_xml_names(root_name: str, row_name: str) -> None:
+    for option, name in (("--root-name", root_name), ("--row-name", row_name)):
+        if not is_xml_name(name):
+            exit(f"{option} must be a valid XML element name, {name} isn't")
+
+
+def _ending_in(codec: Union[str, None]) -> str:
+    return f" ending in {COMPRESSION_SUFFIXES[codec]}" if codec else ""
+
+
+def _conversion_cache(cache_dir: Union[Path, None], max_size: str) -> ConversionCache:
+    try:
+        max_bytes = parse_size(max_size)
+    except ValueError as e:
+        exit(str(e))
+
+    return ConversionCache(cache_dir or default_cache_dir(), max_bytes)
+
+
+def _split_columns(columns: Union[str, None]) -> Union[tuple[str, ...], None]:
+    if columns is None:
+        return None
+    return tuple(x.strip() for x in columns.split(",") if x.strip())
+
+
+def _parse_targets(targets: list[str], dir: Union[Path, None] = None) -> list[tuple[str, Path]]:
+    """Parse FORMAT:PATH targets, when converting a directory the path defaults to `dir`."""
+    parsed = []
+    for target in targets:
+        file_type, _, path = target.partition(":")
+        file_type = file_type.strip().lower()
+        if file_type not in EXPORT_SUFFIXES:
+            exit(
+                f"Unknown format {file_type!r} in {target!r}, must be one of "
+                f"{', '.join(EXPORT_SUFFIXES)}"
+            )
+
+        export_path = Path(path) if path else dir
+        if export_path is None:
+            exit(f"{target!r} must be in the form FORMAT:PATH")
+
+        parsed.append((file_type, export_path))
+
+    if not parsed:
+        exit("At least one --to target is required")
+
+    return parsed
+
+
+def _convert_file(
+    file_type: str,
+    file_path: Path,
+    export_file: Path,
+    options: ConversionOptions,
+    metrics_file: Union[Path, None],
+    shards: int = 1,
+    concat: bool = False,
+    resume: bool = False,
+    cache: Union[ConversionCache, None] = None,
+) -> None:
+    if concat and shards == 1:
+        exit("--concat can only be used with --shards")
+
+    if concat:
+        from sas7bdat_converter_cli.writers import WRITERS
+
+        if not WRITERS[file_type].concatenates:
+            exit(f"--concat isn't supported for {file_type} files")
+
+    if resume and shards > 1:
+        exit("--resume can't be used with --shards")
+
+    if cache and shards > 1:
+        exit("--cache can't be used with --shards")
+
+    targets = [(file_type, export_file)]
+    if STDIO in (file_path, export_file):
+        for option, used in (("--shards", shards > 1), ("--resume", resume), ("--cache", cache)):
+            if used:
+                exit(f"{option} can't be used with stdin or stdout")
+        if file_path == STDIO and options.memory_map:
+            exit("--memory-map can't be used with stdin")
+
+        _log_metrics(
+            file_path,
+            targets,
+            metrics_file,
+            lambda: [_convert_stream(file_type, file_path, export_file, options)],
+        )
+        return
+
+    from sas7bdat_converter_cli.conversion import convert_shards, convert_targets
+
+    if shards == 1:
+        _log_metrics(
+            file_path,
+            targets,
+            metrics_file,
+            lambda: convert_targets(file_path, targets, options, resume=resume, cache=cache),
+        )
+    else:
+        _log_metrics(
+            file_path,
+            targets,
+            metrics_file,
+            lambda: [
+                convert_shards(
+                    file_type, file_path, export_file, options, shards=shards, concat=concat
+                )
+            ],
+        )
+
+
+def _convert_stream(
+    file_type: str, file_path: Path, export_file: Path, options: ConversionOptions
+) -> FileMetrics:
+    from sas7bdat_converter_cli.conversion import convert_stream
+
+    return convert_stream(
+        file_type,
+        sys.stdin.buffer if file_path == STDIO else file_path,
+        sys.stdout.buffer if export_file == STDIO else export_file,
+        options,
+    )
+
+
+def _convert_targets(
+    file_path: Path,
+    targets: list[tuple[str, Path]],
+    options: ConversionOptions,
+    metrics_file: Union[Path, None],
+) -> None:
+    from sas7bdat_converter_cli.conversion import convert_targets
+
+    _log_metrics(
+        file_path, targets, metrics_file, lambda: convert_targets(file_path, targets, options)
+    )
+
+
+def _log_metrics(
+    file_path: Path,
+    targets: list[tuple[str, Path]],
+    metrics_file: Union[Path, None],
+    convert: Callable[[], list[FileMetrics]],
+) -> None:
+    """Run a conversion and append its metrics to the metrics file, including when it fails.
+
+    An unknown column or an invalid --where expression exits with its message instead of a
+    traceback.
+    """
+    from sas7bdat_converter_cli.conversion import error_message
+    from sas7bdat_converter_cli.reader import SelectionError
+
+    try:
+        metrics = convert()
+    except Exception as e:
+        if metrics_file:
+            for file_type, export_file in targets:
+                MetricsLog(metrics_file).append(
+                    FileMetrics(
+                        str(file_path),
+                        str(export_file),
+                        file_type,
+                        status="failed",
+                        error=error_message(e),
+                    )
+                )
+        if isinstance(e, SelectionError):
+            exit(str(e))
+        raise
+
+    if metrics_file:
+        for x in metrics:
+            MetricsLog(metrics_file).append(x)
+
+
+def _convert_dir(
+    file_type: str,
+    dir: Path,
+    output_dir: Union[Path, None],
+    continue_on_error: bool,
+    verbose: bool,
+    jobs: int,
+    recursive: bool,
+    include: Union[list[str], None],
+    exclude: Union[list[str], None],
+    incremental: bool,
+    resume: bool,
+    metrics_file: Union[Path, None],
+    options: ConversionOptions = ConversionOptions(),
+) -> None:
+    _convert_dir_targets(
+        dir,
+        [(file_type, output_dir or dir)],
+        continue_on_error,
+        verbose,
+        jobs,
+        recursive,
+        include,
+        exclude,
+        incremental,
+        resume,
+        metrics_file,
+        options,
+    )
+
+
+def _convert_dir_targets(
+    dir: Path,
+    targets: list[tuple[str, Path]],
+    continue_on_error: bool,
+    verbose: bool,
+    jobs: int,
+    recursive: bool,
+    include: Union[list[str], None],
+    exclude: Union[list[str], None],
+    incremental: bool,
+    resume: bool,
+    metrics_file: Union[Path, None],
+    options: ConversionOptions,
+) -> None:
+    from sas7bdat_converter_cli.conversion import convert_dir
+    from sas7bdat_converter_cli.reader import SelectionError
+
+    with console.status("Converting files..."):
+        try:
+            summary = convert_dir(
+                dir,
+                targets,
+                options=options,
+                jobs=jobs,
+                continue_on_error=continue_on_error,
+                incremental=incremental,
+                resume=resume,
+                metrics_log=MetricsLog(metrics_file) if metrics_file else None,
+                recursive=recursive,
+                include=include or (),
+                exclude=exclude or (),
+            )
+        except SelectionError as e:
+            exit(str(e))
+
+    if verbose:
+        for result in summary.failed:
+            console.print(f"Error converting {result.source}: {result.error}")
+
+    message = f"Converted {summary.converted} of {len(summary.results)} files"
+    if summary.skipped:
+        message += f", {summary.skipped} unchanged"
+    if summary.failed:
+        message += f", {len(summary.failed)} failed"
+    console.print(message)
+
+
 @app.callback(invoke_without_command=True)
 def main(
     version: Union[bool, None] = Option(
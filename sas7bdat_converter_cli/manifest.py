@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+from sas7bdat_converter_cli.options import ConversionOptions
+
+MANIFEST_NAME = ".sas7bdat-converter-manifest.json"
+
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class Fingerprint:
+    """The size, modification time, and content hash of a source file."""
+
+    size: int
+    mtime_ns: int
+    sha256: str
+
+    @classmethod
+    def from_file(cls, file_path: Path) -> Fingerprint:
+        stat = file_path.stat()
+        return cls(size=stat.st_size, mtime_ns=stat.st_mtime_ns, sha256=hash_file(file_path))
+
+
+@dataclass
+class ManifestEntry:
+    """What a source file looked like when it was converted, and how it was converted."""
+
+    source: Fingerprint
+    export_file: str
+    export_size: int
+    file_type: str
+    options: dict[str, Any]
+
+
+class Manifest:
+    """Records the files converted into an output directory so unchanged files can be skipped.
+
+    The manifest is stored as json in the output directory. Entries are keyed by the path of the
+    source file relative to the directory being converted.
+    """
+
+    def __init__(self, path: Path, entries: dict[str, ManifestEntry] | None = None) -> None:
+        self.path = path
+        self.entries = entries or {}
+
+    @classmethod
+    def load(cls, output_dir: Path) -> Manifest:
+        """Load the manifest from an output directory, starting a new one if it can't be read."""
+        path = output_dir / MANIFEST_NAME
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            entries = {
+                key: ManifestEntry(**{**value, "source": Fingerprint(**value["source"])})
+                for key, value in data["files"].items()
+            }
+        except (OSError, ValueError, KeyError, TypeError):
+            entries = {}
+
+        return cls(path, entries)
+
+    def is_current(
+        self, key: str, source: Path, export_file: Path, file_type: str, options: ConversionOptions
+    ) -> bool:
+        """Check if the export file is still a valid conversion of the source file.
+
+        The source is only hashed when its size matches but its modification time has changed.
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return False
+
+        if (
+            entry.file_type != file_type
+            or entry.options != options_dict(options)
+            or entry.export_file != export_file.name
+        ):
+            return False
+
+        try:
+            stat = source.stat()
+            export_size = export_file.stat().st_size
+        except OSError:
+            return False
+
+        if stat.st_size != entry.source.size or export_size != entry.export_size:
+            return False
+
+        if stat.st_mtime_ns == entry.source.mtime_ns:
+            return True
+
+        if hash_file(source) != entry.source.sha256:
+            return False
+
+        # Only the modification time changed, remember it so the file isn't hashed again
+        self.entries[key].source = Fingerprint(stat.st_size, stat.st_mtime_ns, entry.source.sha256)
+        return True
+
+    def record(
+        self,
+        key: str,
+        fingerprint: Fingerprint,
+        export_file: Path,
+        file_type: str,
+        options: ConversionOptions,
+    ) -> None:
+        self.entries[key] = ManifestEntry(
+            source=fingerprint,
+            export_file=export_file.name,
+            export_size=export_file.stat().st_size,
+            file_type=file_type,
+            options=options_dict(options),
+        )
+
+    def remove(self, key: str) -> None:
+        self.entries.pop(key, None)
+
+    def save(self) -> None:
+        """Write the manifest, replacing the previous one in a single step."""
+        data = {"files": {key: asdict(value) for key, value in sorted(self.entries.items())}}
+        temp_path = self.path.with_name(f"{self.path.name}.tmp")
+        with open(temp_path, "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(temp_path, self.path)
+
+
+def options_dict(options: ConversionOptions) -> dict[str, Any]:
+    # Round trip through json so the options compare equal to the ones loaded from the manifest
+    return json.loads(json.dumps(asdict(options)))
+
+
+def hash_file(file_path: Path) -> str:
+    """Calculate the sha256 hash of a file without reading it into memory all at once."""
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while block := f.read(_HASH_BLOCK_SIZE):
+            sha256.update(block)
+
+    return sha256.hexdigest()
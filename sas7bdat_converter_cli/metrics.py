@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import json
+import sys
+import time
+from collections import defaultdict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+
+@dataclass
+class FileMetrics:
+    """Timings, sizes, and memory use recorded while converting a single file.
+
+    `status` is one of converted, skipped, cached, or failed. The read, convert, and write timings are
+    only recorded when the file is streamed, sas7bdat_converter doesn't expose its phases.
+    """
+
+    source: str
+    export_file: str
+    file_type: str
+    status: str = "converted"
+    error: str | None = None
+    rows: int | None = None
+    columns: int | None = None
+    bytes_in: int | None = None
+    bytes_out: int | None = None
+    read_seconds: float | None = None
+    convert_seconds: float | None = None
+    write_seconds: float | None = None
+    total_seconds: float | None = None
+    peak_memory_bytes: int | None = None
+
+
+class PhaseTimer:
+    """Adds up the time spent in each phase of a conversion."""
+
+    def __init__(self) -> None:
+        self.seconds: dict[str, float] = defaultdict(float)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - start
+
+
+class MetricsLog:
+    """Appends the metrics for each file to a JSON Lines file."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    def append(self, metrics: FileMetrics) -> None:
+        # Each record is written with a single call so lines from different runs never interleave
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(asdict(metrics)) + "\n")
+
+
+def reset_peak_memory() -> None:
+    """Reset the peak memory of this process so the next reading only covers what follows.
+
+    Only supported on Linux, elsewhere the peak covers the life of the process.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_memory() -> int | None:
+    """The peak resident set size of this process in bytes."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    try:
+        import resource
+    except ImportError:  # pragma: no cover
+        return None
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes everywhere else
+    return max_rss if sys.platform == "darwin" else max_rss * 1024  # pragma: no cover
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+DEFAULT_CHUNK_SIZE = 65_536
+
+# The number of chunks each stage of a streaming conversion can get ahead of the next one
+DEFAULT_BUFFER_CHUNKS = 2
+
+# The suffixes an export file can have for each file type, the first is used for directories
+EXPORT_SUFFIXES = {
+    "csv": (".csv",),
+    "xlsx": (".xlsx",),
+    "json": (".json",),
+    "ndjson": (".ndjson", ".jsonl", ".json"),
+    "xml": (".xml",),
+    "parquet": (".parquet",),
+    "arrow": (".arrow",),
+}
+
+# A XML element name, letters, digits, _, -, and . that doesn't start with a digit, - or .
+_XML_NAME = re.compile(r"[A-Za-z_][\w.-]*")
+
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst", "bz2": ".bz2", "xz": ".xz"}
+
+
+@dataclass(frozen=True)
+class ConversionOptions:
+    """Options that change how each file is converted.
+
+    With the defaults csv and json files are converted from sas7bdat files by
+    sas7bdat_converter, which reads the full dataset into memory. Setting any of the other
+    options streams the dataset through the export file `chunk_size` rows at a time. xpt files,
+    which are read with XportFile, and xlsx, ndjson, xml, Parquet, and Arrow files are always
+    streamed. Parquet and Arrow files write one row group or record batch per chunk, compressed
+    with `codec`.
+
+    `columns` limits the output to those columns and `where` to the rows matching the expression.
+    `compress` compresses csv, json, ndjson, and xml files as they're written, with
+    `compress_level` and, for zstd, `compress_threads` threads.
+    `memory_map` streams the source from a read only memory mapping of the file.
+    `date_format`, `datetime_format`, and `time_format` are strftime formats used to write those
+    columns as text, they aren't supported for Parquet and Arrow files which keep typed values.
+    `buffer_chunks` is how many chunks reading and decoding can get ahead of writing, each runs
+    in its own thread. 0 runs them one after the other.
+    `xml_root` and `xml_row` name the root and row elements of xml files, and `xml_attributes`
+    writes the columns as attributes of the row elements instead of elements inside them.
+    `input_format`, sas7bdat or xpt, reads the source as that format whatever its suffix.
+    `dictionary_encode` keeps character columns as categoricals while converting, so each
+    distinct value in a chunk is one string, and writes them to Parquet and Arrow files as
+    dictionaries, except for columns that are mostly unique in the first chunk.
+    """
+
+    chunk_size: int | None = None
+    codec: str | None = None
+    columns: tuple[str, ...] | None = None
+    where: str | None = None
+    compress: str | None = None
+    compress_level: int | None = None
+    compress_threads: int | None = None
+    memory_map: bool = False
+    date_format: str | None = None
+    datetime_format: str | None = None
+    time_format: str | None = None
+    buffer_chunks: int | None = None
+    xml_root: str = "root"
+    xml_row: str = "item"
+    xml_attributes: bool = False
+    input_format: str | None = None
+    dictionary_encode: bool = False
+
+    @property
+    def streaming(self) -> bool:
+        return (
+            self.memory_map
+            or self.dictionary_encode
+            or any(
+                x is not None
+                for x in (
+                    self.chunk_size,
+                    self.buffer_chunks,
+                    self.columns,
+                    self.where,
+                    self.compress,
+                    self.date_format,
+                    self.datetime_format,
+                    self.time_format,
+                    self.input_format,
+                )
+            )
+        )
+
+    @property
+    def formats_dates(self) -> bool:
+        return any(
+            x is not None for x in (self.date_format, self.datetime_format, self.time_format)
+        )
+
+
+def export_suffix(file_type: str, compress: str | None = None) -> str:
+    """The suffix for export files of a file type created when converting a directory."""
+    return EXPORT_SUFFIXES[file_type][0] + COMPRESSION_SUFFIXES.get(compress or "", "")
+
+
+def is_export_file(file_path: Path, file_type: str, compress: str | None = None) -> bool:
+    """Check the export file has a suffix for the file type, followed by one for the compression."""
+    compression_suffix = COMPRESSION_SUFFIXES.get(compress or "", "")
+    return file_path.name.endswith(
+        tuple(x + compression_suffix for x in EXPORT_SUFFIXES[file_type])
+    )
+
+
+def compression_of(file_path: Path) -> str | None:
+    """The compression an export file's suffix asks for, output.csv.gz is compressed with gzip."""
+    return next((k for k, v in COMPRESSION_SUFFIXES.items() if file_path.name.endswith(v)), None)
+
+
+def is_xml_name(name: str) -> bool:
+    return _XML_NAME.fullmatch(name) is not None
+
+
+def part_file(export_file: Path, file_type: str, index: int, compress: str | None = None) -> Path:
+    """The path of one shard of an export file, output.csv becomes output.part-0000.csv."""
+    return _add_infix(export_file, file_type, f"part-{index:04d}", compress)
+
+
+def partial_file(export_file: Path, file_type: str, compress: str | None = None) -> Path:
+    """The path an export file is written to before it's complete, output.partial.csv.
+
+    The file keeps the suffix of the export file so the converters accept it.
+    """
+    return _add_infix(export_file, file_type, "partial", compress)
+
+
+def _add_infix(export_file: Path, file_type: str, infix: str, compress: str | None) -> Path:
+    compression_suffix = COMPRESSION_SUFFIXES.get(compress or "", "")
+    suffix = next(
+        (
+            x + compression_suffix
+            for x in EXPORT_SUFFIXES[file_type]
+            if export_file.name.endswith(x + compression_suffix)
+        ),
+        export_file.suffix,
+    )
+    return export_file.with_name(f"{export_file.name[: -len(suffix)]}.{infix}{suffix}")
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import queue
+import threading
+from collections.abc import Generator, Iterator
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+# How long a stage waits for room in a full queue before checking if it should stop
+_PUT_TIMEOUT_SECONDS = 0.1
+
+
+def prefetch(items: Iterator[T], size: int) -> Generator[T, None, None]:
+    """Produce the items of an iterator in a background thread, up to `size` items ahead.
+
+    The queue between the thread and the consumer is bounded so a slow consumer holds the
+    producer back instead of letting items pile up in memory. Exceptions raised producing the
+    items are raised by the consumer. If the consumer stops early the thread stops at its next
+    item and `items` is closed.
+
+    Stages spend most of their time reading files, writing files, or in pandas and pyarrow code
+    that releases the GIL, so the threads run at the same time as the consumer.
+    """
+    buffer: queue.Queue[tuple[str, Any]] = queue.Queue(maxsize=size)
+    stop = threading.Event()
+
+    def put(kind: str, value: Any) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put((kind, value), timeout=_PUT_TIMEOUT_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in items:
+                if not put("item", item):
+                    return
+            put("done", None)
+        except BaseException as e:
+            put("error", e)
+        finally:
+            close = getattr(items, "close", None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            kind, value = buffer.get()
+            if kind == "done":
+                return
+            if kind == "error":
+                raise value
+            yield value
+    finally:
+        stop.set()
+        thread.join()
@@ -0,0 +1,661 @@
+from __future__ import annotations
+
+import io
+import mmap
+import re
+from collections.abc import Generator, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from types import TracebackType
+from typing import IO, Any
+
+import numpy as np
+import pandas as pd
+
+# The formats pandas uses to decide which sas7bdat columns are read as datetimes, the types of the
+# pages that hold rows, and where the header keeps the dataset name and compression
+from pandas.io.sas.sas_constants import (  # type: ignore[import-not-found]
+    dataset_length,
+    dataset_offset,
+    page_data_type,
+    page_meta_types,
+    page_mix_type,
+    rdc_compression,
+    rle_compression,
+    sas_date_formats,
+    sas_datetime_formats,
+)
+
+from sas7bdat_converter_cli.dates import (
+    DatetimeFormatter,
+    sas_dates_to_datetime64,
+    sas_datetimes_to_datetime64,
+    sas_times_to_datetime64,
+)
+from sas7bdat_converter_cli.metrics import PhaseTimer
+from sas7bdat_converter_cli.pipeline import prefetch
+from sas7bdat_converter_cli.xport import XportFile
+
+# SAS formats for times of day, stored as seconds since midnight
+SAS_TIME_FORMATS = ("TIME", "TIMEAMPM", "HHMM", "HOUR", "MMSS", "E8601TM", "B8601TM")
+
+# The private attributes of the pandas sas7bdat reader used to count the rows on each page and
+# to seek to a page. pandas is pinned to the version they were tested with, if another version
+# doesn't have them files are read from the start.
+_PAGE_ATTRIBUTES = (
+    "_path_or_buf",
+    "_page_length",
+    "_read_next_page",
+    "_current_page_type",
+    "_current_page_block_count",
+    "_current_page_data_subheader_pointers",
+    "_mix_page_row_count",
+    "_current_row_on_page_index",
+    "_current_row_in_file_index",
+)
+
+
+class SelectionError(ValueError):
+    """The selected columns or where expression don't match the columns of a file."""
+
+
+@dataclass(frozen=True)
+class Column:
+    """The metadata for a column in a sas7bdat or xpt file."""
+
+    name: str
+    type: str
+    format: str = ""
+    label: str = ""
+    length: int = 8
+
+    @property
+    def is_date(self) -> bool:
+        return self.type == "number" and self.format in sas_date_formats
+
+    @property
+    def is_datetime(self) -> bool:
+        return self.type == "number" and self.format in sas_datetime_formats
+
+    @property
+    def is_time(self) -> bool:
+        return self.type == "number" and self.format in SAS_TIME_FORMATS
+
+
+@dataclass(frozen=True)
+class DatasetInfo:
+    """The metadata of a sas7bdat or xpt file, read from its header without reading any rows.
+
+    `encoding` and `compression` are only recorded in sas7bdat files, `label` only in xpt files.
+    """
+
+    file_path: str
+    format: str
+    name: str
+    label: str
+    rows: int
+    encoding: str | None
+    compression: str | None
+    created: str | None
+    modified: str | None
+    size_bytes: int
+    columns: list[Column]
+
+
+@dataclass(frozen=True)
+class Shard:
+    """A range of rows in a file that can be converted on its own.
+
+    `page` is the sas7bdat page that holds the first row, it's None for xpt files. `skip` is the
+    number of rows on the page before the first row.
+    """
+
+    start: int
+    stop: int
+    page: int | None = None
+    skip: int = 0
+
+
+class SasReader:
+    """Reads a sas7bdat or xpt file a chunk of rows at a time.
+
+    sas7bdat files are read with pandas and xpt files with XportFile. Only the rows of the
+    current chunk are held in memory. Character columns are decoded to utf-8
+    the same way sas7bdat_converter does for a full file so chunked and full conversions produce
+    the same values.
+
+    If `columns` is set only those columns are returned, in that order. If `where` is set only
+    rows matching the expression are returned, see pandas.DataFrame.query for the syntax. Other
+    columns are dropped from each chunk before any strings are decoded, and only the columns used
+    by `where` are decoded before filtering the rows.
+
+    If `memory_map` is True the file is read from a read only memory mapping instead of through
+    a file buffer. The pages come straight from the page cache without a read call for each one
+    and processes mapping the same file share the pages. xpt rows are decoded straight from the
+    mapping without being copied first.
+
+    If `date_format`, `datetime_format`, or `time_format` is set the date, datetime, or time
+    columns are written as strings in that strftime format. The values are decoded and formatted
+    a whole column of the chunk at a time.
+
+    The time spent reading rows and decoding them is added to the read and convert phases of
+    `timer`. When the stages run in threads they overlap, so the phases can add up to more than
+    the time taken.
+
+    `input_format`, sas7bdat or xpt, is the format to read the file as, by default it's taken
+    from the suffix. If `stream` is set the file is read from it from start to end instead of
+    from `file_path`, which only names it, so it can be a pipe such as stdin. The format has to
+    be given and the file can't be memory mapped, sharded, or resumed.
+
+    If `dictionary_encode` is True character columns are returned as pandas Categoricals, see
+    decode_strings.
+    """
+
+    def __init__(
+        self,
+        file_path: Path,
+        columns: Sequence[str] | None = None,
+        where: str | None = None,
+        memory_map: bool = False,
+        date_format: str | None = None,
+        datetime_format: str | None = None,
+        time_format: str | None = None,
+        input_format: str | None = None,
+        dictionary_encode: bool = False,
+        stream: IO[bytes] | None = None,
+    ) -> None:
+        self.file_path = file_path
+        self.dictionary_encode = dictionary_encode
+        self.format = input_format or ("xpt" if file_path.suffix.lower() == ".xpt" else "sas7bdat")
+        self.where = where
+        self._date_formatter = DatetimeFormatter(date_format) if date_format else None
+        self._datetime_formatter = DatetimeFormatter(datetime_format) if datetime_format else None
+        self._time_formatter = DatetimeFormatter(time_format) if time_format else None
+        self.timer = PhaseTimer()
+        self._mmap: mmap.mmap | None = None
+        self._row = 0
+        self._position = 0
+        self._stop: int | None = None
+        # The stubs for the pandas readers don't include the attributes that hold the metadata
+        self._reader: Any
+        if stream is not None:
+            if input_format is None:
+                raise ValueError("The input format is required to read a stream")
+            if memory_map:
+                raise ValueError("A stream can't be memory mapped")
+            self._reader = _open_stream(StreamInput(stream), input_format)
+        elif memory_map:
+            self._mmap = map_file(file_path)
+            try:
+                if self.format == "xpt":
+                    self._reader = XportFile(self._mmap)
+                else:
+                    # mmap has the methods the reader uses but isn't typed as a ReadBuffer
+                    self._reader = pd.read_sas(
+                        self._mmap,  # type: ignore[call-overload]
+                        format="sas7bdat",
+                        iterator=True,
+                    )
+            except Exception:
+                self._mmap.close()
+                raise
+        elif self.format == "xpt":
+            self._reader = XportFile(open(file_path, "rb"))
+        else:
+            self._reader = pd.read_sas(file_path, format="sas7bdat", iterator=True)
+
+        available = {x.name: x for x in self._file_column_info()}
+        if columns:
+            missing = [x for x in columns if x not in available]
+            if missing:
+                self.close()
+                raise SelectionError(f"Columns not found in {file_path.name}: {', '.join(missing)}")
+            self.column_info = [available[x] for x in columns]
+        else:
+            self.column_info = list(available.values())
+
+        if where:
+            try:
+                _check_where(where, list(available))
+            except ValueError:
+                self.close()
+                raise
+
+        self._where_columns = _referenced_columns(where, list(available)) if where else []
+        self._read_columns = self.columns + [
+            x for x in self._where_columns if x not in self.columns
+        ]
+
+    def __enter__(self) -> SasReader:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    @property
+    def columns(self) -> list[str]:
+        return [x.name for x in self.column_info]
+
+    @property
+    def row_count(self) -> int:
+        """The number of rows in the file, before any filtering."""
+        return int(self._reader.row_count)
+
+    def iter_chunks(
+        self, chunk_size: int, buffer_chunks: int = 0
+    ) -> Generator[pd.DataFrame, None, None]:
+        """Yield the selected rows of the file in DataFrames of at most `chunk_size` rows.
+
+        When `buffer_chunks` is greater than 0 the rows are read in one background thread and
+        decoded in another, each running up to `buffer_chunks` chunks ahead of the next stage, so
+        the file is read while earlier chunks are decoded and written.
+
+        At least one DataFrame is always yielded so the columns are available for empty results.
+        """
+        raw_chunks = self._read_chunks(chunk_size)
+        if buffer_chunks:
+            raw_chunks = prefetch(raw_chunks, buffer_chunks)
+        chunks: Generator[tuple[int, pd.DataFrame | None], None, None] = (
+            (row, self._convert_chunk(chunk)) for row, chunk in raw_chunks
+        )
+        if buffer_chunks:
+            chunks = prefetch(chunks, buffer_chunks)
+
+        empty = True
+        try:
+            for row, chunk in chunks:
+                self._position = row
+                if chunk is not None:
+                    empty = False
+                    yield chunk
+        finally:
+            # Stop the decoding thread before the reading thread it takes chunks from
+            chunks.close()
+            raw_chunks.close()
+
+        if empty:
+            yield pd.DataFrame(columns=self.columns)
+
+    def _read_chunks(self, chunk_size: int) -> Generator[tuple[int, pd.DataFrame], None, None]:
+        # Yields the rows read so far along with each chunk
+        while True:
+            rows = chunk_size if self._stop is None else min(chunk_size, self._stop - self._row)
+            if rows <= 0:
+                break
+
+            try:
+                with self.timer.phase("read"):
+                    chunk = self._reader.read(rows)
+            except StopIteration:
+                break
+
+            if chunk.empty and len(chunk.columns) == 0:
+                break
+
+            self._row += len(chunk)
+            yield self._row, chunk
+
+    def _convert_chunk(self, chunk: pd.DataFrame) -> pd.DataFrame | None:
+        # Returns None when none of the rows match `where`
+        with self.timer.phase("convert"):
+            if self.where:
+                chunk = decode_strings(
+                    chunk[self._read_columns], self._where_columns, self.dictionary_encode
+                )
+                chunk = chunk.query(self.where)
+                if chunk.empty:
+                    return None
+                chunk = decode_strings(
+                    chunk[self.columns], self._decode_after_filter, self.dictionary_encode
+                )
+            else:
+                chunk = decode_strings(chunk[self.columns], categorical=self.dictionary_encode)
+            return self._format_dates(chunk)
+
+    def seek(self, shard: Shard) -> None:
+        """Start reading from the first row of the shard and stop after its last row."""
+        if shard.start:
+            if shard.page is None:
+                self._reader.seek(shard.start)
+            elif _seeks_pages(self._reader):
+                self._reader._path_or_buf.seek(
+                    self._reader.header_length + shard.page * self._reader._page_length
+                )
+                self._reader._read_next_page()
+                self._reader._current_row_on_page_index = 0
+                self._reader._current_row_in_file_index = shard.start - shard.skip
+                self._skip_rows(shard.start - shard.skip, shard.start)
+            else:
+                self._skip_rows(0, shard.start)
+
+        self._row = self._position = shard.start
+        self._stop = shard.stop
+
+    def seek_row(self, row: int) -> None:
+        """Continue reading a newly opened file from a row, used to resume a conversion.
+
+        xpt files seek straight to the row. sas7bdat files seek to the page holding the row and
+        read past the rows before it on that page, or from the start of the file if the pages
+        can't be counted.
+        """
+        total = self.row_count
+        if row >= total:
+            self._row = self._position = self._stop = total
+            return
+
+        start = 0
+        if self.format == "xpt":
+            start = row
+            self.seek(Shard(row, total))
+        else:
+            pages = _sas7bdat_page_rows(self.file_path)
+            if sum(x[1] for x in pages) == total:
+                for page, rows in pages:
+                    if start + rows > row:
+                        self.seek(Shard(start, total, page))
+                        break
+                    start += rows
+
+        self._skip_rows(start, row)
+        self._row = self._position = row
+
+    def _skip_rows(self, start: int, row: int) -> None:
+        # Read and drop the rows from `start`, where the reader is, up to `row`
+        while start < row:
+            with self.timer.phase("read"):
+                skipped = len(self._reader.read(min(row - start, 65_536)))
+            if not skipped:
+                break
+            start += skipped
+
+    def info(self) -> DatasetInfo:
+        """The metadata of the file. pandas only reads the header and metadata pages when it opens
+        a file, so this doesn't depend on the size of the file.
+        """
+        if isinstance(self._reader, XportFile):
+            return DatasetInfo(
+                file_path=str(self.file_path),
+                format="xpt",
+                name=self._reader.name,
+                label=self._reader.label,
+                rows=self.row_count,
+                encoding=None,
+                compression=None,
+                created=_isoformat(self._reader.created),
+                modified=_isoformat(self._reader.modified),
+                size_bytes=self.file_path.stat().st_size,
+                columns=self.column_info,
+            )
+
+        with open(self.file_path, "rb") as f:
+            f.seek(dataset_offset)
+            name = _header_text(f.read(dataset_length))
+        compression = {rle_compression: "RLE", rdc_compression: "RDC"}.get(self._reader.compression)
+        return DatasetInfo(
+            file_path=str(self.file_path),
+            format="sas7bdat",
+            name=name,
+            label="",
+            rows=self.row_count,
+            encoding=self._reader.inferred_encoding,
+            compression=compression,
+            created=_isoformat(self._reader.date_created),
+            modified=_isoformat(self._reader.date_modified),
+            size_bytes=self.file_path.stat().st_size,
+            columns=self.column_info,
+        )
+
+    @property
+    def position(self) -> int:
+        """The number of rows of the file, before any filtering, in the chunks yielded so far."""
+        return self._position
+
+    def close(self) -> None:
+        self._reader.close()
+        if self._mmap is not None:
+            self._mmap.close()
+
+    def _format_dates(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        formatted = {}
+        for column in self.column_info:
+            values = chunk[column.name]
+            decoded = pd.api.types.is_datetime64_any_dtype(values)
+            if column.is_date and self._date_formatter:
+                dates = (
+                    values.to_numpy()
+                    if decoded
+                    else sas_dates_to_datetime64(values.to_numpy(dtype=np.float64))
+                )
+                formatted[column.name] = self._date_formatter.format(dates)
+            elif column.is_datetime and self._datetime_formatter:
+                datetimes = (
+                    values.to_numpy()
+                    if decoded
+                    else sas_datetimes_to_datetime64(values.to_numpy(dtype=np.float64))
+                )
+                formatted[column.name] = self._datetime_formatter.format(datetimes)
+            elif column.is_time and self._time_formatter:
+                times = sas_times_to_datetime64(values.to_numpy(dtype=np.float64))
+                formatted[column.name] = self._time_formatter.format(times)
+
+        if not formatted:
+            return chunk
+
+        return chunk.assign(**formatted)
+
+    @property
+    def _decode_after_filter(self) -> list[str]:
+        return [x for x in self.columns if x not in self._where_columns]
+
+    def _file_column_info(self) -> list[Column]:
+        if isinstance(self._reader, XportFile):
+            return [
+                Column(x.name, x.type, x.format.upper(), x.label, x.length)
+                for x in self._reader.variables
+            ]
+
+        return [
+            Column(
+                name=x.name,
+                type="number" if x.ctype == b"d" else "string",
+                format=_header_text(x.format).upper(),
+                label=_header_text(x.label),
+                length=x.length,
+            )
+            for x in self._reader.columns
+        ]
+
+
+def plan_shards(
+    file_path: Path, count: int, input_format: str | None = None, align: int = 1
+) -> list[Shard]:
+    """Split the rows of a file into at most `count` ranges of about the same number of rows.
+
+    Every range starts on a multiple of `align` rows. xpt ranges can start on any such row.
+    sas7bdat ranges start on the first such row of a page, the rows on each page are counted from
+    the page headers without decoding them. Files with too few pages or rows for `count` ranges,
+    or whose pages can't be counted, are split into fewer shards.
+    """
+    with SasReader(file_path, input_format=input_format) as reader:
+        total = reader.row_count
+        file_format = reader.format
+    if file_format == "xpt":
+        bounds = sorted({total * i // count // align * align for i in range(count)} | {total})
+        return [Shard(start, stop) for start, stop in zip(bounds, bounds[1:])] or [Shard(0, 0)]
+
+    pages = _sas7bdat_page_rows(file_path)
+    if not pages or sum(x[1] for x in pages) != total:
+        return [Shard(0, total)]
+
+    shards: list[Shard] = []
+    start, start_page, skip, row = 0, pages[0][0], 0, 0
+    for page, rows in pages:
+        # Start the next shard on this page when its share of the rows ends in the first half of
+        # the rows it can start on
+        first = -(-row // align) * align
+        target = total * (len(shards) + 1) / count
+        if (
+            start < first < row + rows
+            and (first + row + rows) / 2 > target
+            and len(shards) < count - 1
+        ):
+            shards.append(Shard(start, first, start_page, skip))
+            start, start_page, skip = first, page, first - row
+        row += rows
+
+    shards.append(Shard(start, total, start_page, skip))
+    return shards
+
+
+def _sas7bdat_page_rows(file_path: Path) -> list[tuple[int, int]]:
+    # Walk the pages with the pandas reader, which reads the metadata but leaves decoding the rows
+    # to read(). After it opens the file the current page is the first one holding rows.
+    reader: Any = pd.read_sas(file_path, format="sas7bdat", iterator=True)
+    pages: list[tuple[int, int]] = []
+    try:
+        done = not _seeks_pages(reader)
+        while not done:
+            page = (reader._path_or_buf.tell() - reader.header_length) // reader._page_length - 1
+            if reader._current_page_type in page_meta_types:
+                rows = len(reader._current_page_data_subheader_pointers)
+            elif reader._current_page_type == page_mix_type:
+                rows = min(reader.row_count, reader._mix_page_row_count)
+            elif reader._current_page_type == page_data_type:
+                rows = reader._current_page_block_count
+            else:
+                rows = 0
+            if rows:
+                pages.append((page, rows))
+            done = reader._read_next_page()
+    finally:
+        reader.close()
+
+    return pages
+
+
+def _seeks_pages(reader: Any) -> bool:
+    return all(hasattr(reader, x) for x in _PAGE_ATTRIBUTES)
+
+
+def map_file(file_path: Path) -> mmap.mmap:
+    """Memory map a file for reading, the mapping stays valid after the file is closed."""
+    with open(file_path, "rb") as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if hasattr(mmap, "MADV_SEQUENTIAL"):
+        # Rows are read from the start to the end so let the kernel read ahead
+        mapping.madvise(mmap.MADV_SEQUENTIAL)
+    return mapping
+
+
+class StreamInput(io.BufferedIOBase):
+    """Reads a stream that can't seek, such as a pipe, the way the pandas readers read files.
+
+    Every read returns as many bytes as asked for unless the stream ends, and seeking to where
+    the stream already is, which the readers do before reading the header, is allowed. `peek`
+    reads ahead without moving past the bytes it returns.
+    """
+
+    def __init__(self, raw: IO[bytes]) -> None:
+        super().__init__()
+        self._raw = raw
+        self._ahead = bytearray()
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int | None = -1) -> bytes:
+        if size is None or size < 0:
+            data = bytes(self._ahead) + self._raw.read()
+            self._ahead.clear()
+        else:
+            self.peek(size)
+            data = bytes(self._ahead[:size])
+            del self._ahead[:size]
+
+        self._position += len(data)
+        return data
+
+    def peek(self, size: int | None = -1) -> bytes:
+        """Return up to `size` bytes, or all the rest, without reading past them."""
+        while size is None or size < 0 or len(self._ahead) < size:
+            data = self._raw.read(-1 if size is None or size < 0 else size - len(self._ahead))
+            if not data:
+                break
+            self._ahead += data
+
+        return bytes(self._ahead if size is None or size < 0 else self._ahead[:size])
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if (whence == io.SEEK_SET and offset == self._position) or (
+            whence == io.SEEK_CUR and offset == 0
+        ):
+            return self._position
+        raise io.UnsupportedOperation("A stream can only be read from start to end")
+
+
+def _open_stream(stream: StreamInput, input_format: str) -> Any:
+    if input_format == "xpt":
+        return XportFile(stream)
+    # StreamInput has the methods the reader uses but isn't typed as a ReadBuffer
+    return pd.read_sas(stream, format="sas7bdat", iterator=True)  # type: ignore[call-overload]
+
+
+def _check_where(where: str, columns: list[str]) -> None:
+    """Raise a SelectionError if `where` isn't an expression of the columns, before any rows are
+    read.
+    """
+    try:
+        pd.DataFrame(columns=columns).query(where)
+    except (NameError, SyntaxError, ValueError) as e:
+        raise SelectionError(f"Invalid where expression {where!r}: {e}") from e
+
+
+def _referenced_columns(where: str, columns: list[str]) -> list[str]:
+    names = {x or y for x, y in re.findall(r"`([^`]+)`|\b([A-Za-z_]\w*)\b", where)}
+    return [x for x in columns if x in names]
+
+
+def _isoformat(value: Any) -> str | None:
+    return None if value is None or pd.isna(value) else value.isoformat()
+
+
+def _header_text(value: str | bytes) -> str:
+    if isinstance(value, bytes):
+        value = value.decode("utf-8", errors="replace")
+    return value.strip()
+
+
+def decode_strings(
+    df: pd.DataFrame, columns: Sequence[str] | None = None, categorical: bool = False
+) -> pd.DataFrame:
+    """Convert the binary strings read from a sas file to utf-8 strings.
+
+    If `columns` is set only those columns are decoded. If `categorical` is True each column
+    becomes a pandas Categorical, each distinct value is decoded once and the rows hold codes
+    for them, instead of every row holding its own copy of the string.
+    """
+    df = df.copy(deep=False)
+    for col in df.select_dtypes(include=["object"]):
+        if columns is not None and col not in columns:
+            continue
+        if not df[col].notna().any():
+            continue
+        if categorical:
+            codes, values = pd.factorize(df[col])
+            categories = pd.Index([x.decode("utf-8") for x in values], dtype=object)
+            # The stubs only accept a sequence for the codes, not an array
+            df[col] = pd.Categorical.from_codes(codes, categories)  # type: ignore[arg-type]
+        else:
+            df[col] = df[col].str.decode("utf-8")
+
+    return df
@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import json
+import os
+import socketserver
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, fields
+from io import BufferedIOBase
+from pathlib import Path
+from types import TracebackType
+from typing import IO, Any
+
+from sas7bdat_converter_cli.metrics import FileMetrics
+from sas7bdat_converter_cli.options import ConversionOptions, is_export_file
+
+# The file type for each command that can be sent as a job
+JOB_COMMANDS = {
+    "to-csv": "csv",
+    "to-excel": "xlsx",
+    "to-json": "json",
+    "to-xml": "xml",
+    "to-parquet": "parquet",
+    "to-arrow": "arrow",
+}
+
+_OPTION_NAMES = {x.name for x in fields(ConversionOptions)}
+
+
+@dataclass(frozen=True)
+class Job:
+    """A single file conversion requested by a client.
+
+    Jobs are json objects with the to-* command to run, the file to convert, the export file,
+    and optionally an id that is returned with the result and the conversion options, for example
+    {"id": 1, "command": "to-csv", "file_path": "a.xpt", "export_file": "a.csv",
+    "options": {"chunk_size": 10000, "columns": ["A", "B"]}}. Like the --ndjson flag, setting
+    "ndjson" to true on a to-json job writes newline delimited json.
+    """
+
+    id: Any
+    file_type: str
+    file_path: Path
+    export_file: Path
+    options: ConversionOptions
+
+    @classmethod
+    def from_json(cls, line: str) -> Job:
+        """Parse and validate a job, raising ValueError with the reason if it isn't valid."""
+        try:
+            data = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"Invalid json: {e}") from e
+
+        if not isinstance(data, dict):
+            raise ValueError("A job must be a json object")
+
+        for key in ("command", "file_path", "export_file"):
+            if not isinstance(data.get(key), str):
+                raise ValueError(f"A job must include {key}")
+
+        file_type = JOB_COMMANDS.get(data["command"])
+        if file_type is None:
+            raise ValueError(f"Unknown command: {data['command']}")
+
+        if file_type == "json" and data.get("ndjson"):
+            file_type = "ndjson"
+
+        options = data.get("options") or {}
+        if not isinstance(options, dict):
+            raise ValueError("options must be a json object")
+
+        unknown = sorted(set(options) - _OPTION_NAMES)
+        if unknown:
+            raise ValueError(f"Unknown options: {', '.join(unknown)}")
+
+        if options.get("columns") is not None:
+            options = {**options, "columns": tuple(options["columns"])}
+
+        file_path = Path(data["file_path"])
+        export_file = Path(data["export_file"])
+        if file_path.suffix != ".sas7bdat" and file_path.suffix != ".xpt":
+            raise ValueError("File must be either a sas7bdat file or a xpt file")
+
+        if not is_export_file(export_file, file_type, options.get("compress")):
+            raise ValueError(f"The export file must be a {file_type} file")
+
+        return cls(data.get("id"), file_type, file_path, export_file, ConversionOptions(**options))
+
+
+def run_job(job: Job) -> dict[str, Any]:
+    """Convert the file for a job and return the result to send back to the client."""
+    from sas7bdat_converter_cli.conversion import convert_file, error_message
+
+    try:
+        metrics = convert_file(job.file_type, job.file_path, job.export_file, job.options)
+    except Exception as e:
+        metrics = FileMetrics(
+            str(job.file_path),
+            str(job.export_file),
+            job.file_type,
+            status="failed",
+            error=error_message(e),
+        )
+
+    return {"id": job.id, **asdict(metrics)}
+
+
+class JobServer:
+    """Runs conversion jobs sent as newline delimited json and streams back the results.
+
+    The workers import pandas and the backends once when they start and are reused for every job,
+    so each conversion only pays for the conversion itself. With one worker the jobs run one at a
+    time in this process, with more they run in a pool of worker processes. Results are written
+    as each job finishes so they can arrive in a different order than the jobs were sent, the id
+    of each job is included in its result.
+    """
+
+    def __init__(self, jobs: int = 1) -> None:
+        workers = jobs or os.cpu_count() or 1
+        self._executor: Executor
+        if workers == 1:
+            self._executor = ThreadPoolExecutor(max_workers=1, initializer=_warm_up)
+        else:
+            self._executor = ProcessPoolExecutor(max_workers=workers, initializer=_warm_up)
+
+    def __enter__(self) -> JobServer:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def submit(self, line: str) -> Future[dict[str, Any]]:
+        """Start the job in a line of json, invalid jobs fail straight away."""
+        try:
+            job = Job.from_json(line)
+        except ValueError as e:
+            future: Future[dict[str, Any]] = Future()
+            future.set_result({"id": _job_id(line), "status": "failed", "error": str(e)})
+            return future
+
+        return self._executor.submit(run_job, job)
+
+    def serve_stream(
+        self, input: IO[bytes] | BufferedIOBase, output: IO[bytes] | BufferedIOBase
+    ) -> None:
+        """Run each job read from `input` until it is closed, writing the results to `output`."""
+        results = _ResultStream(output)
+        for line in input:
+            text = line.decode("utf-8").strip()
+            if text:
+                results.add(self.submit(text), _job_id(text))
+
+        results.join()
+
+    def socket_server(self, path: Path) -> socketserver.ThreadingUnixStreamServer:
+        """Create a server that runs the jobs sent by each client connected to a Unix socket."""
+        job_server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                job_server.serve_stream(self.rfile, self.wfile)
+
+        if path.is_socket():
+            # Left behind by a server that didn't shut down cleanly
+            path.unlink()
+
+        server = socketserver.ThreadingUnixStreamServer(str(path), Handler)
+        server.daemon_threads = True
+        return server
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+class _ResultStream:
+    """Writes results as their jobs finish and waits for the outstanding ones."""
+
+    def __init__(self, output: IO[bytes] | BufferedIOBase) -> None:
+        self._output = output
+        self._condition = threading.Condition()
+        self._pending = 0
+
+    def add(self, future: Future[dict[str, Any]], job_id: Any) -> None:
+        with self._condition:
+            self._pending += 1
+
+        future.add_done_callback(lambda x: self._write(x, job_id))
+
+    def join(self) -> None:
+        with self._condition:
+            self._condition.wait_for(lambda: self._pending == 0)
+
+    def _write(self, future: Future[dict[str, Any]], job_id: Any) -> None:
+        try:
+            result = future.result()
+        except Exception as e:
+            # Only happens if a worker process dies, failures converting a file are returned
+            result = {"id": job_id, "status": "failed", "error": str(e) or type(e).__name__}
+
+        line = json.dumps(result).encode("utf-8") + b"\n"
+        with self._condition:
+            try:
+                self._output.write(line)
+                self._output.flush()
+            except OSError:
+                # The client disconnected, the remaining results have nowhere to go
+                pass
+            self._pending -= 1
+            self._condition.notify_all()
+
+
+def _job_id(line: str) -> Any:
+    try:
+        data = json.loads(line)
+    except ValueError:
+        return None
+
+    return data.get("id") if isinstance(data, dict) else None
+
+
+def _warm_up() -> None:
+    # Import everything a conversion needs before the first job arrives
+    import sas7bdat_converter  # noqa: F401
+
+    import sas7bdat_converter_cli.conversion  # noqa: F401
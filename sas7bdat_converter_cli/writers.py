@@ -0,0 +1,661 @@
+from __future__ import annotations
+
+import csv
+import os
+import shutil
+from abc import ABC, abstractmethod
+from pathlib import Path
+from types import TracebackType
+from typing import Any
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from sas7bdat_converter_cli.compression import Target, open_input, open_output, open_text_output
+from sas7bdat_converter_cli.dates import sas_dates_to_datetime64, sas_datetimes_to_datetime64
+from sas7bdat_converter_cli.metrics import PhaseTimer
+from sas7bdat_converter_cli.options import ConversionOptions, is_xml_name
+from sas7bdat_converter_cli.reader import Column
+
+# csv files are written in slices of this many cells, the pandas default, see
+# pandas.io.formats.csvs
+_CSV_CHUNK_CELLS = 100_000
+
+# The number of rows converted to text at a time
+_XML_ROWS_PER_WRITE = 8192
+
+# Quotes and white space that would be changed when the attribute is read, besides &, <, and >
+_XML_ATTRIBUTE_ENTITIES = {'"': "&quot;", "\n": "&#10;", "\r": "&#13;", "\t": "&#9;"}
+
+# With dictionary_encode a character column is written as plain strings when the first chunk
+# has more than this many distinct values in it and more than this share of its rows are
+# distinct. A dictionary of mostly unique values is larger than the strings and an Arrow IPC
+# file has to add to it with nearly every batch.
+_DICTIONARY_MAX_VALUES = 1_024
+_DICTIONARY_MAX_SHARE = 0.5
+
+
+class ChunkWriter(ABC):
+    """Base class for writers that receive a dataset one chunk of rows at a time.
+
+    Writers add the time spent converting chunks to the output types and writing them to the
+    convert and write phases of `timer`. Writers that can continue a file cut off part way
+    derive from ResumableWriter.
+
+    `export_file` is the path of the file or a binary file to write to, such as stdout, which
+    is left open when the writer is closed.
+    """
+
+    # Whether files written for consecutive ranges of rows can be joined with concat
+    concatenates = False
+
+    def __init__(
+        self,
+        export_file: Target,
+        columns: list[Column],
+        options: ConversionOptions,
+        append: bool = False,
+    ) -> None:
+        self.export_file = export_file
+        self.columns = columns
+        self.options = options
+        self.timer = PhaseTimer()
+
+    def __enter__(self) -> ChunkWriter:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    @classmethod
+    def align_chunk_size(cls, chunk_size: int, column_count: int) -> int:
+        """Adjust the requested number of rows per chunk, or the rows in each shard of a file
+        split with convert_shards, to suit the writer.
+        """
+        return chunk_size
+
+    @abstractmethod
+    def write(self, chunk: pd.DataFrame) -> None:
+        pass
+
+    @abstractmethod
+    def close(self) -> None:
+        pass
+
+    @classmethod
+    def resumable(cls, options: ConversionOptions) -> bool:
+        """Whether a file cut off after any chunk can be continued by a writer created with
+        `append`, which adds to the end of the file without writing a header.
+        """
+        return False
+
+    @classmethod
+    def concat(cls, parts: list[Path], export_file: Path, options: ConversionOptions) -> None:
+        """Join files written for consecutive ranges of rows into one file.
+
+        Only used for writers that set `concatenates`. The parts are joined byte for byte, which
+        suits formats without a header or footer, concatenated gzip members, bz2 and xz streams,
+        and zstd frames are also valid compressed files.
+        """
+        with open(export_file, "wb") as f:
+            for part in parts:
+                with open(part, "rb") as part_file:
+                    shutil.copyfileobj(part_file, f)
+
+
+class ResumableWriter(ChunkWriter):
+    """Base class for writers whose uncompressed files can be cut off after any chunk and
+    continued by a writer created with `append`.
+    """
+
+    @classmethod
+    def resumable(cls, options: ConversionOptions) -> bool:
+        # A compressed stream can only be cut off cleanly where it ends
+        return options.compress is None
+
+    @abstractmethod
+    def flush(self) -> int:
+        """Write everything written so far to disk and return the size of the file."""
+
+
+class CsvWriter(ResumableWriter):
+    """Appends chunks to a csv file, matching the output of sas7bdat_converter.to_csv.
+
+    When `compress` is set each chunk is compressed as it's written.
+    """
+
+    concatenates = True
+
+    def __init__(
+        self,
+        export_file: Target,
+        columns: list[Column],
+        options: ConversionOptions,
+        append: bool = False,
+    ) -> None:
+        super().__init__(export_file, columns, options)
+        if options.compress is None and isinstance(export_file, Path):
+            self._file = open(export_file, "a" if append else "w", newline="", encoding="utf-8")
+        else:
+            self._file = _open_text(export_file, options)
+        self._header = not append
+
+    @classmethod
+    def align_chunk_size(cls, chunk_size: int, column_count: int) -> int:
+        # pandas decides how to format datetime columns separately for each slice it writes. Only
+        # writing whole slices keeps the output byte for byte the same as writing the full file.
+        rows_per_slice = _csv_slice_rows(column_count)
+        return -(-chunk_size // rows_per_slice) * rows_per_slice
+
+    def write(self, chunk: pd.DataFrame) -> None:
+        with self.timer.phase("write"):
+            chunk.to_csv(
+                self._file,
+                header=self._header,
+                quoting=csv.QUOTE_NONNUMERIC,
+                index=False,
+                chunksize=_csv_slice_rows(len(chunk.columns)),
+            )
+        self._header = False
+
+    def close(self) -> None:
+        with self.timer.phase("write"):
+            self._file.close()
+
+    def flush(self) -> int:
+        with self.timer.phase("write"):
+            return _sync(self._file)
+
+    @classmethod
+    def concat(cls, parts: list[Path], export_file: Path, options: ConversionOptions) -> None:
+        with open(export_file, "wb") as f:
+            for i, part in enumerate(parts):
+                if i and options.compress is not None:
+                    # The header of a compressed part can only be dropped by decompressing it, the
+                    # rest is compressed again as a new stream after the ones before it
+                    with open_input(part, options.compress) as part_file, open_output(
+                        f, options.compress, options.compress_level, options.compress_threads
+                    ) as output:
+                        part_file.readline()
+                        shutil.copyfileobj(part_file, output)
+                    continue
+
+                with open(part, "rb") as part_file:
+                    if i:
+                        # Only keep the header of the first part
+                        part_file.readline()
+                    shutil.copyfileobj(part_file, f)
+
+
+class BufferedWriter(ChunkWriter):
+    """Collects the chunks and writes them as one DataFrame when closed.
+
+    Used for formats that have to be written all at once. Only the rows and columns that were
+    selected are held in memory.
+    """
+
+    def __init__(
+        self, export_file: Target, columns: list[Column], options: ConversionOptions
+    ) -> None:
+        super().__init__(export_file, columns, options)
+        self._chunks: list[pd.DataFrame] = []
+
+    def write(self, chunk: pd.DataFrame) -> None:
+        self._chunks.append(chunk)
+
+    def close(self) -> None:
+        with self.timer.phase("convert"):
+            df = pd.concat(self._chunks, ignore_index=True) if self._chunks else pd.DataFrame()
+        self._chunks = []
+        with self.timer.phase("write"):
+            self.write_frame(df)
+
+    @abstractmethod
+    def write_frame(self, df: pd.DataFrame) -> None:
+        pass
+
+
+class ExcelWriter(ChunkWriter):
+    """Writes the rows of each chunk to a xlsx file as they arrive, keeping memory use flat.
+
+    The sheets are written the same way as sas7bdat_converter.to_excel, with a header row styled
+    like the one pandas writes. When there are more rows than fit on a sheet the rest continue on
+    a new sheet, Sheet2, Sheet3, and so on, each with its own header.
+    """
+
+    # Excel's limit on the number of rows in a sheet, including the header
+    max_sheet_rows = 1_048_576
+
+    def __init__(
+        self, export_file: Target, columns: list[Column], options: ConversionOptions
+    ) -> None:
+        from openpyxl import Workbook
+
+        super().__init__(export_file, columns, options)
+        self._workbook = Workbook(write_only=True)
+        self._sheet: Any = None
+        self._sheet_rows = 0
+
+    def write(self, chunk: pd.DataFrame) -> None:
+        if self._sheet is None:
+            self._add_sheet(list(chunk.columns))
+
+        with self.timer.phase("convert"):
+            values = chunk.astype(object).to_numpy()
+            values[chunk.isna().to_numpy()] = None
+            rows = values.tolist()
+        with self.timer.phase("write"):
+            for row in rows:
+                if self._sheet_rows == self.max_sheet_rows:
+                    self._add_sheet(list(chunk.columns))
+                self._sheet.append(row)
+                self._sheet_rows += 1
+
+    def close(self) -> None:
+        with self.timer.phase("write"):
+            if self._sheet is None:
+                self._add_sheet([x.name for x in self.columns])
+            self._workbook.save(_sink(self.export_file))
+
+    def _add_sheet(self, columns: list[str]) -> None:
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Alignment, Border, Font, Side
+
+        self._sheet = self._workbook.create_sheet(f"Sheet{len(self._workbook.worksheets) + 1}")
+        thin = Side(style="thin")
+        header = []
+        for name in columns:
+            cell = WriteOnlyCell(self._sheet, name)
+            cell.font = Font(bold=True)
+            cell.border = Border(left=thin, right=thin, top=thin, bottom=thin)
+            cell.alignment = Alignment(horizontal="center", vertical="top")
+            header.append(cell)
+        self._sheet.append(header)
+        self._sheet_rows = 1
+
+
+class JsonWriter(BufferedWriter):
+    """Writes a json file, matching the output of sas7bdat_converter.to_json."""
+
+    def write_frame(self, df: pd.DataFrame) -> None:
+        if self.options.compress is None and isinstance(self.export_file, Path):
+            df.to_json(self.export_file)
+            return
+
+        with _open_text(self.export_file, self.options) as f:
+            df.to_json(f)
+
+
+class NdjsonWriter(ResumableWriter):
+    """Writes each row as a json object on its own line as soon as its chunk is read.
+
+    The file is flushed after every chunk so it can be read while it's being written. Values are
+    formatted the same way as in the json files written by JsonWriter.
+    """
+
+    concatenates = True
+
+    def __init__(
+        self,
+        export_file: Target,
+        columns: list[Column],
+        options: ConversionOptions,
+        append: bool = False,
+    ) -> None:
+        super().__init__(export_file, columns, options)
+        self._file = (
+            open(export_file, "ab")
+            if append and isinstance(export_file, Path)
+            else open_output(
+                export_file, options.compress, options.compress_level, options.compress_threads
+            )
+        )
+
+    def write(self, chunk: pd.DataFrame) -> None:
+        if chunk.empty:
+            return
+
+        with self.timer.phase("convert"):
+            lines = chunk.to_json(orient="records", lines=True)
+        with self.timer.phase("write"):
+            self._file.write(lines.encode("utf-8"))
+            self._file.flush()
+
+    def close(self) -> None:
+        with self.timer.phase("write"):
+            self._file.close()
+
+    def flush(self) -> int:
+        with self.timer.phase("write"):
+            return _sync(self._file)
+
+
+class XmlWriter(ChunkWriter):
+    """Writes the rows of each chunk to a xml file as they arrive, keeping memory use flat.
+
+    With the default options the file matches the output of sas7bdat_converter.to_xml, each row
+    is a `xml_row` element holding an element per column inside the `xml_root` element. When
+    `xml_attributes` is set each column is an attribute of the row element instead. The values
+    of each column are converted to text and escaped a column at a time.
+    """
+
+    def __init__(
+        self, export_file: Target, columns: list[Column], options: ConversionOptions
+    ) -> None:
+        super().__init__(export_file, columns, options)
+        for name in (options.xml_root, options.xml_row):
+            if not is_xml_name(name):
+                raise ValueError(f"{name!r} is not a valid XML element name")
+
+        self._file = (
+            open(export_file, "w", encoding="utf-8")
+            if options.compress is None and isinstance(export_file, Path)
+            else _open_text(export_file, options)
+        )
+        self._file.write(f'<?xml version="1.0" encoding="UTF-8"?>\n<{options.xml_root}>\n')
+        self._separator = ""
+
+    def write(self, chunk: pd.DataFrame) -> None:
+        # The text of a slice of rows is several times the size of its values, so it's built
+        # and written a slice at a time
+        for start in range(0, len(chunk), _XML_ROWS_PER_WRITE):
+            self._write_rows(chunk.iloc[start : start + _XML_ROWS_PER_WRITE])
+
+    def _write_rows(self, rows: pd.DataFrame) -> None:
+        row = self.options.xml_row
+        with self.timer.phase("convert"):
+            if self.options.xml_attributes:
+                cells = [
+                    [f'{name}="{x}"' for x in _xml_text(rows[name], _XML_ATTRIBUTE_ENTITIES)]
+                    for name in rows.columns
+                ]
+                elements = [f"  <{row} {' '.join(x)}/>" for x in zip(*cells)]
+            else:
+                cells = [
+                    [f"    <{name}>{x}</{name}>" for x in _xml_text(rows[name])]
+                    for name in rows.columns
+                ]
+                elements = [f"  <{row}>\n" + "\n".join(x) + f"\n  </{row}>" for x in zip(*cells)]
+            text = self._separator + "\n".join(elements)
+        with self.timer.phase("write"):
+            self._file.write(text)
+        self._separator = "\n"
+
+    def close(self) -> None:
+        with self.timer.phase("write"):
+            self._file.write(f"\n</{self.options.xml_root}>")
+            self._file.close()
+
+
+class ParquetWriter(ChunkWriter):
+    """Writes each chunk to a Parquet file as a row group.
+
+    The file is started with the first chunk, which decides which character columns are
+    dictionary encoded, see arrow_schema.
+    """
+
+    concatenates = True
+
+    def __init__(
+        self, export_file: Target, columns: list[Column], options: ConversionOptions
+    ) -> None:
+        super().__init__(export_file, columns, options)
+        self._sink = _sink(export_file)
+        self._writer: Any = None
+
+    def write(self, chunk: pd.DataFrame) -> None:
+        if self._writer is None:
+            self._open(chunk)
+        with self.timer.phase("convert"):
+            table = to_arrow(chunk, self.columns, self.schema)
+        with self.timer.phase("write"):
+            self._writer.write_table(table)
+
+    def close(self) -> None:
+        if self._writer is None:
+            self._open(pd.DataFrame(columns=[x.name for x in self.columns]))
+        with self.timer.phase("write"):
+            self._writer.close()
+
+    def _open(self, chunk: pd.DataFrame) -> None:
+        import pyarrow.parquet as pq
+
+        self.schema = arrow_schema(self.columns, self.options.dictionary_encode, chunk)
+        self._writer = pq.ParquetWriter(
+            self._sink, self.schema, compression=self.options.codec or "snappy"
+        )
+
+    @classmethod
+    def concat(cls, parts: list[Path], export_file: Path, options: ConversionOptions) -> None:
+        import pyarrow.parquet as pq
+
+        schema = pq.read_schema(parts[0])
+        with pq.ParquetWriter(export_file, schema, compression=options.codec or "snappy") as writer:
+            for part in parts:
+                part_file = pq.ParquetFile(part)
+                # Copy one row group at a time so the row groups keep their size. Each part
+                # decided which columns are dictionaries from its own first chunk.
+                for i in range(part_file.num_row_groups):
+                    writer.write_table(part_file.read_row_group(i).cast(schema))
+
+
+class ArrowWriter(ChunkWriter):
+    """Writes each chunk to an Arrow IPC file as a record batch.
+
+    With `dictionary_encode` character columns are dictionary arrays, unless the first chunk
+    shows they're mostly unique, see arrow_schema. An IPC file can't replace a dictionary between
+    batches, so the values of each chunk's dictionary are added to the end of one dictionary per
+    column, which holds every distinct value written.
+    """
+
+    concatenates = True
+
+    def __init__(
+        self, export_file: Target, columns: list[Column], options: ConversionOptions
+    ) -> None:
+        super().__init__(export_file, columns, options)
+        self._sink = _sink(export_file)
+        self._writer: Any = None
+
+    def write(self, chunk: pd.DataFrame) -> None:
+        if self._writer is None:
+            self._open(chunk)
+        with self.timer.phase("convert"):
+            table = to_arrow(chunk, self.columns, self.schema)
+            batches = [self._dictionaries.unify(x) for x in table.to_batches()]
+        with self.timer.phase("write"):
+            for batch in batches:
+                self._writer.write_batch(batch)
+
+    def close(self) -> None:
+        if self._writer is None:
+            self._open(pd.DataFrame(columns=[x.name for x in self.columns]))
+        with self.timer.phase("write"):
+            self._writer.close()
+
+    def _open(self, chunk: pd.DataFrame) -> None:
+        self.schema = arrow_schema(self.columns, self.options.dictionary_encode, chunk)
+        self._dictionaries = _Dictionaries(self.schema)
+        self._writer = pa.ipc.new_file(self._sink, self.schema, options=_ipc_options(self.options))
+
+    @classmethod
+    def concat(cls, parts: list[Path], export_file: Path, options: ConversionOptions) -> None:
+        with pa.ipc.open_file(pa.memory_map(str(parts[0]))) as first:
+            schema = first.schema
+        dictionaries = _Dictionaries(schema)
+        with pa.ipc.new_file(export_file, schema, options=_ipc_options(options)) as writer:
+            for part in parts:
+                with pa.ipc.open_file(pa.memory_map(str(part))) as reader:
+                    # Each part decided which columns are dictionaries from its own first chunk
+                    for i in range(reader.num_record_batches):
+                        batch = reader.get_batch(i).cast(schema)
+                        writer.write_batch(dictionaries.unify(batch))
+
+
+class _Dictionaries:
+    """The dictionaries written so far for each dictionary column of an Arrow IPC file.
+
+    Each dictionary is kept as an Arrow array along with the position of each of its values, so
+    a batch only converts its own dictionary and appends the values that are new.
+    """
+
+    def __init__(self, schema: pa.Schema) -> None:
+        self._positions: dict[int, dict[str, int]] = {
+            i: {} for i, field in enumerate(schema) if pa.types.is_dictionary(field.type)
+        }
+        self._values = {i: pa.array([], pa.string()) for i in self._positions}
+
+    def unify(self, batch: pa.RecordBatch) -> pa.RecordBatch:
+        """Rewrite a batch to use the dictionaries, adding any values they don't have yet."""
+        if not self._positions:
+            return batch
+
+        arrays = batch.columns
+        for i, positions in self._positions.items():
+            array = arrays[i]
+            mapping = []
+            added = []
+            for value in array.dictionary.to_pylist():
+                position = positions.get(value)
+                if position is None:
+                    position = positions[value] = len(positions)
+                    added.append(value)
+                mapping.append(position)
+            if added:
+                self._values[i] = pa.concat_arrays([self._values[i], pa.array(added, pa.string())])
+            arrays[i] = pa.DictionaryArray.from_arrays(
+                pc.take(pa.array(mapping, pa.int32()), array.indices), self._values[i]
+            )
+
+        return pa.RecordBatch.from_arrays(arrays, schema=batch.schema)
+
+
+def arrow_schema(
+    columns: list[Column], dictionary_encode: bool = False, chunk: pd.DataFrame | None = None
+) -> pa.Schema:
+    """Build an Arrow schema that keeps SAS numbers, dates, and datetimes as typed values.
+
+    With `dictionary_encode` character columns are dictionaries of strings. If `chunk`, the
+    first chunk of the file, is given the columns that are mostly unique in it are plain strings,
+    see _DICTIONARY_MAX_VALUES.
+    """
+    return pa.schema(
+        [
+            pa.field(x.name, _arrow_type(x, dictionary_encode and not _mostly_unique(chunk, x)))
+            for x in columns
+        ]
+    )
+
+
+def to_arrow(chunk: pd.DataFrame, columns: list[Column], schema: pa.Schema) -> pa.Table:
+    """Convert a chunk read from a sas file to an Arrow table with the given schema.
+
+    pandas converts date and datetime columns in sas7bdat files but XportFile leaves them as
+    numbers in xpt files, so both are handled here.
+    """
+    arrays = []
+    for column in columns:
+        values = chunk[column.name]
+        if column.is_date and not pd.api.types.is_datetime64_any_dtype(values):
+            days = sas_dates_to_datetime64(values.to_numpy(dtype=np.float64))
+            array = pa.array(days, from_pandas=True)
+        elif column.is_datetime and not pd.api.types.is_datetime64_any_dtype(values):
+            millis = sas_datetimes_to_datetime64(values.to_numpy(dtype=np.float64))
+            array = pa.array(millis, from_pandas=True)
+        else:
+            array = pa.array(values, from_pandas=True)
+            if (
+                column.type == "string"
+                and array.type != pa.string()
+                and not pa.types.is_dictionary(array.type)
+            ):
+                # A chunk where every value is missing has no strings to infer the type from
+                array = array.cast(pa.string())
+
+        arrays.append(array.cast(schema.field(column.name).type))
+
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def _xml_text(values: pd.Series, entities: dict[str, str] | None = None) -> list[str]:
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Each distinct value is escaped once, missing values have the code -1 and are written
+        # the way str formats NaN
+        text = _xml_text(pd.Series(values.cat.categories, dtype=object), entities) + ["nan"]
+        return [text[x] for x in values.cat.codes.tolist()]
+
+    # Values are written the way str formats them, only strings need escaping
+    if values.dtype != object:
+        return [str(x) for x in values.tolist()]
+    if entities is None:
+        return [escape(x) if isinstance(x, str) else str(x) for x in values.tolist()]
+    return [escape(x, entities) if isinstance(x, str) else str(x) for x in values.tolist()]
+
+
+def _csv_slice_rows(column_count: int) -> int:
+    return (_CSV_CHUNK_CELLS // (column_count or 1)) or 1
+
+
+def _open_text(export_file: Target, options: ConversionOptions) -> Any:
+    return open_text_output(
+        export_file, options.compress, options.compress_level, options.compress_threads
+    )
+
+
+def _sink(export_file: Target) -> Any:
+    # Closing the writers' files must leave a file they were given open
+    return export_file if isinstance(export_file, Path) else open_output(export_file)
+
+
+def _sync(file: Any) -> int:
+    file.flush()
+    os.fsync(file.fileno())
+    return os.fstat(file.fileno()).st_size
+
+
+def _ipc_options(options: ConversionOptions) -> pa.ipc.IpcWriteOptions:
+    codec = None if options.codec in (None, "none") else options.codec
+    return pa.ipc.IpcWriteOptions(compression=codec, emit_dictionary_deltas=True)
+
+
+def _mostly_unique(chunk: pd.DataFrame | None, column: Column) -> bool:
+    if chunk is None or column.type != "string" or column.name not in chunk:
+        return False
+    values = chunk[column.name]
+    distinct = values.nunique()
+    return distinct > _DICTIONARY_MAX_VALUES and distinct > _DICTIONARY_MAX_SHARE * len(values)
+
+
+def _arrow_type(column: Column, dictionary_encode: bool = False) -> pa.DataType:
+    if column.type == "string":
+        return pa.dictionary(pa.int32(), pa.string()) if dictionary_encode else pa.string()
+    if column.is_date:
+        return pa.date32()
+    if column.is_datetime:
+        return pa.timestamp("ms")
+    return pa.float64()
+
+
+WRITERS: dict[str, type[ChunkWriter]] = {
+    "csv": CsvWriter,
+    "xlsx": ExcelWriter,
+    "json": JsonWriter,
+    "ndjson": NdjsonWriter,
+    "xml": XmlWriter,
+    "parquet": ParquetWriter,
+    "arrow": ArrowWriter,
+}
+
+# The file types whose writers can compress the output
+COMPRESSED_FILE_TYPES = ("csv", "json", "ndjson", "xml")
+
+# The file types that can write dates, datetimes, and times as formatted text
+TEXT_DATE_FILE_TYPES = ("csv", "xlsx", "json", "ndjson", "xml")
@@ -0,0 +1,328 @@
+from __future__ import annotations
+
+import io
+import mmap
+import re
+import struct
+import sys
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import IO, Union
+
+import numpy as np
+import pandas as pd
+
+# The names of the header records in each version of the format, version 8 is also written by
+# SAS 9 and allows longer names, labels, and formats
+_HEADER_NAMES = {
+    5: ("LIBRARY", "MEMBER", "DSCRPTR", "NAMESTR", "OBS"),
+    8: ("LIBV8", "MEMBV8", "DSCPTV8", "NAMSTV8", "OBSV8"),
+}
+
+_RECORD_LENGTH = 80
+_HEADER_START = b"HEADER RECORD*******"
+_HEADER_END = b"HEADER RECORD!!!!!!!"
+
+# A namestr describes one variable, the last 52 bytes hold the long name and the length of the
+# label in version 8
+_NAMESTR = struct.Struct(">hhhh8s40s8shhh2s8shhl32sh18s")
+
+# The first byte of a missing value is ., _, or a letter for the special missing values .A to .Z
+_MISSING_BYTES = np.zeros(256, dtype=bool)
+_MISSING_BYTES[[ord("."), ord("_"), *range(ord("A"), ord("Z") + 1)]] = True
+
+# The value of each IBM float exponent byte, its sign and a power of 16, divided by 2**56 so
+# multiplying it by the 56 bit fraction gives the number
+_EXPONENT_SCALES = np.array(
+    [(-1.0 if x & 0x80 else 1.0) * 2.0 ** (4 * ((x & 0x7F) - 64) - 56) for x in range(256)]
+)
+
+_FRACTION_MASK = np.uint64(0x00FF_FFFF_FFFF_FFFF)
+
+Source = Union[IO[bytes], io.BufferedIOBase, mmap.mmap]
+
+
+@dataclass(frozen=True)
+class XportVariable:
+    """A variable described by a namestr record of a xpt file."""
+
+    name: str
+    type: str
+    length: int
+    format: str = ""
+    label: str = ""
+
+
+class XportFile:
+    """Reads the first member of a SAS transport (XPORT) version 5 or 8 file.
+
+    Each row is a fixed length record, so a chunk of rows is read with one call and viewed as a
+    numpy structured array without parsing the rows one at a time. Numbers are stored as IBM
+    370 hex floats and are converted to IEEE doubles a whole column at a time. Character values
+    are returned as bytes with trailing blanks removed, the same as pandas returns them.
+
+    `source` is a binary file, a memory mapping, which rows are viewed in without copying them,
+    or a stream that can't seek, such as a pipe. A stream needs a peek method, see
+    reader.StreamInput, and its number of rows is only known once a read reaches its end, until
+    then `row_count` is sys.maxsize. The source is closed with the file.
+    """
+
+    def __init__(self, source: Source) -> None:
+        self._source = source
+        self._offset = 0
+        self._row = 0
+        # The last bytes of rows read from a stream, which can hold the start of the padding
+        self._tail = b""
+        try:
+            self._read_header()
+        except Exception:
+            self.close()
+            raise
+
+        self._dtype = np.dtype(
+            {
+                "names": [f"v{i}" for i in range(len(self.variables))],
+                "formats": [_field_format(x) for x in self.variables],
+            }
+        )
+        self.record_length = self._dtype.itemsize
+        self._streaming = not isinstance(source, mmap.mmap) and not source.seekable()
+        self.row_count = sys.maxsize if self._streaming else self._count_rows()
+
+    def read(self, rows: int) -> pd.DataFrame:
+        """Read the next `rows` rows, raises StopIteration after the last one."""
+        if self._streaming and self.row_count == sys.maxsize:
+            self._count_streamed_rows(rows)
+
+        count = min(rows, self.row_count - self._row)
+        if count <= 0:
+            raise StopIteration
+
+        size = count * self.record_length
+        if isinstance(self._source, mmap.mmap):
+            records = np.frombuffer(self._source, self._dtype, count, self._offset)
+        else:
+            data = self._source.read(size)
+            count = len(data) // self.record_length
+            records = np.frombuffer(data, self._dtype, count)
+            self._tail = (self._tail + data[-_RECORD_LENGTH:])[-_RECORD_LENGTH:]
+        self._offset += size
+
+        columns = {}
+        for i, variable in enumerate(self.variables):
+            values = records[f"v{i}"]
+            if variable.type == "number":
+                columns[variable.name] = ibm_to_ieee(values, variable.length)
+            else:
+                columns[variable.name] = np.char.rstrip(values).astype(object)
+        # Nothing may refer to a memory mapping when it's closed
+        del records
+
+        df = pd.DataFrame(columns, index=pd.RangeIndex(self._row, self._row + count))
+        self._row += count
+        return df
+
+    def seek(self, row: int) -> None:
+        """Continue reading from a row, rows all have the same length and follow the header."""
+        self._offset = self._data_start + row * self.record_length
+        if not isinstance(self._source, mmap.mmap):
+            self._source.seek(self._offset)
+        self._row = row
+
+    def close(self) -> None:
+        self._source.close()
+
+    def _read_header(self) -> None:
+        card = self._card()
+        versions = [x for x, names in _HEADER_NAMES.items() if _header_name(card) == names[0]]
+        if not versions:
+            if b"**COMPRESSED**" in card:
+                raise ValueError("Header record indicates a CPORT file, which is not readable.")
+            raise ValueError("Header record is not an XPORT file.")
+        self.version = versions[0]
+        names = _HEADER_NAMES[self.version]
+        if not self._card().startswith(b"SAS     SAS     SASLIB"):
+            raise ValueError("Header record has invalid prefix.")
+        # The date the library was last modified
+        self._card()
+
+        member = self._card()
+        if _header_name(member) != names[1] or _header_name(self._card()) != names[2]:
+            raise ValueError("Member header not found")
+        # Usually 140, 136 on VAX/VMS
+        namestr_length = int(member[75:78])
+
+        # The dataset name is 8 characters in version 5 and 32 in version 8
+        card = self._card()
+        name_end = 16 if self.version == 5 else 40
+        self.name = _text(card[8:name_end])
+        self.created = _parse_date(card[64:80])
+        card = self._card()
+        self.modified = _parse_date(card[:16])
+        self.label = _text(card[32:72])
+
+        if _header_name(self._card()) != names[3]:
+            raise ValueError("Namestr header not found")
+        namestrs, header = self._read_section()
+        self.variables = [
+            _parse_namestr(namestrs[i : i + namestr_length], self.version)
+            for i in range(0, len(namestrs) - namestr_length + 1, namestr_length)
+        ]
+        if _header_name(header) in ("LABELV8", "LABELV9"):
+            labels, next_header = self._read_section()
+            self.variables = _apply_labels(self.variables, labels, _header_name(header))
+            header = next_header
+        if _header_name(header) != names[4]:
+            raise ValueError("Observation header not found.")
+
+        self._data_start = self._offset
+
+    def _read_section(self) -> tuple[bytes, bytes]:
+        # Read records up to the next header record, return them and the header
+        data = bytearray()
+        while True:
+            card = self._card()
+            if len(card) < _RECORD_LENGTH or _header_name(card) is not None:
+                return bytes(data), card
+            data += card
+
+    def _card(self) -> bytes:
+        card = self._source.read(_RECORD_LENGTH)
+        self._offset += len(card)
+        return card
+
+    def _count_rows(self) -> int:
+        if isinstance(self._source, mmap.mmap):
+            size = len(self._source)
+            tail = self._source[max(size - _RECORD_LENGTH, self._data_start) : size]
+        else:
+            size = self._source.seek(0, 2)
+            self._source.seek(max(size - _RECORD_LENGTH, self._data_start))
+            tail = self._source.read(_RECORD_LENGTH)
+            self._source.seek(self._data_start)
+        return _row_count(size - self._data_start, tail, self.record_length)
+
+    def _count_streamed_rows(self, rows: int) -> None:
+        # Look one record past the rows asked for to see if they reach the end of the stream
+        size = rows * self.record_length + _RECORD_LENGTH
+        left = self._source.peek(size)  # type: ignore[union-attr]
+        if len(left) < size:
+            length = self._row * self.record_length + len(left)
+            tail = (self._tail + left)[-_RECORD_LENGTH:]
+            self.row_count = _row_count(length, tail, self.record_length)
+
+
+def ibm_to_ieee(values: np.ndarray, length: int = 8) -> np.ndarray:
+    """Convert IBM 370 hex floats to IEEE doubles, SAS missing values become NaN.
+
+    `values` holds big endian 64 bit integers, or for numbers shorter than 8 bytes, arrays of
+    their `length` bytes, which are padded with zeros. A fraction has up to 56 significant bits
+    and is rounded to the 53 of a double.
+    """
+    if length == 8:
+        bits = values.astype(np.uint64)
+    else:
+        padded = np.zeros((len(values), 8), dtype=np.uint8)
+        padded[:, :length] = values
+        bits = padded.view(">u8").ravel().astype(np.uint64)
+
+    exponents = (bits >> np.uint64(56)).astype(np.uint8)
+    fractions = bits & _FRACTION_MASK
+    result = fractions.astype(np.float64)
+    result *= _EXPONENT_SCALES[exponents]
+    missing = (fractions == 0) & _MISSING_BYTES[exponents]
+    if missing.any():
+        result[missing] = np.nan
+    return result
+
+
+def _field_format(variable: XportVariable) -> str | tuple[type, tuple[int]]:
+    if variable.type == "string":
+        return f"S{variable.length}"
+    return ">u8" if variable.length == 8 else (np.uint8, (variable.length,))
+
+
+def _row_count(length: int, tail: bytes, record_length: int) -> int:
+    # The last record is padded with blanks, so blanks after the last row that has anything else
+    # are taken as padding. Padding is shorter than a record, which keeps rows of blanks before it.
+    blanks = len(tail) - len(tail.rstrip(b" "))
+    rows = -(-(length - blanks) // record_length)
+    return min(max(rows, (length - _RECORD_LENGTH) // record_length + 1), length // record_length)
+
+
+def _parse_namestr(data: bytes, version: int) -> XportVariable:
+    # Short namestrs, from VAX/VMS, end before the fields that are only used by version 8
+    fields = _NAMESTR.unpack(data.ljust(_NAMESTR.size, b"\x00"))
+    var_type, _, length, _, name, label, var_format = fields[:7]
+    if var_type not in (1, 2):
+        raise ValueError(f"Unknown variable type {var_type}")
+    if var_type == 1 and not 2 <= length <= 8:
+        raise ValueError(f"Floating field width {length} is not between 2 and 8.")
+
+    long_name = _text(fields[15]) if version == 8 else ""
+    return XportVariable(
+        name=long_name or _text(name),
+        type="number" if var_type == 1 else "string",
+        length=length,
+        format=_text(var_format),
+        label=_text(label),
+    )
+
+
+def _apply_labels(
+    variables: list[XportVariable], data: bytes, section: str | None
+) -> list[XportVariable]:
+    """Add the labels longer than 40 characters, and for LABELV9 the formats longer than 8,
+    from the records that follow the namestrs of a version 8 file.
+
+    Each record is the variable number and the lengths of its texts followed by the texts,
+    LABELV8 has the name and label, LABELV9 also has the format and informat.
+    """
+    variables = list(variables)
+    lengths = struct.Struct(">5h" if section == "LABELV9" else ">3h")
+    position = 0
+    while position + lengths.size <= len(data):
+        number, *sizes = lengths.unpack_from(data, position)
+        # The padding after the last record is blanks, which don't make a variable number
+        if not 1 <= number <= len(variables):
+            break
+        position += lengths.size
+        if section == "LABELV9":
+            name_size, format_size, informat_size, label_size = sizes
+            order = [name_size, label_size, format_size, informat_size]
+        else:
+            order = sizes
+        texts = []
+        for size in order:
+            texts.append(_text(data[position : position + size]))
+            position += size
+
+        variable = replace(variables[number - 1], label=texts[1])
+        if section == "LABELV9" and texts[2]:
+            variable = replace(variable, format=_format_name(texts[2]))
+        variables[number - 1] = variable
+
+    return variables
+
+
+def _format_name(text: str) -> str:
+    # Long formats are written with their width and decimals, such as E8601DT19.
+    return re.sub(r"\d*\.\d*$", "", text)
+
+
+def _header_name(card: bytes) -> str | None:
+    if not card.startswith(_HEADER_START) or card[28:48] != _HEADER_END:
+        return None
+    return card[20:28].decode("ascii", errors="replace").strip()
+
+
+def _parse_date(value: bytes) -> datetime | None:
+    try:
+        # For example 16FEB11:10:07:55
+        return datetime.strptime(_text(value), "%d%b%y:%H:%M:%S")
+    except ValueError:
+        return None
+
+
+def _text(value: bytes) -> str:
+    return value.decode("utf-8", errors="replace").strip(" \x00")
@@ -1,6 +1,10 @@
+import struct
 from pathlib import Path
+from typing import Any
 
+import pandas as pd
 import pytest
+from pandas.io.sas import sas7bdat, sas_constants
 from typer.testing import CliRunner
 
 ASSETS_DIR = Path().absolute().joinpath("tests/assets")
@@ -64,3 +68,108 @@ def bad_xpt_file():
 @pytest.fixture(scope="session")
 def xpt_expected_dir():
     return ASSETS_DIR / "expected_xpt"
+
+
+@pytest.fixture(scope="session")
+def multi_page_sas_file(sas_file_1, tmp_path_factory):
+    """file1.sas7bdat followed by 4 data pages of 20 rows, repeating the rows of file1."""
+    file_path = tmp_path_factory.mktemp("multi_page") / "multi_page.sas7bdat"
+    _write_multi_page_sas7bdat(sas_file_1, file_path, pages=4, rows_per_page=20)
+    return file_path
+
+
+@pytest.fixture(scope="session")
+def multi_page_datetime_file(sas_file_1, tmp_path_factory):
+    """multi_page_sas_file with an hour added to the date_row of the rows on the last page."""
+    file_path = tmp_path_factory.mktemp("multi_page_datetime") / "multi_page_datetime.sas7bdat"
+    _write_multi_page_sas7bdat(sas_file_1, file_path, pages=4, rows_per_page=20, timed_pages=1)
+    return file_path
+
+
+@pytest.fixture(scope="session")
+def large_xpt_file(tmp_path_factory):
+    from sas7bdat_converter_cli.bench import DatasetSpec, synthetic_dataframe, write_xpt
+
+    file_path = tmp_path_factory.mktemp("large_xpt") / "large.xpt"
+    write_xpt(synthetic_dataframe(DatasetSpec(rows=1_000, columns=12, date_ratio=0.25)), file_path)
+    return file_path
+
+
+def _write_multi_page_sas7bdat(source, file_path, pages, rows_per_page, timed_pages=0):
+    # Append data pages to a file with a single mix page and update the row counts in its row
+    # size subheader, whose offset is captured from the pandas reader. With `timed_pages` the
+    # date_row column becomes a DTYEAR datetime and the rows on the last `timed_pages` pages get
+    # an hour added, so only those rows have a time.
+    # The private attributes of the reader aren't in the pandas stubs
+    reader_class: Any = sas7bdat.SAS7BDATReader
+    offsets = []
+    process_rowsize_subheader = reader_class._process_rowsize_subheader
+
+    def capture(reader, offset, length):
+        offsets.append(offset)
+        process_rowsize_subheader(reader, offset, length)
+
+    reader_class._process_rowsize_subheader = capture
+    try:
+        reader: Any = pd.read_sas(source, format="sas7bdat", iterator=True)
+    finally:
+        reader_class._process_rowsize_subheader = process_rowsize_subheader
+    reader.close()
+
+    data = bytearray(source.read_bytes())
+    int_format = reader.byte_order + ("q" if reader.U64 else "i")
+    rowsize_subheader = reader.header_length + offsets[0]
+    struct.pack_into(
+        int_format,
+        data,
+        rowsize_subheader + sas_constants.row_count_offset_multiplier * reader._int_length,
+        reader.row_count + pages * rows_per_page,
+    )
+    struct.pack_into(
+        int_format,
+        data,
+        rowsize_subheader
+        + sas_constants.row_count_on_mix_page_offset_multiplier * reader._int_length,
+        reader.row_count,
+    )
+
+    bit_offset = reader._page_bit_offset
+    first_row = (
+        bit_offset
+        + sas_constants.subheader_pointers_offset
+        + reader._current_page_subheaders_count * reader._subheader_pointer_length
+    )
+    first_row += first_row % 8
+    date_offset = reader._column_data_offsets[reader.column_names.index("date_row")]
+    date_format = reader.byte_order + "d"
+    if timed_pages:
+        data = data.replace(b"MMDDYY", b"DTYEAR")
+        for i in range(reader.row_count):
+            offset = reader.header_length + first_row + i * reader.row_length + date_offset
+            (days,) = struct.unpack_from(date_format, data, offset)
+            struct.pack_into(date_format, data, offset, days * 86_400)
+    rows = [
+        data[reader.header_length + first_row + i * reader.row_length :][: reader.row_length]
+        for i in range(reader.row_count)
+    ]
+    for page_number in range(pages):
+        page = bytearray(reader._page_length)
+        struct.pack_into(
+            reader.byte_order + "HHH",
+            page,
+            bit_offset + sas_constants.page_type_offset,
+            sas_constants.page_data_type,
+            rows_per_page,
+            0,
+        )
+        for i in range(rows_per_page):
+            start = bit_offset + sas_constants.subheader_pointers_offset + i * reader.row_length
+            page[start : start + reader.row_length] = rows[
+                (page_number * rows_per_page + i) % len(rows)
+            ]
+            if page_number >= pages - timed_pages:
+                (seconds,) = struct.unpack_from(date_format, page, start + date_offset)
+                struct.pack_into(date_format, page, start + date_offset, seconds + 3_600)
+        data += page
+
+    file_path.write_bytes(bytes(data))
@@ -0,0 +1,134 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from sas7bdat_converter_cli.bench import BENCH_COMMANDS, DatasetSpec, synthetic_dataframe, write_xpt
+from sas7bdat_converter_cli.main import BenchCommand, app
+from sas7bdat_converter_cli.reader import SasReader
+
+
+def test_bench_commands_match():
+    assert [x.value for x in BenchCommand] == list(BENCH_COMMANDS)
+
+
+def test_write_xpt_round_trip(tmp_path):
+    df = synthetic_dataframe(DatasetSpec(rows=500, columns=12, date_ratio=0.25))
+    df.iloc[3, 0] = None
+    xpt_file = tmp_path / "bench.xpt"
+
+    write_xpt(df, xpt_file)
+
+    result = pd.read_sas(xpt_file, encoding="latin-1")
+    assert list(result.columns) == list(df.columns)
+    assert len(result) == 500
+    for name in df.columns:
+        if df[name].dtype == object:
+            assert list(result[name]) == list(df[name].fillna(""))
+        else:
+            np.testing.assert_allclose(result[name].to_numpy(), df[name].to_numpy())
+
+    with SasReader(xpt_file) as reader:
+        assert [x.is_date for x in reader.column_info] == [False] * 3 + [True] * 3 + [False] * 6
+
+
+def test_bench(tmp_path, test_runner):
+    output_json = tmp_path / "results.json"
+    args = [
+        "bench",
+        "--rows",
+        "100",
+        "--command",
+        "to-csv",
+        "--command",
+        "to-parquet",
+        "--work-dir",
+        str(tmp_path),
+        "--output-json",
+        str(output_json),
+    ]
+
+    result = test_runner.invoke(app, args, catch_exceptions=False)
+
+    assert result.exit_code == 0
+    assert "to-parquet" in result.stdout
+    results = json.loads(output_json.read_text())
+    assert [x["command"] for x in results] == ["to-csv", "to-parquet"]
+    assert all(x["rows"] == 100 and x["output_bytes"] > 0 for x in results)
+    assert sorted(x.name for x in tmp_path.iterdir()) == [
+        "results.json",
+        "synthetic_100x20_s25_d0.xpt",
+    ]
+
+
+def test_bench_dictionary_encode(tmp_path, test_runner):
+    output_json = tmp_path / "results.json"
+    args = [
+        "bench",
+        "--rows",
+        "100",
+        "--string-cardinality",
+        "3",
+        "--command",
+        "to-arrow",
+        "--dictionary-encode",
+        "--work-dir",
+        str(tmp_path),
+        "--output-json",
+        str(output_json),
+    ]
+
+    result = test_runner.invoke(app, args, catch_exceptions=False)
+
+    assert result.exit_code == 0
+    results = json.loads(output_json.read_text())
+    assert [x["command"] for x in results] == ["to-arrow", "to-arrow --dictionary-encode"]
+    assert {x["dataset"] for x in results} == {"synthetic_100x20_s25_d0_c3.xpt"}
+    assert all(x["rows"] == 100 for x in results)
+
+
+def test_synthetic_dataframe_cardinality():
+    df = synthetic_dataframe(
+        DatasetSpec(rows=1_000, columns=4, string_ratio=0.5, string_cardinality=7)
+    )
+
+    assert [df[x].nunique() for x in df.columns[:2]] == [7, 7]
+
+
+def test_bench_input(sas_file_1, tmp_path, test_runner):
+    args = [
+        "bench",
+        "--input",
+        str(sas_file_1),
+        "--command",
+        "to-json",
+        "--work-dir",
+        str(tmp_path),
+    ]
+
+    result = test_runner.invoke(app, args, catch_exceptions=False)
+
+    assert result.exit_code == 0
+    assert "file1.sas7bdat" in result.stdout
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_bench_command_fails(tmp_path, test_runner):
+    bad_file = tmp_path / "bad.xpt"
+    bad_file.write_text("not a xpt file")
+    args = ["bench", "--input", str(bad_file), "--command", "to-csv", "--work-dir", str(tmp_path)]
+
+    result = test_runner.invoke(app, args)
+
+    assert result.exit_code == 1
+    assert "to-csv failed for bad.xpt" in result.output
+
+
+def test_bench_invalid_input(tmp_path, test_runner):
+    bad_file = tmp_path / "bad.csv"
+    bad_file.touch()
+
+    result = test_runner.invoke(app, ["bench", "--input", str(bad_file)])
+
+    assert result.exit_code == 1
+    assert "File must be either a sas7bdat file or a xpt file" in result.output
@@ -0,0 +1,143 @@
+import os
+import stat
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from sas7bdat_converter_cli.cache import ConversionCache, parse_size
+from sas7bdat_converter_cli.conversion import convert_file
+from sas7bdat_converter_cli.manifest import hash_file
+from sas7bdat_converter_cli.options import ConversionOptions
+
+
+def test_cache_hit(sas_file_1, tmp_path):
+    cache = ConversionCache(tmp_path / "cache")
+    first = convert_file("csv", sas_file_1, tmp_path / "first.csv", cache=cache)
+
+    second = convert_file("csv", sas_file_1, tmp_path / "second.csv", cache=cache)
+
+    assert first.status == "converted"
+    assert second.status == "cached"
+    assert second.rows == first.rows == 5
+    assert second.bytes_out == first.bytes_out
+    assert (tmp_path / "second.csv").read_bytes() == (tmp_path / "first.csv").read_bytes()
+    assert cache.stats().entries == 1
+
+
+def test_cache_key_includes_type_and_options(sas_file_1, tmp_path):
+    cache = ConversionCache(tmp_path / "cache")
+    sha256 = hash_file(sas_file_1)
+    options = ConversionOptions(columns=("integer_row",))
+
+    keys = {
+        cache.key(sha256, "csv", ConversionOptions()),
+        cache.key(sha256, "json", ConversionOptions()),
+        cache.key(sha256, "csv", options),
+        cache.key(hash_file(sas_file_1.with_name("file2.sas7bdat")), "csv", options),
+    }
+
+    assert len(keys) == 4
+    assert cache.key(sha256, "csv", options) == cache.key(sha256, "csv", options)
+
+
+def test_cache_key_ignores_read_options(sas_file_1, tmp_path):
+    cache = ConversionCache(tmp_path / "cache")
+    sha256 = hash_file(sas_file_1)
+    options = ConversionOptions(
+        memory_map=True, buffer_chunks=0, input_format="sas7bdat", dictionary_encode=True
+    )
+
+    assert cache.key(sha256, "csv", options) == cache.key(
+        sha256, "csv", ConversionOptions(dictionary_encode=True)
+    )
+
+
+def test_cache_entries_are_read_only(tmp_path):
+    cache = ConversionCache(tmp_path / "cache")
+    export_file = tmp_path / "out.csv"
+    export_file.write_text("a\n1\n")
+
+    cache.put("key", export_file, "csv", rows=1, columns=1)
+    linked_file = tmp_path / "linked.csv"
+    entry = cache.get("key", linked_file)
+
+    assert entry is not None
+    assert (entry.rows, entry.columns, entry.size) == (1, 1, 4)
+    assert linked_file.read_text() == "a\n1\n"
+    assert stat.S_IMODE((tmp_path / "cache" / "entries" / "key").stat().st_mode) == 0o444
+    assert stat.S_IMODE(export_file.stat().st_mode) != 0o444
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = ConversionCache(tmp_path / "cache", max_bytes=25)
+    for i, key in enumerate(["a", "b"]):
+        export_file = tmp_path / f"{key}.csv"
+        export_file.write_bytes(b"x" * 10)
+        cache.put(key, export_file, "csv")
+        os.utime(tmp_path / "cache" / "entries" / f"{key}.json", (i, i))
+    # Using a makes b the least recently used
+    cache.get("a", tmp_path / "hit.csv")
+    export_file = tmp_path / "c.csv"
+    export_file.write_bytes(b"x" * 10)
+
+    cache.put("c", export_file, "csv")
+
+    assert sorted(x.key for x in cache.entries()) == ["a", "c"]
+    assert cache.stats().size_bytes == 20
+
+
+def test_cache_miss(tmp_path):
+    cache = ConversionCache(tmp_path / "cache")
+    export_file = tmp_path / "out.csv"
+    export_file.write_text("a\n")
+    cache.put("key", export_file, "csv")
+    (tmp_path / "cache" / "entries" / "key").unlink()
+
+    assert cache.get("missing", tmp_path / "a.csv") is None
+    assert cache.get("key", tmp_path / "b.csv") is None
+    assert sorted(x.name for x in tmp_path.iterdir()) == ["cache", "out.csv"]
+
+
+def test_cache_clear(tmp_path):
+    cache = ConversionCache(tmp_path / "cache")
+    export_file = tmp_path / "out.csv"
+    export_file.write_text("a\n")
+    cache.put("a", export_file, "csv")
+    cache.put("b", export_file, "csv")
+    (tmp_path / "cache" / "tmp" / "left-over").write_text("")
+
+    assert cache.clear() == 2
+    assert cache.stats().entries == 0
+    assert list((tmp_path / "cache" / "tmp").iterdir()) == []
+
+
+def _convert_cached(args):
+    source, export_file, cache_dir = args
+    metrics = convert_file("csv", source, export_file, cache=ConversionCache(cache_dir))
+    return metrics.status
+
+
+def test_cache_concurrent_processes(sas_file_1, expected_dir, tmp_path):
+    cache_dir = tmp_path / "cache"
+    tasks = [(sas_file_1, tmp_path / f"out{i}.csv", cache_dir) for i in range(8)]
+
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        statuses = list(executor.map(_convert_cached, tasks))
+
+    assert set(statuses) <= {"converted", "cached"}
+    expected = (expected_dir / "file1.csv").read_bytes()
+    assert all(x[1].read_bytes() == expected for x in tasks)
+    assert ConversionCache(cache_dir).stats().entries == 1
+
+
+@pytest.mark.parametrize(
+    "size, expected",
+    [("1024", 1024), ("500M", 500 * 1024**2), ("10G", 10 * 1024**3), ("1.5kb", 1536)],
+)
+def test_parse_size(size, expected):
+    assert parse_size(size) == expected
+
+
+def test_parse_size_invalid():
+    with pytest.raises(ValueError, match="Invalid size: lots"):
+        parse_size("lots")
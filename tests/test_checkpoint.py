@@ -0,0 +1,47 @@
+import os
+
+from sas7bdat_converter_cli.checkpoint import Checkpoint, checkpoint_file
+from sas7bdat_converter_cli.options import ConversionOptions
+
+
+def test_checkpoint_round_trip(sas_file_1, tmp_path):
+    path = checkpoint_file(tmp_path / "out.csv")
+    checkpoint = Checkpoint.start(sas_file_1, "csv", ConversionOptions(chunk_size=10))
+    checkpoint.rows_read = 20
+    checkpoint.rows_written = 15
+    checkpoint.bytes = 1000
+
+    checkpoint.save(path)
+    loaded = Checkpoint.load(path)
+
+    assert path.name == "out.csv.checkpoint"
+    assert loaded == checkpoint
+    assert loaded.continues(Checkpoint.start(sas_file_1, "csv", ConversionOptions(chunk_size=10)))
+
+
+def test_checkpoint_continues_changed(sas_file_1, xpt_file_1, tmp_path):
+    checkpoint = Checkpoint.start(sas_file_1, "csv", ConversionOptions())
+
+    assert not checkpoint.continues(Checkpoint.start(xpt_file_1, "csv", ConversionOptions()))
+    assert not checkpoint.continues(Checkpoint.start(sas_file_1, "ndjson", ConversionOptions()))
+    assert not checkpoint.continues(
+        Checkpoint.start(sas_file_1, "csv", ConversionOptions(where="integer_row > 1"))
+    )
+
+    source = tmp_path / "file1.sas7bdat"
+    source.write_bytes(sas_file_1.read_bytes())
+    checkpoint = Checkpoint.start(source, "csv", ConversionOptions())
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert not checkpoint.continues(Checkpoint.start(source, "csv", ConversionOptions()))
+
+
+def test_checkpoint_load_invalid(tmp_path):
+    path = tmp_path / "out.csv.checkpoint"
+    assert Checkpoint.load(path) is None
+
+    path.write_text("{")
+    assert Checkpoint.load(path) is None
+
+    path.write_text('{"rows": 1}')
+    assert Checkpoint.load(path) is None
@@ -0,0 +1,103 @@
+import bz2
+import gzip
+import io
+import lzma
+
+import pyarrow as pa
+import pytest
+
+from sas7bdat_converter_cli import compression
+from sas7bdat_converter_cli.compression import (
+    ZstdWriter,
+    check_compression,
+    open_input,
+    open_output,
+    open_text_output,
+)
+
+DATA = b"".join(f"{i},row {i}\n".encode() for i in range(10_000))
+
+
+def _zstd_frames(data):
+    # Each frame starts with the zstd magic number
+    return data.count(b"\x28\xb5\x2f\xfd")
+
+
+@pytest.mark.parametrize("threads", [None, 1, 3])
+def test_zstd_writer_frames(threads, monkeypatch, tmp_path):
+    monkeypatch.setattr(compression, "_ZSTD_FRAME_BYTES", 10_000)
+    export_file = tmp_path / "out.zst"
+
+    with open_output(export_file, "zstd", level=19, threads=threads) as f:
+        for i in range(0, len(DATA), 777):
+            f.write(DATA[i : i + 777])
+
+    assert _zstd_frames(export_file.read_bytes()) == -(-len(DATA) // 10_000)
+    with open_input(export_file, "zstd") as f:
+        assert f.read() == DATA
+
+
+def test_zstd_writer_flush_ends_frame():
+    raw = io.BytesIO()
+    writer = ZstdWriter(raw, close_raw=False)
+
+    writer.write(b"first\n")
+    writer.flush()
+    flushed = raw.getvalue()
+    writer.write(b"second\n")
+    writer.close()
+
+    assert pa.input_stream(pa.py_buffer(flushed), compression="zstd").read() == b"first\n"
+    assert not raw.closed
+    assert _zstd_frames(raw.getvalue()) == 2
+
+
+def test_open_output_gzip_header(tmp_path):
+    export_file = tmp_path / "out.partial.csv.gz"
+
+    with open_output(export_file, "gzip") as f:
+        f.write(DATA)
+
+    data = export_file.read_bytes()
+    # The flags byte has no file name and the modification time is 0
+    assert data[3] & gzip.FNAME == 0
+    assert data[4:8] == b"\x00\x00\x00\x00"
+    assert b"out.partial" not in data
+    assert gzip.decompress(data) == DATA
+
+
+@pytest.mark.parametrize(
+    "compress, decompress",
+    [
+        (None, lambda x: x),
+        ("gzip", gzip.decompress),
+        ("bz2", bz2.decompress),
+        ("xz", lzma.decompress),
+        ("zstd", lambda x: pa.input_stream(pa.py_buffer(x), compression="zstd").read()),
+    ],
+)
+def test_open_output_appends_streams(compress, decompress):
+    raw = io.BytesIO()
+
+    for text in ("a,b\n", "1,2\n"):
+        with open_text_output(raw, compress, level=compress and 1) as f:
+            f.write(text)
+
+    assert not raw.closed
+    assert decompress(raw.getvalue()) == b"a,b\n1,2\n"
+
+
+@pytest.mark.parametrize(
+    "compress, level, threads, message",
+    [
+        ("lz4", None, None, "Unsupported compression: lz4"),
+        ("gzip", 10, None, "The gzip compression level must be from 0 to 9"),
+        ("bz2", 0, None, "The bz2 compression level must be from 1 to 9"),
+        ("zstd", 23, None, "The zstd compression level must be from 1 to 22"),
+        (None, 1, None, "A compression level can only be used with compression"),
+        ("xz", None, 2, "Only zstd can compress with threads"),
+    ],
+)
+def test_check_compression_invalid(compress, level, threads, message):
+    with pytest.raises(ValueError, match=message):
+        check_compression(compress, level, threads)
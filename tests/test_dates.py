@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sas7bdat_converter_cli.dates import (
+    DatetimeFormatter,
+    sas_dates_to_datetime64,
+    sas_datetimes_to_datetime64,
+    sas_times_to_datetime64,
+)
+
+
+def test_sas_dates_to_datetime64():
+    got = sas_dates_to_datetime64(np.array([0.0, -3652.0, 21185.5, np.nan]))
+
+    assert got.tolist()[:3] == [
+        pd.Timestamp("1960-01-01").date(),
+        pd.Timestamp("1950-01-01").date(),
+        pd.Timestamp("2018-01-01").date(),
+    ]
+    assert np.isnat(got[3])
+
+
+def test_sas_datetimes_to_datetime64():
+    got = sas_datetimes_to_datetime64(np.array([0.0, 1830384000.123, np.nan]))
+
+    assert got[0] == np.datetime64("1960-01-01T00:00:00.000")
+    assert got[1] == np.datetime64("2018-01-01T00:00:00.123")
+    assert np.isnat(got[2])
+
+
+def test_sas_times_to_datetime64():
+    got = sas_times_to_datetime64(np.array([0.0, 45296.0, np.nan]))
+
+    assert np.datetime_as_string(got[:2], unit="s").tolist() == [
+        "1970-01-01T00:00:00",
+        "1970-01-01T12:34:56",
+    ]
+    assert np.isnat(got[2])
+
+
+@pytest.mark.parametrize("date_format", ["%Y-%m-%d", "%d%b%Y", "%Y-%m-%dT%H:%M:%S", "%H:%M"])
+def test_datetime_formatter_matches_strftime(date_format):
+    rng = np.random.default_rng(0)
+    values = sas_datetimes_to_datetime64(rng.integers(0, 2_000_000_000, 1_000).astype(float))
+    values[::7] = np.datetime64("NaT")
+    formatter = DatetimeFormatter(date_format, cache_size=100)
+    expected = pd.Series(values).dt.strftime(date_format)
+
+    got = np.concatenate([formatter.format(values[i : i + 300]) for i in range(0, 1_000, 300)])
+
+    assert got.tolist() == [None if pd.isna(x) else x for x in expected]
+
+
+def test_datetime_formatter_reuses_cached_values(monkeypatch):
+    formatter = DatetimeFormatter("%d%b%Y")
+    values = sas_dates_to_datetime64(np.array([1.0, 2.0, 1.0]))
+    formatter.format(values)
+    formatted = []
+    original = formatter._format
+
+    def record_format(values):
+        formatted.extend(values)
+        return original(values)
+
+    monkeypatch.setattr(formatter, "_format", record_format)
+
+    got = formatter.format(sas_dates_to_datetime64(np.array([2.0, 3.0])))
+
+    assert got.tolist() == ["03Jan1960", "04Jan1960"]
+    assert formatted == [np.datetime64("1960-01-04")]
@@ -0,0 +1,56 @@
+import pandas as pd
+
+from sas7bdat_converter_cli.inspection import inspect_dir, inspect_file
+
+
+def test_inspect_file_sas7bdat(sas_file_1):
+    info = inspect_file(sas_file_1)
+
+    assert info.format == "sas7bdat"
+    assert info.name == "FILE1"
+    assert info.rows == len(pd.read_sas(sas_file_1))
+    assert [x.name for x in info.columns] == ["integer_row", "text_row", "float_row", "date_row"]
+    assert [x.type for x in info.columns] == ["number", "string", "number", "number"]
+    assert info.columns[3].format == "MMDDYY"
+    assert info.encoding == "cp1252"
+    assert info.compression is None
+    assert info.created == "2018-05-25T09:53:43.464999"
+    assert info.size_bytes == sas_file_1.stat().st_size
+
+
+def test_inspect_file_xpt(xpt_file_1):
+    info = inspect_file(xpt_file_1)
+
+    assert info.format == "xpt"
+    assert info.rows == 2
+    assert [x.name for x in info.columns] == ["irow", "trow", "frow"]
+    assert info.encoding is None
+    assert info.modified == "2020-10-01T20:45:07"
+
+
+def test_inspect_file_multi_page(multi_page_sas_file):
+    assert inspect_file(multi_page_sas_file).rows == 85
+
+
+def test_inspect_dir(sas7bdat_dir, bad_sas_file, tmp_path):
+    for sas_file in sas7bdat_dir.iterdir():
+        (tmp_path / sas_file.name).write_bytes(sas_file.read_bytes())
+    (tmp_path / bad_sas_file.name).write_bytes(bad_sas_file.read_bytes())
+    (tmp_path / "notes.txt").write_text("not a dataset")
+
+    results = inspect_dir(tmp_path, jobs=2)
+
+    assert [x.source.name for x in results] == [
+        "bad_sas_file.sas7bdat",
+        "file1.sas7bdat",
+        "file2.sas7bdat",
+        "file3.sas7bdat",
+    ]
+    assert not results[0].succeeded
+    assert results[0].to_dict() == {"file_path": str(results[0].source), "error": results[0].error}
+    names = []
+    for result in results[1:]:
+        assert result.info is not None
+        names.append(result.info.name)
+    assert names == ["FILE1", "FILE2", "FILE3"]
+    assert results[1].to_dict()["columns"][0]["name"] == "integer_row"
@@ -1,12 +1,22 @@
+import bz2
+import gzip
+import io
 import json
+import lzma
 import shutil
 import sys
+import xml.etree.ElementTree as ET
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pytest
+from sas7bdat_converter import to_dataframe
 
 from sas7bdat_converter_cli.main import __version__, app
+from sas7bdat_converter_cli.manifest import MANIFEST_NAME
 
 if sys.version_info < (3, 11):
     import tomli as tomllib
@@ -69,6 +79,121 @@ def test_to_csv_xpt(fixture_name, expected_name, xpt_expected_dir, test_runner,
     assert got == expected
 
 
+@pytest.mark.parametrize("chunk_size", ["1", "2", "1000"])
+@pytest.mark.parametrize(
+    "fixture_name", ["sas_file_1", "sas_file_2", "sas_file_3", "xpt_file_1", "xpt_file_2"]
+)
+def test_to_csv_chunk_size(chunk_size, fixture_name, test_runner, tmp_path, request):
+    sas_file = Path(request.getfixturevalue(fixture_name))
+    full_file = tmp_path / "full.csv"
+    chunked_file = tmp_path / "chunked.csv"
+    test_runner.invoke(app, ["to-csv", str(sas_file), str(full_file)], catch_exceptions=False)
+    args = ["to-csv", str(sas_file), str(chunked_file), "--chunk-size", chunk_size]
+    test_runner.invoke(app, args, catch_exceptions=False)
+
+    assert chunked_file.read_bytes() == full_file.read_bytes()
+
+
+@pytest.mark.parametrize("fixture_name", ["sas_file_1", "xpt_file_1"])
+def test_to_csv_memory_map(fixture_name, test_runner, tmp_path, request):
+    sas_file = Path(request.getfixturevalue(fixture_name))
+    full_file = tmp_path / "full.csv"
+    mapped_file = tmp_path / "mapped.csv"
+    test_runner.invoke(app, ["to-csv", str(sas_file), str(full_file)], catch_exceptions=False)
+    args = ["to-csv", str(sas_file), str(mapped_file), "--memory-map"]
+    test_runner.invoke(app, args, catch_exceptions=False)
+
+    assert mapped_file.read_bytes() == full_file.read_bytes()
+
+
+@pytest.mark.parametrize("fixture_name", ["sas_file_1", "xpt_file_2"])
+def test_to_csv_stdin_stdout(fixture_name, test_runner, tmp_path, request):
+    sas_file = Path(request.getfixturevalue(fixture_name))
+    full_file = tmp_path / "full.csv"
+    test_runner.invoke(app, ["to-csv", str(sas_file), str(full_file)], catch_exceptions=False)
+    args = ["to-csv", "-", "-", "--input-format", sas_file.suffix[1:]]
+
+    result = test_runner.invoke(app, args, input=sas_file.read_bytes(), catch_exceptions=False)
+
+    assert result.exit_code == 0
+    assert result.stdout_bytes == full_file.read_bytes()
+
+
+@pytest.mark.parametrize(
+    "command, suffix",
+    [("to-csv", ".csv"), ("to-json", ".json"), ("to-xml", ".xml")],
+)
+@pytest.mark.parametrize("fixture_name", ["sas_file_3", "xpt_file_2"])
+def test_to_text_dictionary_encode(command, suffix, fixture_name, test_runner, tmp_path, request):
+    sas_file = Path(request.getfixturevalue(fixture_name))
+    plain_file = tmp_path / f"plain{suffix}"
+    encoded_file = tmp_path / f"encoded{suffix}"
+    test_runner.invoke(app, [command, str(sas_file), str(plain_file)], catch_exceptions=False)
+    args = [command, str(sas_file), str(encoded_file), "--dictionary-encode"]
+
+    result = test_runner.invoke(app, args, catch_exceptions=False)
+
+    assert result.exit_code == 0
+    assert encoded_file.read_bytes() == plain_file.read_bytes()
+
+
+@pytest.mark.parametrize(
+    "command, suffix", [("to-parquet", ".parquet"), ("to-arrow", ".arrow"), ("to-excel", ".xlsx")]
+)
+def test_to_binary_stdin_and_stdout(command, suffix, xpt_file_1, test_runner, tmp_path):
+    from_stdin = tmp_path / f"from_stdin{suffix}"
+    args = [command, "-", str(from_stdin), "--input-format", "xpt"]
+    test_runner.invoke(app, args, input=xpt_file_1.read_bytes(), catch_exceptions=False)
+
+    result = test_runner.invoke(app, [command, str(xpt_file_1), "-"], catch_exceptions=False)
+    to_stdout = tmp_path / f"to_stdout{suffix}"
+    to_stdout.write_bytes(result.stdout_bytes)
+
+    expected = to_dataframe(xpt_file_1)
+    for file_path in (from_stdin, to_stdout):
+        if suffix == ".xlsx":
+            got = pd.read_excel(file_path)
+        elif suffix == ".arrow":
+            got = pa.ipc.open_file(file_path).read_pandas()
+        else:
+            got = pd.read_parquet(file_path)
+        assert got["irow"].tolist() == expected["irow"].tolist()
+    assert not list(tmp_path.glob("*partial*"))
+
+
+def test_to_ndjson_stdout_compressed(xpt_file_2, test_runner):
+    args = ["to-json", str(xpt_file_2), "-", "--ndjson", "--compress", "gzip"]
+    result = test_runner.invoke(app, args, catch_exceptions=False)
+
+    lines = gzip.decompress(result.stdout_bytes).decode("utf-8").splitlines()
+    assert len(lines) == len(to_dataframe(xpt_file_2))
+
+
+@pytest.mark.parametrize(
+    "args, message",
+    [
+        (["to-csv", "-", "out.csv"], "--input-format is required when reading from stdin"),
+        (["to-csv", "-", "-", "--input-format", "xpt", "--resume"], "--resume can't be used"),
+        (["to-xml", "-", "-", "--input-format", "xpt", "--shards", "2"], "--shards can't be used"),
+        (["to-parquet", "-", "-", "--input-format", "xpt", "--cache"], "--cache can't be used"),
+        (["to-arrow", "-", "-", "--input-format", "xpt", "--memory-map"], "--memory-map can't"),
+    ],
+)
+def test_to_stdin_stdout_invalid(args, message, test_runner):
+    result = test_runner.invoke(app, args, input=b"", catch_exceptions=False)
+
+    assert result.exit_code != 0
+    assert message in result.stdout
+
+
+def test_to_csv_chunk_size_invalid(sas_file_1, test_runner, tmp_path):
+    args = ["to-csv", str(sas_file_1), str(tmp_path / "file1.csv"), "--chunk-size", "0"]
+    result = test_runner.invoke(app, args)
+
+    assert result.exit_code != 0
+    assert not (tmp_path / "file1.csv").exists()
+
+
 def test_to_csv_invalid_extension(test_runner, tmp_path):
     bad = tmp_path / "bad.txt"
     converted_file = tmp_path / "test.csv"
@@ -135,6 +260,20 @@ def test_dir_to_csv_same_dir_path_xpt(xpt_dir, test_runner, tmp_path):
     assert sas_counter == convert_counter
 
 
+def test_dir_to_csv_chunk_size(sas7bdat_dir, expected_dir, test_runner, tmp_path):
+    args = ["dir-to-csv", str(sas7bdat_dir), "-o", str(tmp_path), "--chunk-size", "2", "-j", "2"]
+    test_runner.invoke(app, args, catch_exceptions=False)
+
+    for expected_file in expected_dir.glob("*.csv"):
+        with open(expected_file) as f:
+            expected = f.read().rstrip()
+
+        with open(tmp_path / expected_file.name) as f:
+            got = f.read().rstrip()
+
+        assert got == expected
+
+
 @pytest.mark.parametrize("continue_on_error", ["--continue-on-error", "-c"])
 def test_dir_to_csv_continue(continue_on_error, test_runner, tmp_path, sas7bdat_dir, bad_sas_file):
     sas_files = [str(x) for x in sas7bdat_dir.iterdir()]
@@ -152,6 +291,83 @@ def test_dir_to_csv_continue(continue_on_error, test_runner, tmp_path, sas7bdat_
     assert sas_counter == convert_counter
 
 
+@pytest.mark.parametrize("flag", ["--jobs", "-j"])
+@pytest.mark.parametrize(
+    "command, suffix",
+    [
+        ("dir-to-csv", ".csv"),
+        ("dir-to-excel", ".xlsx"),
+        ("dir-to-json", ".json"),
+        ("dir-to-xml", ".xml"),
+    ],
+)
+def test_dir_to_jobs(flag, command, suffix, sas7bdat_dir, test_runner, tmp_path):
+    args = [command, str(sas7bdat_dir), "-o", str(tmp_path), flag, "2"]
+    result = test_runner.invoke(app, args, catch_exceptions=False)
+    sas_counter = len([name for name in sas7bdat_dir.iterdir() if name.suffix == ".sas7bdat"])
+    convert_counter = len([name for name in tmp_path.iterdir() if name.suffix == suffix])
+
+    assert sas_counter == convert_counter
+    assert f"Converted {sas_counter} of {sas_counter} files" in result.stdout
+
+
+def test_dir_to_csv_jobs_matches_serial(sas7bdat_dir, test_runner, tmp_path):
+    serial_dir = tmp_path / "serial"
+    parallel_dir = tmp_path / "parallel"
+    serial_dir.mkdir()
+    parallel_dir.mkdir()
+    test_runner.invoke(app, ["dir-to-csv", str(sas7bdat_dir), "-o", str(serial_dir)])
+    test_runner.invoke(app, ["dir-to-csv", str(sas7bdat_dir), "-o", str(parallel_dir), "-j", "0"])
+
+    for serial_file in serial_dir.iterdir():
+        assert serial_file.read_text() == (parallel_dir / serial_file.name).read_text()
+
+
+def test_dir_to_csv_memory_map(sas7bdat_dir, test_runner, tmp_path):
+    serial_dir = tmp_path / "serial"
+    mapped_dir = tmp_path / "mapped"
+    serial_dir.mkdir()
+    mapped_dir.mkdir()
+    test_runner.invoke(app, ["dir-to-csv", str(sas7bdat_dir), "-o", str(serial_dir)])
+    args = ["dir-to-csv", str(sas7bdat_dir), "-o", str(mapped_dir), "-j", "2", "--memory-map"]
+    test_runner.invoke(app, args, catch_exceptions=False)
+
+    for serial_file in serial_dir.iterdir():
+        assert serial_file.read_bytes() == (mapped_dir / serial_file.name).read_bytes()
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_dir_to_csv_jobs_continue(jobs, test_runner, tmp_path, sas7bdat_dir, bad_sas_file):
+    sas_files = [str(x) for x in sas7bdat_dir.iterdir()]
+    for sas_file in sas_files:
+        shutil.copy(sas_file, str(tmp_path))
+
+    shutil.copy(bad_sas_file, str(tmp_path))
+
+    args = ["dir-to-csv", str(tmp_path), "-c", "-v", "-j", jobs]
+    result = test_runner.invoke(app, args, catch_exceptions=False)
+
+    sas_counter = len([name for name in tmp_path.iterdir() if name.suffix == ".sas7bdat"]) - 1
+    convert_counter = len([name for name in tmp_path.iterdir() if name.suffix == ".csv"])
+
+    assert sas_counter == convert_counter
+    assert "Error converting" in result.stdout
+    assert f"Converted {sas_counter} of {sas_counter + 1} files, 1 failed" in result.stdout
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_dir_to_csv_jobs_stops_on_error(jobs, test_runner, tmp_path, sas7bdat_dir, bad_sas_file):
+    for sas_file in sas7bdat_dir.iterdir():
+        shutil.copy(sas_file, str(tmp_path))
+
+    shutil.copy(bad_sas_file, str(tmp_path))
+
+    result = test_runner.invoke(app, ["dir-to-csv", str(tmp_path), "-j", jobs])
+
+    assert result.exit_code != 0
+    assert "Converted" not in result.stdout
+
+
 @pytest.mark.parametrize(
     "fixture_name, expected_name",
     [("sas_file_1", "file1.xlsx"), ("sas_file_2", "file2.xlsx"), ("sas_file_3", "file3.xlsx")],
@@ -456,6 +672,27 @@ def test_to_xml_invalid_output_extension(test_runner, tmp_path):
     assert "The export file must be a XML file" in out
 
 
+def test_to_xml_names_and_attributes(sas_file_1, test_runner, tmp_path):
+    converted_file = tmp_path / "file1.xml"
+    args = ["to-xml", str(sas_file_1), str(converted_file), "--root-name", "dataset"]
+    args += ["--row-name", "record", "--attributes"]
+    test_runner.invoke(app, args, catch_exceptions=False)
+
+    root = ET.parse(converted_file).getroot()
+    assert root.tag == "dataset"
+    assert len(root.findall("record")) == 5
+    assert all(len(x) == 0 and "integer_row" in x.attrib for x in root)
+
+
+@pytest.mark.parametrize("command", ["to-xml", "dir-to-xml"])
+def test_to_xml_invalid_name(command, sas_file_1, test_runner, tmp_path):
+    args = [command, str(sas_file_1 if command == "to-xml" else tmp_path)]
+    args += [str(tmp_path / "file1.xml")] if command == "to-xml" else []
+    result = test_runner.invoke(app, args + ["--row-name", "<row>"], catch_exceptions=False)
+
+    assert "--row-name must be a valid XML element name" in result.stdout
+
+
 @pytest.mark.parametrize("flag", ["--output-dir", "-o"])
 def test_dir_to_xml_different_dir_sas(flag, sas7bdat_dir, test_runner, tmp_path):
     args = ["dir-to-xml", str(sas7bdat_dir), flag, str(tmp_path)]
@@ -517,3 +754,1451 @@ def test_dir_to_xml_continue(continue_on_error, test_runner, tmp_path, sas7bdat_
     convert_counter = len([name for name in tmp_path.iterdir() if name.suffix == ".xml"])
 
     assert sas_counter == convert_counter
+
+
+@pytest.mark.parametrize(
+    "fixture_name", ["sas_file_1", "sas_file_2", "sas_file_3", "xpt_file_1", "xpt_file_2"]
+)
+def test_to_parquet(fixture_name, test_runner, tmp_path, request):
+    sas_file = Path(request.getfixturevalue(fixture_name))
+    converted_file = tmp_path / "converted.parquet"
+    args = ["to-parquet", str(sas_file), str(converted_file)]
+    test_runner.invoke(app, args, catch_exceptions=False)
+
+    expected = to_dataframe(sas_file)
+    got = pd.read_parquet(converted_file)
+    for col in expected.select_dtypes(include=["datetime"]):
+        expected[col] = expected[col].dt.date
+
+    pd.testing.assert_frame_equal(got, expected, check_dtype=False)
+
+
+def test_to_parquet_preserves_types(sas_file_1, test_runner, tmp_path):
+    converted_file = tmp_path / "file1.parquet"
+    args = ["to-parquet", str(sas_file_1), str(converted_file)]
+    test_runner.invoke(app, args, catch_exceptions=False)
+    schema = pq.read_schema(converted_file)
+
+    assert schema.field("integer_row").type == pa.float64()
+    assert schema.field("text_row").type == pa.string()
+    assert schema.field("date_row").type == pa.date32()
+
+
+@pytest.mark.parametrize("compression", ["snappy", "zstd", "none"])
+def test_to_parquet_row_groups(compression, sas_file_1, test_runner, tmp_path):
+    converted_file = tmp_path / "file1.parquet"
+    args = [
+        "to-parquet",
+        str(sas_file_1),
+        str(converted_file),
+        "--compression",
+        compression,
+        "--row-group-size",
+        "2",
+    ]
+    test_runner.invoke(app, args, catch_exceptions=False)
+    metadata = pq.ParquetFile(converted_file).metadata
+
+    assert metadata.num_row_groups == 3
+    assert metadata.num_rows == 5
+    assert metadata.row_group(0).column(0).compression == compression.upper().replace(
+        "NONE", "UNCOMPRESSED"
+    )
+
+
+def test_to_parquet_invalid_extension(test_runner, tmp_path):
+    bad = tmp_path / "bad.txt"
+    converted_file = tmp_path / "test.parquet"
+    args = ["to-parquet", str(bad), str(converted_file)]
+    result = test_runner.invoke(app, args, catch_exceptions=False)
+    out = result.stdout
+
+    assert "File must be either a sas7bdat file or a xpt file" in out
+
+
+def test_to_parquet_invalid_output_extension(test_runner, tmp_path):
+    sas_file = tmp_path / "file.sas7bdat"
+    converted_file = tmp_path / "test.txt"
+    args = ["to-parquet", str(sas_file), str(converted_file)]
+    result = test_runner.invoke(app, args, catch_exceptions=False)
+    out = result.stdout
+
+    assert "The export file must be a parquet file" in out
+
+
+@pytest.mark.parametrize("command", ["to-parquet", "to-arrow"])
+@pytest.mark.parametrize("fixture_name", ["sas_file_1", "xpt_file_2"])
+def test_to_binary_dictionary_encode(command, fixture_name, test_runner, tmp_path, request):
+    sas_file = Path(request.getfixturevalue(fixture_name))
+    suffix, size_option = (
+        (".parquet", "--row-group-size") if command == "to-parquet" else (".arrow", "--batch-size")
+    )
+    plain_file = tmp_path / f"plain{suffix}"
+    encoded_file = tmp_path / f"encoded{suffix}"
+    test_runner.invoke(app, [command, str(sas_file), str(plain_file)], catch_exceptions=False)
+    args = [command, str(sas_file), str(encoded_file), "--dictionary-encode", size_option, "2"]
+
+    result = test_runner.invoke(app, args, catch_exceptions=False)
+
+    assert result.exit_code == 0
+    if command == "to-parquet":
+        plain, encoded = pq.read_table(plain_file), pq.read_table(encoded_file)
+    else:
+        plain = pa.ipc.open_file(plain_file).read_all()
+        encoded = pa.ipc.open_file(encoded_file).read_all()
+    strings = [x.name for x in plain.schema if x.type == pa.string()]
+    assert strings
+    assert all(pa.types.is_dictionary(encoded.schema.field(x).type) for x in strings)
+    assert encoded.cast(plain.schema).equals(plain)
+
+
+@pytest.mark.parametrize(
+    "fixture_name", ["sas_file_1", "sas_file_2", "sas_file_3", "xpt_file_1", "xpt_file_2"]
+)
+def test_to_arrow(fixture_name, test_runner, tmp_path, request):
+    sas_file = Path(request.getfixturevalue(fixture_name))
+    converted_file = tmp_path / "converted.arrow"
+    args = ["to-arrow", str(sas_file), str(converted_file)]
+    test_runner.invoke(app, args, catch_exceptions=False)
+
+    expected = to_dataframe(sas_file)
+    with pa.ipc.open_file(converted_file) as reader:
+        got = reader.read_pandas()
+    for col in expected.select_dtypes(include=["datetime"]):
+        expected[col] = expected[col].dt.date
+
+    pd.testing.assert_frame_equal(got, expected, check_dtype=False)
+
+
+@pytest.mark.parametrize("compression", ["zstd", "lz4", "none"])
+def test_to_arrow_batches(compression, sas_file_1, test_runner, tmp_path):
+    converted_file = tmp_path / "file1.arrow"
+    args = [
+        "to-arrow",
+        str(sas_file_1),
+        str(converted_file),
+        "--compression",
+        compression,
+        "--batch-size",
+        "2",
+    ]
+    test_runner.invoke(app, args, catch_exceptions=False)
+
+    with pa.ipc.open_file(converted_file) as reader:
+        assert reader.num_record_batches == 3
+        assert reader.schema.field("date_row").type == pa.date32()
+        assert reader.read_all().num_rows == 5
+
+
+def test_to_arrow_invalid_extension(test_runner, tmp_path):
+    bad = tmp_path / "bad.txt"
+    converted_file = tmp_path / "test.arrow"
+    args = ["to-arrow", str(bad), str(converted_file)]
+    result = test_runner.invoke(app, args, catch_exceptions=False)
+    out = result.stdout
+
+    assert "File must be either a sas7bdat file or a xpt file" in out
+
+
+def test_to_arrow_invalid_output_extension(test_runner, tmp_path):
+    sas_file = tmp_path / "file.sas7bdat"
+    converted_file = tmp_path / "test.txt"
+    args = ["to-arrow", str(sas_file), str(converted_file)]
+    result = test_runner.invoke(app, args, catch_exceptions=False)
+    out = result.stdout
+
+    assert "The export file must be an arrow file" in out
+
+
+@pytest.mark.parametrize(
+    "command, suffix", [("dir-to-parquet", ".parquet"), ("dir-to-arrow", ".arrow")]
+)
+@pytest.mark.parametrize(
+    "source_dir, source_suffix", [("sas7bdat_dir", ".sas7bdat"), ("xpt_dir", ".xpt")]
+)
+def test_dir_to_columnar(
+    command, suffix, source_dir, source_suffix, test_runner, tmp_path, request
+):
+    source_dir = request.getfixturevalue(source_dir)
+    args = [command, str(source_dir), "-o", str(tmp_path), "-j", "2"]
+    test_runner.invoke(app, args, catch_exceptions=False)
+    sas_counter = len([name for name in source_dir.iterdir() if name.suffix == source_suffix])
+    convert_counter = len([name for name in tmp_path.iterdir() if name.suffix == suffix])
+
+    assert sas_counter == convert_counter
+
+
+@pytest.mark.parametrize("command", ["dir-to-parquet", "dir-to-arrow"])
+def test_dir_to_columnar_continue(command, test_runner, tmp_path, sas7bdat_dir, bad_sas_file):
+    for sas_file in sas7bdat_dir.iterdir():
+        shutil.copy(sas_file, str(tmp_path))
+
+    shutil.copy(bad_sas_file, str(tmp_path))
+
+    result = test_runner.invoke(app, [command, str(tmp_path), "-c"], catch_exceptions=False)
+
+    assert "Converted 3 of 4 files, 1 failed" in result.stdout
+
+
+def test_dir_to_csv_incremental(sas7bdat_dir, sas_file_2, test_runner, tmp_path):
+    source_dir = tmp_path / "source"
+    output_dir = tmp_path / "output"
+    shutil.copytree(sas7bdat_dir, source_dir)
+    output_dir.mkdir()
+    args = ["dir-to-csv", str(source_dir), "-o", str(output_dir), "--incremental"]
+
+    result = test_runner.invoke(app, args, catch_exceptions=False)
+    assert "Converted 3 of 3 files" in result.stdout
+    assert (output_dir / MANIFEST_NAME).exists()
+
+    result = test_runner.invoke(app, args, catch_exceptions=False)
+    assert "Converted 0 of 3 files, 3 unchanged" in result.stdout
+
+    shutil.copy(sas_file_2, source_dir / "file1.sas7bdat")
+    (output_dir / "file3.csv").unlink()
+    result = test_runner.invoke(app, args, catch_exceptions=False)
+    assert "Converted 2 of 3 files, 1 unchanged" in result.stdout
+    assert (output_dir / "file1.csv").read_text() == (output_dir / "file2.csv").read_text()
+
+    result = test_runner.invoke(app, args + ["--chunk-size", "2"], catch_exceptions=False)
+    assert "Converted 3 of 3 files" in result.stdout
+
+
+def test_dir_to_csv_incremental_continue(test_runner, tmp_path, sas7bdat_dir, bad_sas_file):
+    for sas_file in sas7bdat_dir.iterdir():
+        shutil.copy(sas_file, str(tmp_path))
+
+    shutil.copy(bad_sas_file, str(tmp_path))
+    args = ["dir-to-csv", str(tmp_path), "--incremental", "-c", "-j", "2"]
+
+    test_runner.invoke(app, args, catch_exceptions=False)
+    result = test_runner.invoke(app, args, catch_exceptions=False)
+
+    assert "Converted 0 of 4 files, 3 unchanged, 1 failed" in result.stdout
+
+
+@pytest.mark.parametrize(
+    "command, suffix, expected_name",
+    [
+        ("to-csv", ".csv", "file1.csv"),
+        ("to-json", ".json", "file1.json"),
+        ("to-xml", ".xml", "file1.xml"),
+    ],
+)
+def test_to_all_columns_matches_default(
+    command, suffix, expected_name, sas_file_1, expected_dir, test_runner, tmp_path
+):
+    converted_file = tmp_path / f"file1{suffix}"
+    args = [command, str(sas_file_1), str(converted_file)]
+    args += ["--columns", "integer_row,text_row,float_row,date_row"]
+    test_runner.invoke(app, args, catch_exceptions=False)
+
+    expected = (expected_dir / expected_name).read_text().rstrip()
+    if suffix == ".json":
+        assert json.loads(converted_file.read_text()) == json.loads(expected)
+    else:
+        assert converted_file.read_text().rstrip() == expected
+
+
+def test_to_excel_all_columns_matches_default(sas_file_1, expected_dir, test_runner, tmp_path):
+    converted_file = tmp_path / "file1.xlsx"
+    args = ["to-excel", str(sas_file_1), str(converted_file), "--where", "integer_row > 0"]
+    test_runner.invoke(app, args, catch_exceptions=False)
+
+    df_expected = pd.read_excel(expected_dir / "file1.xlsx", engine="openpyxl")
+    df_converted = pd.read_excel(converted_file, engine="openpyxl")
+
+    pd.testing.assert_frame_equal(df_expected, df_converted)
+
+
+@pytest.mark.parametrize(
+    "command, suffix",
+    [
+        ("to-csv", ".csv"),
+        ("to-excel", ".xlsx"),
+        ("to-json", ".json"),
+        ("to-xml", ".xml"),
+        ("to-parquet", ".parquet"),
+        ("to-arrow", ".arrow"),
+    ],
+)
+def test_to_columns_where(command, suffix, sas_file_1, test_runner, tmp_path):
+    converted_file = tmp_path / f"file1{suffix}"
+    args = [command, str(sas_file_1), str(converted_file)]
+    args += [
+        "--columns",
+        "text_row, integer_row",
+        "--where",
+        "float_row > 3 and text_row != 'Text'",
+    ]
+    test_runner.invoke(app, args, catch_exceptions=False)
+
+    if suffix == ".csv":
+        got = pd.read_csv(converted_file)
+    elif suffix == ".xlsx":
+        got = pd.read_excel(converted_file, engine="openpyxl")
+    elif suffix == ".json":
+        got = pd.read_json(converted_file)
+    elif suffix == ".xml":
+        got = pd.read_xml(converted_file, parser="etree")
+    elif suffix == ".parquet":
+        got = pd.read_parquet(converted_file)
+    else:
+        with pa.ipc.open_file(converted_file) as reader:
+            got = reader.read_pandas()
+
+    assert list(got.columns) == ["text_row", "integer_row"]
+    assert got["integer_row"].tolist() == [2.0, 3.0, 5.0]
+    assert got["text_row"].tolist()[::2] == ["Some more text", "Test"]
+
+
+def test_to_csv_where_no_rows(sas_file_1, test_runner, tmp_path):
+    converted_file = tmp_path / "file1.csv"
+    args = ["to-csv", str(sas_file_1), str(converted_file), "--where", "integer_row > 100"]
+    test_runner.invoke(app, args, catch_exceptions=False)
+
+    assert converted_file.read_text().strip() == '"integer_row","text_row","float_row","date_row"'
+
+
+def test_to_csv_unknown_column(sas_file_1, test_runner, tmp_path):
+    args = ["to-csv", str(sas_file_1), str(tmp_path / "file1.csv"), "--columns", "missing"]
+    result = test_runner.invoke(app, args)
+
+    assert result.exit_code == 1
+    assert "Columns not found in file1.sas7bdat: missing" in result.output
+
+
+@pytest.mark.parametrize("where", ["missing > 1", "integer_row >", "integer_row = 1"])
+def test_to_csv_invalid_where(where, sas_file_1, test_runner, tmp_path):
+    args = ["to-csv", str(sas_file_1), str(tmp_path / "file1.csv"), "--where", where]
+    result = test_runner.invoke(app, args)
+
+    assert result.exit_code == 1
+    assert f"Invalid where expression {where!r}" in result.output
+
+
+def test_dir_to_csv_invalid_where(xpt_dir, test_runner, tmp_path):
+    args = ["dir-to-csv", str(xpt_dir), "--output-dir", str(tmp_path), "--where", "missing > 1"]
+    result = test_runner.invoke(app, args)
+
+    assert result.exit_code == 1
+    assert "Invalid where expression 'missing > 1'" in result.output
+
+
+@pytest.mark.parametrize("command", ["dir-to-csv", "dir-to-json", "dir-to-parquet"])
+def test_dir_to_columns_where(command, xpt_dir, test_runner, tmp_path):
+    args = [
+        command,
+        str(xpt_dir),
+        "-o",
+        str(tmp_path),
+        "--columns",
+        "trow",
+        "--where",
+        "irow in (2, 3)",
+    ]
+    test_runner.invoke(app, args, catch_exceptions=False)
+
+    for converted_file in tmp_path.iterdir():
+        if converted_file.suffix == ".csv":
+            got = pd.read_csv(converted_file)
+        elif converted_file.suffix == ".json":
+            got = pd.read_json(converted_file)
+        else:
+            got = pd.read_parquet(converted_file)
+
+        assert list(got.columns) == ["trow"]
+        assert len(got) == 1
+
+
+@pytest.mark.parametrize(
+    "command, suffix, extra_args",
+    [
+        ("to-csv", ".csv", []),
+        ("to-csv", ".csv", ["--chunk-size", "2"]),
+        ("to-parquet", ".parquet", ["--where", "integer_row > 2"]),
+    ],
+)
+def test_to_metrics_file(command, suffix, extra_args, sas_file_1, test_runner, tmp_path):
+    metrics_file = tmp_path / "metrics.jsonl"
+    export_file = tmp_path / f"file1{suffix}"
+    args = [command, str(sas_file_1), str(export_file), "--metrics-file", str(metrics_file)]
+
+    test_runner.invoke(app, args + extra_args, catch_exceptions=False)
+    test_runner.invoke(app, args + extra_args, catch_exceptions=False)
+
+    lines = [json.loads(x) for x in metrics_file.read_text().splitlines()]
+    assert len(lines) == 2
+    metrics = lines[0]
+    assert metrics["status"] == "converted"
+    assert metrics["rows"] == (3 if "--where" in extra_args else 5)
+    assert metrics["columns"] == 4
+    assert metrics["bytes_in"] == sas_file_1.stat().st_size
+    assert metrics["bytes_out"] == export_file.stat().st_size
+    assert metrics["total_seconds"] > 0
+    assert metrics["peak_memory_bytes"] > 0
+    if extra_args:
+        assert metrics["read_seconds"] > 0
+        assert metrics["write_seconds"] > 0
+        assert metrics["convert_seconds"] >= 0
+    else:
+        assert metrics["read_seconds"] is None
+
+
+def test_to_metrics_file_failed(bad_sas_file, test_runner, tmp_path):
+    metrics_file = tmp_path / "metrics.jsonl"
+    args = [
+        "to-csv",
+        str(bad_sas_file),
+        str(tmp_path / "bad.csv"),
+        "--metrics-file",
+        str(metrics_file),
+    ]
+
+    result = test_runner.invoke(app, args)
+
+    assert result.exit_code != 0
+    metrics = json.loads(metrics_file.read_text())
+    assert metrics["status"] == "failed"
+    assert metrics["error"]
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_dir_to_metrics_file(jobs, sas7bdat_dir, bad_sas_file, test_runner, tmp_path):
+    source_dir = tmp_path / "source"
+    shutil.copytree(sas7bdat_dir, source_dir)
+    shutil.copy(bad_sas_file, source_dir)
+    metrics_file = tmp_path / "metrics.jsonl"
+    args = [
+        "dir-to-csv",
+        str(source_dir),
+        "-c",
+        "-j",
+        jobs,
+        "--incremental",
+        "--metrics-file",
+        str(metrics_file),
+    ]
+
+    test_runner.invoke(app, args, catch_exceptions=False)
+    test_runner.invoke(app, args, catch_exceptions=False)
+
+    lines = [json.loads(x) for x in metrics_file.read_text().splitlines()]
+    first_run = {Path(x["source"]).name: x for x in lines[:4]}
+    second_run = {Path(x["source"]).name: x for x in lines[4:]}
+    assert len(lines) == 8
+    assert first_run["bad_sas_file.sas7bdat"]["status"] == "failed"
+    assert first_run["file1.sas7bdat"]["status"] == "converted"
+    assert first_run["file1.sas7bdat"]["rows"] == 5
+    assert second_run["file1.sas7bdat"]["status"] == "skipped"
+    assert second_run["file1.sas7bdat"]["bytes_out"] == first_run["file1.sas7bdat"]["bytes_out"]
+
+
+@pytest.mark.parametrize(
+    "compress, file_name, open_file",
+    [
+        ("none", "file1.jsonl", open),
+        ("gzip", "file1.ndjson.gz", gzip.open),
+        ("zstd", "file1.json.zst", lambda x, mode: pa.input_stream(str(x), compression="zstd")),
+    ],
+)
+def test_to_json_ndjson(
+    compress, file_name, open_file, sas_file_1, expected_dir, test_runner, tmp_path
+):
+    export_file = tmp_path / file_name
+    args = ["to-json", str(sas_file_1), str(export_file), "--ndjson", "--compress", compress]
+
+    result = test_runner.invoke(app, args, catch_exceptions=False)
+
+    assert result.exit_code == 0
+    with open_file(export_file, "rb") as f:
+        lines = f.read().decode("utf-8").splitlines()
+    expected = json.loads((expected_dir / "file1.json").read_text())
+    rows = expected["integer_row"].keys()
+    assert [json.loads(x) for x in lines] == [{k: v[i] for k, v in expected.items()} for i in rows]
+
+
+def test_to_json_ndjson_where_no_rows(sas_file_1, test_runner, tmp_path):
+    export_file = tmp_path / "file1.ndjson"
+    args = ["to-json", str(sas_file_1), str(export_file), "--ndjson", "--where", "integer_row > 9"]
+
+    test_runner.invoke(app, args, catch_exceptions=False)
+
+    assert export_file.read_text() == ""
+
+
+@pytest.mark.parametrize(
+    "file_name, extra_args, message",
+    [
+        ("file1.json", ["--compress", "gzip"], "The export file must be a json file ending in .gz"),
+        ("file1.csv", ["--ndjson"], "The export file must be a ndjson, jsonl, or json file"),
+        (
+            "file1.ndjson",
+            ["--ndjson", "--compress", "gzip"],
+            "The export file must be a ndjson, jsonl, or json file ending in .gz",
+        ),
+    ],
+)
+def test_to_json_ndjson_invalid(file_name, extra_args, message, sas_file_1, test_runner, tmp_path):
+    args = ["to-json", str(sas_file_1), str(tmp_path / file_name)] + extra_args
+
+    result = test_runner.invoke(app, args)
+
+    assert result.exit_code == 1
+    assert message in result.output
+
+
+def test_dir_to_json_ndjson(sas7bdat_dir, test_runner, tmp_path):
+    args = ["dir-to-json", str(sas7bdat_dir), "-o", str(tmp_path), "--ndjson", "--compress", "gzip"]
+
+    result = test_runner.invoke(app, args, catch_exceptions=False)
+
+    assert "Converted 3 of 3 files" in result.stdout
+    assert sorted(x.name for x in tmp_path.iterdir()) == [
+        "file1.ndjson.gz",
+        "file2.ndjson.gz",
+        "file3.ndjson.gz",
+    ]
+    got = pd.read_json(tmp_path / "file1.ndjson.gz", lines=True)
+    assert list(got.columns) == ["integer_row", "text_row", "float_row", "date_row"]
+
+
+def _read_zstd_csv(file_path):
+    with pa.input_stream(str(file_path), compression="zstd") as f:
+        return pd.read_csv(io.BytesIO(f.read()))
+
+
+_DECOMPRESS = {
+    "gz": gzip.decompress,
+    "zst": lambda x: pa.input_stream(pa.py_buffer(x), compression="zstd").read(),
+    "bz2": bz2.decompress,
+    "xz": lzma.decompress,
+}
+
+
+@pytest.mark.parametrize("suffix", list(_DECOMPRESS))
+@pytest.mark.parametrize(
+    "command, file_name, extra_args",
+    [
+        ("to-csv", "file1.csv", []),
+        ("to-csv", "file1.csv", ["--chunk-size", "2"]),
+        ("to-json", "file1.json", []),
+        ("to-json", "file1.ndjson", ["--ndjson"]),
+        ("to-xml", "file1.xml", []),
+    ],
+)
+def test_to_compressed(command, file_name, extra_args, suffix, sas_file_1, test_runner, tmp_path):
+    plain_file = tmp_path / file_name
+    compressed_file = tmp_path / f"{file_name}.{suffix}"
+    test_runner.invoke(
+        app, [command, str(sas_file_1), str(plain_file)] + extra_args, catch_exceptions=False
+    )
+
+    result = test_runner.invoke(
+        app, [command, str(sas_file_1), str(compressed_file)] + extra_args, catch_exceptions=False
+    )
+
+    assert result.exit_code == 0
+    assert _DECOMPRESS[suffix](compressed_file.read_bytes()) == plain_file.read_bytes()
+
+
+@pytest.mark.parametrize(
+    "args, message",
+    [
+        (
+            ["to-csv", "out.csv", "--compress", "gzip"],
+            "The export file must be a csv file ending in .gz",
+        ),
+        (["to-xml", "out.xml.gz", "--compress", "none"], "The export file must be a XML file"),
+        (
+            ["to-csv", "out.csv.gz", "--compress-level", "10"],
+            "The gzip compression level must be from 0 to 9",
+        ),
+        (
+            ["to-csv", "out.csv", "--compress-level", "5"],
+            "A compression level can only be used with compression",
+        ),
+        (
+            ["to-json", "out.json.xz", "--compress-threads", "2"],
+            "Only zstd can compress with threads",
+        ),
+        (["to-csv", "out.csv.gz", "--resume"], "--resume can only be used with uncompressed files"),
+    ],
+)
+def test_to_compressed_invalid(args, message, sas_file_1, test_runner, tmp_path):
+    command, file_name, *extra_args = args
+
+    result = test_runner.invoke(
+        app, [command, str(sas_file_1), str(tmp_path / file_name)] + extra_args
+    )
+
+    assert result.exit_code == 1
+    assert message in result.output
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_dir_to_xml_compressed(sas7bdat_dir, test_runner, tmp_path):
+    args = ["dir-to-xml", str(sas7bdat_dir), "-o", str(tmp_path), "--compress", "xz"]
+
+    result = test_runner.invoke(app, args, catch_exceptions=False)
+
+    assert "Converted 3 of 3 files" in result.stdout
+    assert sorted(x.name for x in tmp_path.iterdir()) == [
+        "file1.xml.xz",
+        "file2.xml.xz",
+        "file3.xml.xz",
+    ]
+    with lzma.open(tmp_path / "file1.xml.xz", "rt") as f:
+        assert f.read().startswith('<?xml version="1.0" encoding="UTF-8"?>')
+
+
+@pytest.mark.parametrize("extra_args", [[], ["--chunk-size", "2"]])
+def test_convert_matches_single_commands(extra_args, sas_file_1, test_runner, tmp_path):
+    single_dir = tmp_path / "single"
+    single_dir.mkdir()
+    commands = {"csv": "to-csv", "xlsx": "to-excel", "json": "to-json", "parquet": "to-parquet"}
+    for suffix, command in commands.items():
+        args = [command, str(sas_file_1), str(single_dir / f"file1.{suffix}")]
+        test_runner.invoke(app, args, catch_exceptions=False)
+
+    metrics_file = tmp_path / "metrics.jsonl"
+    args = ["convert", str(sas_file_1), "--metrics-file", str(metrics_file)]
+    for suffix in commands:
+        args += ["--to", f"{suffix}:{tmp_path / f'file1.{suffix}'}"]
+
+    result = test_runner.invoke(app, args + extra_args, catch_exceptions=False)
+
+    assert result.exit_code == 0
+    assert (tmp_path / "file1.csv").read_bytes() == (single_dir / "file1.csv").read_bytes()
+    pd.testing.assert_frame_equal(
+        pd.read_json(tmp_path / "file1.json"), pd.read_json(single_dir / "file1.json")
+    )
+    pd.testing.assert_frame_equal(
+        pd.read_excel(tmp_path / "file1.xlsx"), pd.read_excel(single_dir / "file1.xlsx")
+    )
+    assert pq.read_table(tmp_path / "file1.parquet").equals(
+        pq.read_table(single_dir / "file1.parquet")
+    )
+    lines = [json.loads(x) for x in metrics_file.read_text().splitlines()]
+    assert [x["file_type"] for x in lines] == list(commands)
+    assert all(x["rows"] == 5 for x in lines)
+
+
+def test_convert_reads_once(sas_file_1, test_runner, tmp_path, monkeypatch):
+    from sas7bdat_converter_cli import conversion
+
+    opened = []
+
+    class CountingReader(conversion.SasReader):
+        def __init__(self, *args, **kwargs):
+            opened.append(args[0])
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(conversion, "SasReader", CountingReader)
+    args = [
+        "convert",
+        str(sas_file_1),
+        "--to",
+        f"csv:{tmp_path / 'file1.csv'}",
+        "--to",
+        f"ndjson:{tmp_path / 'file1.ndjson'}",
+        "--to",
+        f"arrow:{tmp_path / 'file1.arrow'}",
+    ]
+
+    test_runner.invoke(app, args, catch_exceptions=False)
+
+    assert opened == [sas_file_1]
+    assert len((tmp_path / "file1.ndjson").read_text().splitlines()) == 5
+    assert pa.ipc.open_file(tmp_path / "file1.arrow").read_all().num_rows == 5
+
+
+@pytest.mark.parametrize(
+    "targets, message",
+    [
+        ([], "Missing option '--to'"),
+        (["csv"], "'csv' must be in the form FORMAT:PATH"),
+        (["sav:file1.sav"], "Unknown format 'sav'"),
+        (["csv:file1.json"], "must be a csv file"),
+        (["csv:file1.csv", "csv:file1.csv"], "Each --to target must be a different file"),
+    ],
+)
+def test_convert_invalid_targets(targets, message, sas_file_1, test_runner, tmp_path):
+    args = ["convert", str(sas_file_1)]
+    for target in targets:
+        args += ["--to", target]
+
+    result = test_runner.invoke(app, args)
+
+    assert result.exit_code != 0
+    assert message in result.output
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_dir_convert(jobs, sas7bdat_dir, expected_dir, test_runner, tmp_path):
+    parquet_dir = tmp_path / "parquet"
+    parquet_dir.mkdir()
+    args = [
+        "dir-convert",
+        str(sas7bdat_dir),
+        "-o",
+        str(tmp_path),
+        "-j",
+        jobs,
+        "--to",
+        "csv",
+        "--to",
+        f"parquet:{parquet_dir}",
+    ]
+
+    result = test_runner.invoke(app, args, catch_exceptions=False)
+
+    sources = sorted(x.stem for x in sas7bdat_dir.iterdir() if x.suffix == ".sas7bdat")
+    assert sorted(x.stem for x in tmp_path.glob("*.csv")) == sources
+    assert sorted(x.stem for x in parquet_dir.glob("*.parquet")) == sources
+    assert f"Converted {len(sources)} of {len(sources)} files" in result.stdout
+    for expected_file in expected_dir.glob("*.csv"):
+        got = (tmp_path / expected_file.name).read_text().rstrip()
+        assert got == expected_file.read_text().rstrip()
+
+
+def test_dir_convert_duplicate_targets(sas7bdat_dir, test_runner, tmp_path):
+    args = ["dir-convert", str(sas7bdat_dir), "-o", str(tmp_path), "--to", "csv", "--to", "csv"]
+
+    result = test_runner.invoke(app, args)
+
+    assert result.exit_code != 0
+    assert "Each --to target must write to a different file type or directory" in result.output
+
+
+@pytest.mark.parametrize(
+    "command, suffix, read",
+    [
+        ("to-csv", ".csv", pd.read_csv),
+        ("to-json", ".json", pd.read_json),
+        ("to-excel", ".xlsx", pd.read_excel),
+    ],
+)
+def test_to_date_format(command, suffix, read, sas_file_1, test_runner, tmp_path):
+    export_file = tmp_path / f"file1{suffix}"
+    args = [command, str(sas_file_1), str(export_file), "--date-format", "%d%b%Y"]
+
+    result = test_runner.invoke(app, args, catch_exceptions=False)
+
+    assert result.exit_code == 0
+    got = read(export_file, dtype={"date_row": str})
+    assert got["date_row"].tolist() == [
+        "02Jan2018",
+        "05Feb2018",
+        "21Nov2017",
+        "19May2016",
+        "25Oct1999",
+    ]
+
+
+def test_to_csv_date_formats_xpt(test_runner, tmp_path):
+    from sas7bdat_converter_cli.bench import write_xpt
+
+    df = pd.DataFrame(
+        {
+            "DAY": [21185.0, np.nan, 0.0],
+            "STAMP": [1830384000.5, 0.0, np.nan],
+            "CLOCK": [45296.0, np.nan, 0.0],
+            "TEXT": ["a" * 60, "b", "c"],
+        }
+    )
+    df.attrs["date_columns"] = ["DAY"]
+    xpt_file = tmp_path / "dates.xpt"
+    write_xpt(df, xpt_file)
+    _set_xpt_format(xpt_file, "STAMP", "DATETIME")
+    _set_xpt_format(xpt_file, "CLOCK", "TIME")
+    export_file = tmp_path / "dates.csv"
+    args = [
+        "to-csv",
+        str(xpt_file),
+        str(export_file),
+        "--date-format",
+        "%Y-%m-%d",
+        "--datetime-format",
+        "%Y-%m-%d %H:%M:%S",
+        "--time-format",
+        "%H:%M",
+    ]
+
+    test_runner.invoke(app, args, catch_exceptions=False)
+
+    got = pd.read_csv(export_file, dtype=str, keep_default_na=False)
+    assert got["DAY"].tolist() == ["2018-01-01", "", "1960-01-01"]
+    assert got["STAMP"].tolist() == ["2018-01-01 00:00:00", "1960-01-01 00:00:00", ""]
+    assert got["CLOCK"].tolist() == ["12:34", "", "00:00"]
+
+
+def test_to_date_format_unsupported(sas_file_1, test_runner, tmp_path):
+    args = [
+        "convert",
+        str(sas_file_1),
+        "--to",
+        f"parquet:{tmp_path / 'file1.parquet'}",
+        "--date-format",
+        "%Y",
+    ]
+
+    result = test_runner.invoke(app, args)
+
+    assert result.exit_code != 0
+    assert str(result.exception) == "Date formats are not supported for parquet files"
+
+
+def _set_xpt_format(xpt_file, name, var_format):
+    # Set the format of a variable in the namestr records written by write_xpt
+    data = bytearray(xpt_file.read_bytes())
+    start = data.index(f"{name:<8}".encode("ascii"))
+    data[start + 48 : start + 56] = f"{var_format:<8}".encode("ascii")
+    xpt_file.write_bytes(bytes(data))
+
+
+@pytest.mark.parametrize(
+    "fixture_name", ["multi_page_sas_file", "multi_page_datetime_file", "large_xpt_file"]
+)
+def test_to_csv_shards_concat(fixture_name, test_runner, tmp_path, request):
+    sas_file = request.getfixturevalue(fixture_name)
+    full_file = tmp_path / "full.csv"
+    sharded_file = tmp_path / "sharded.csv"
+    test_runner.invoke(app, ["to-csv", str(sas_file), str(full_file)], catch_exceptions=False)
+    args = ["to-csv", str(sas_file), str(sharded_file), "--shards", "3", "--concat"]
+
+    result = test_runner.invoke(app, args, catch_exceptions=False)
+
+    assert result.exit_code == 0
+    assert sharded_file.read_bytes() == full_file.read_bytes()
+    assert not list(tmp_path.glob("*.part-*"))
+
+
+def test_to_csv_shards_concat_datetimes(
+    multi_page_datetime_file, test_runner, tmp_path, monkeypatch
+):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from sas7bdat_converter_cli import conversion
+
+    # Slices of 10 rows, a shard starting part way through one would write the dates before the
+    # timed rows on the last page without a time
+    monkeypatch.setattr("sas7bdat_converter_cli.writers._CSV_CHUNK_CELLS", 40)
+    monkeypatch.setattr(conversion, "ProcessPoolExecutor", ThreadPoolExecutor)
+    full_file = tmp_path / "full.csv"
+    sharded_file = tmp_path / "sharded.csv"
+    test_runner.invoke(
+        app,
+        ["to-csv", str(multi_page_datetime_file), str(full_file), "--chunk-size", "10"],
+        catch_exceptions=False,
+    )
+    args = ["to-csv", str(multi_page_datetime_file), str(sharded_file), "--chunk-size", "10"]
+
+    result = test_runner.invoke(app, args + ["--shards", "3", "--concat"], catch_exceptions=False)
+
+    assert result.exit_code == 0
+    assert sharded_file.read_bytes() == full_file.read_bytes()
+    lines = full_file.read_text().splitlines()
+    assert lines[1].endswith('"2018-01-02"')
+    assert lines[61].endswith('"2018-01-02 00:00:00"')
+    assert lines[-1].endswith('"1999-10-25 01:00:00"')
+
+
+def test_to_csv_shards_parts(multi_page_sas_file, test_runner, tmp_path, monkeypatch):
+    # Slices of 5 rows so the shards can start on any page
+    monkeypatch.setattr("sas7bdat_converter_cli.writers._CSV_CHUNK_CELLS", 20)
+    metrics_file = tmp_path / "metrics.jsonl"
+    export_file = tmp_path / "out.csv"
+    args = [
+        "to-csv",
+        str(multi_page_sas_file),
+        str(export_file),
+        "--shards",
+        "2",
+        "--metrics-file",
+        str(metrics_file),
+    ]
+
+    test_runner.invoke(app, args, catch_exceptions=False)
+
+    parts = sorted(tmp_path.glob("out.part-*.csv"))
+    assert [x.name for x in parts] == ["out.part-0000.csv", "out.part-0001.csv"]
+    assert [len(pd.read_csv(x)) for x in parts] == [45, 40]
+    assert not export_file.exists()
+    metrics = json.loads(metrics_file.read_text())
+    assert metrics["rows"] == 85
+    assert metrics["bytes_out"] == sum(x.stat().st_size for x in parts)
+
+
+@pytest.mark.parametrize(
+    "command, file_name, extra_args, read",
+    [
+        ("to-parquet", "out.parquet", [], lambda x: pq.read_table(x).to_pandas()),
+        ("to-arrow", "out.arrow", [], lambda x: pa.ipc.open_file(x).read_pandas()),
+        (
+            "to-json",
+            "out.ndjson.gz",
+            ["--ndjson", "--compress", "gzip"],
+            lambda x: pd.read_json(x, lines=True),
+        ),
+        ("to-csv", "out.csv.gz", [], pd.read_csv),
+        ("to-csv", "out.csv.zst", ["--compress-threads", "2"], _read_zstd_csv),
+    ],
+)
+def test_to_shards_concat(
+    command, file_name, extra_args, read, large_xpt_file, test_runner, tmp_path
+):
+    full_file = tmp_path / f"full{file_name[3:]}"
+    sharded_file = tmp_path / file_name
+    args = [command, str(large_xpt_file)]
+    test_runner.invoke(app, args + [str(full_file)] + extra_args, catch_exceptions=False)
+
+    result = test_runner.invoke(
+        app,
+        args + [str(sharded_file), "--shards", "4", "--concat"] + extra_args,
+        catch_exceptions=False,
+    )
+
+    assert result.exit_code == 0
+    pd.testing.assert_frame_equal(read(sharded_file), read(full_file))
+
+
+def test_to_shards_concat_compressed_csv_header(large_xpt_file, test_runner, tmp_path):
+    export_file = tmp_path / "out.csv.bz2"
+    args = ["to-csv", str(large_xpt_file), str(export_file), "--shards", "3", "--concat"]
+
+    test_runner.invoke(app, args, catch_exceptions=False)
+
+    with bz2.open(export_file, "rt") as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 1001
+    assert lines.count(lines[0]) == 1
+
+
+@pytest.mark.parametrize(
+    "command, suffix, file_type",
+    [("to-excel", ".xlsx", "xlsx"), ("to-json", ".json", "json"), ("to-xml", ".xml", "xml")],
+)
+def test_to_shards_concat_unsupported(
+    command, suffix, file_type, large_xpt_file, test_runner, tmp_path
+):
+    export_file = tmp_path / f"out{suffix}"
+    args = [command, str(large_xpt_file), str(export_file), "--shards", "2", "--concat"]
+
+    result = test_runner.invoke(app, args)
+
+    assert result.exit_code == 1
+    assert f"--concat isn't supported for {file_type} files" in result.output
+    assert not list(tmp_path.iterdir())
+
+
+def test_to_shards_failure_removes_parts(large_xpt_file, test_runner, tmp_path, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from sas7bdat_converter_cli import conversion
+
+    convert_shard = conversion._convert_shard
+
+    def failing_shard(file_type, source, part, options, shard):
+        if shard.start:
+            raise RuntimeError("Shard failed")
+        return convert_shard(file_type, source, part, options, shard)
+
+    monkeypatch.setattr(conversion, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(conversion, "_convert_shard", failing_shard)
+    # Write one row per slice so the shards can start on any row
+    monkeypatch.setattr("sas7bdat_converter_cli.writers._CSV_CHUNK_CELLS", 1)
+    args = ["to-csv", str(large_xpt_file), str(tmp_path / "out.csv"), "--shards", "3"]
+
+    result = test_runner.invoke(app, args)
+
+    assert isinstance(result.exception, RuntimeError)
+    assert not list(tmp_path.iterdir())
+
+
+def test_to_concat_without_shards(sas_file_1, test_runner, tmp_path):
+    result = test_runner.invoke(
+        app, ["to-csv", str(sas_file_1), str(tmp_path / "a.csv"), "--concat"]
+    )
+
+    assert result.exit_code != 0
+    assert "--concat can only be used with --shards" in result.output
+
+
+def _fail_after(monkeypatch, writer_class, chunks):
+    # Make the conversion stop part way, as if the process was killed or the disk filled up
+    write = writer_class.write
+    calls = []
+
+    def failing_write(self, chunk):
+        calls.append(1)
+        if len(calls) > chunks:
+            raise OSError("No space left on device")
+        write(self, chunk)
+
+    monkeypatch.setattr(writer_class, "write", failing_write)
+    monkeypatch.setattr("sas7bdat_converter_cli.checkpoint.CHECKPOINT_SECONDS", 0)
+    return lambda: monkeypatch.setattr(writer_class, "write", write)
+
+
+@pytest.mark.parametrize(
+    "fixture_name, where",
+    [
+        ("large_xpt_file", None),
+        ("multi_page_sas_file", None),
+        ("large_xpt_file", "C00005 > 0"),
+    ],
+)
+def test_to_csv_resume(fixture_name, where, test_runner, tmp_path, request, monkeypatch):
+    from sas7bdat_converter_cli.writers import CsvWriter
+
+    sas_file = request.getfixturevalue(fixture_name)
+    full_file = tmp_path / "full.csv"
+    export_file = tmp_path / "out.csv"
+    # Write one row per slice so --chunk-size is used as is
+    monkeypatch.setattr("sas7bdat_converter_cli.writers._CSV_CHUNK_CELLS", 1)
+    metrics_file = tmp_path / "metrics.jsonl"
+    extra_args = ["--chunk-size", "3"] + (["--where", where] if where else [])
+    test_runner.invoke(
+        app, ["to-csv", str(sas_file), str(full_file)] + extra_args, catch_exceptions=False
+    )
+    restore = _fail_after(monkeypatch, CsvWriter, 4)
+
+    result = test_runner.invoke(app, ["to-csv", str(sas_file), str(export_file)] + extra_args)
+
+    assert result.exit_code != 0
+    assert not export_file.exists()
+    checkpoint = json.loads((tmp_path / "out.csv.checkpoint").read_text())
+    assert checkpoint["rows_read"] > 0
+    assert (tmp_path / "out.partial.csv").stat().st_size >= checkpoint["bytes"]
+
+    restore()
+    args = ["to-csv", str(sas_file), str(export_file), "--resume", "--metrics-file"]
+    result = test_runner.invoke(
+        app, args + [str(metrics_file)] + extra_args, catch_exceptions=False
+    )
+
+    assert result.exit_code == 0
+    assert export_file.read_bytes() == full_file.read_bytes()
+    assert json.loads(metrics_file.read_text())["rows"] == len(pd.read_csv(full_file))
+    assert sorted(x.name for x in tmp_path.iterdir()) == ["full.csv", "metrics.jsonl", "out.csv"]
+
+
+def test_to_csv_resume_changed_options(large_xpt_file, test_runner, tmp_path, monkeypatch):
+    from sas7bdat_converter_cli.writers import CsvWriter
+
+    full_file = tmp_path / "full.csv"
+    export_file = tmp_path / "out.csv"
+    monkeypatch.setattr("sas7bdat_converter_cli.writers._CSV_CHUNK_CELLS", 1)
+    args = ["to-csv", str(large_xpt_file), str(export_file), "--chunk-size", "3"]
+    test_runner.invoke(app, ["to-csv", str(large_xpt_file), str(full_file)], catch_exceptions=False)
+    restore = _fail_after(monkeypatch, CsvWriter, 4)
+    test_runner.invoke(app, args + ["--columns", "C00001"])
+    restore()
+
+    result = test_runner.invoke(app, args + ["--resume"], catch_exceptions=False)
+
+    assert result.exit_code == 0
+    assert export_file.read_bytes() == full_file.read_bytes()
+
+
+def test_ndjson_resume(large_xpt_file, tmp_path, monkeypatch):
+    from sas7bdat_converter_cli.conversion import convert_file
+    from sas7bdat_converter_cli.options import ConversionOptions
+    from sas7bdat_converter_cli.writers import NdjsonWriter
+
+    full_file = tmp_path / "full.ndjson"
+    export_file = tmp_path / "out.ndjson"
+    options = ConversionOptions(chunk_size=100)
+    convert_file("ndjson", large_xpt_file, full_file, options)
+    restore = _fail_after(monkeypatch, NdjsonWriter, 3)
+    with pytest.raises(OSError):
+        convert_file("ndjson", large_xpt_file, export_file, options)
+    restore()
+    written = []
+    write = NdjsonWriter.write
+
+    def record_write(self, chunk):
+        written.append(chunk)
+        write(self, chunk)
+
+    monkeypatch.setattr(NdjsonWriter, "write", record_write)
+
+    metrics = convert_file("ndjson", large_xpt_file, export_file, options, resume=True)
+
+    assert export_file.read_bytes() == full_file.read_bytes()
+    assert sum(len(x) for x in written) == 700
+    assert metrics.rows == 1000
+    assert not (tmp_path / "out.ndjson.checkpoint").exists()
+
+
+@pytest.mark.parametrize(
+    "args, message",
+    [
+        (
+            ["to-json", "out.json", "--resume"],
+            "--resume can only be used with uncompressed --ndjson",
+        ),
+        (
+            ["to-json", "out.ndjson.gz", "--ndjson", "--compress", "gzip", "--resume"],
+            "--resume can only be used with uncompressed --ndjson",
+        ),
+        (
+            ["to-csv", "out.csv", "--resume", "--shards", "2"],
+            "--resume can't be used with --shards",
+        ),
+    ],
+)
+def test_resume_unsupported(args, message, sas_file_1, test_runner, tmp_path):
+    command, export_name, *extra_args = args
+    args = [command, str(sas_file_1), str(tmp_path / export_name)] + extra_args
+
+    result = test_runner.invoke(app, args)
+
+    assert result.exit_code == 1
+    assert message in result.stdout
+
+
+@pytest.mark.parametrize("resume", [False, True])
+def test_to_csv_failure_before_checkpoint(
+    resume, large_xpt_file, test_runner, tmp_path, monkeypatch
+):
+    from sas7bdat_converter_cli.writers import CsvWriter
+
+    export_file = tmp_path / "out.csv"
+    _fail_after(monkeypatch, CsvWriter, 0)
+    args = ["to-csv", str(large_xpt_file), str(export_file)] + (["--resume"] if resume else [])
+
+    result = test_runner.invoke(app, args)
+
+    assert result.exit_code != 0
+    assert [x.name for x in tmp_path.iterdir()] == (["out.partial.csv"] if resume else [])
+
+
+def test_to_parquet_failure_removes_partial_file(
+    large_xpt_file, test_runner, tmp_path, monkeypatch
+):
+    from sas7bdat_converter_cli.writers import ParquetWriter
+
+    export_file = tmp_path / "out.parquet"
+    _fail_after(monkeypatch, ParquetWriter, 2)
+
+    result = test_runner.invoke(
+        app, ["to-parquet", str(large_xpt_file), str(export_file), "--chunk-size", "10"]
+    )
+
+    assert result.exit_code != 0
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_dir_to_csv_resume(test_runner, tmp_path, sas7bdat_dir, large_xpt_file, monkeypatch):
+    from sas7bdat_converter_cli.writers import CsvWriter
+
+    source_dir = tmp_path / "source"
+    output_dir = tmp_path / "output"
+    expected_dir = tmp_path / "expected"
+    shutil.copytree(sas7bdat_dir, source_dir)
+    shutil.copy(large_xpt_file, source_dir / "file4.xpt")
+    output_dir.mkdir()
+    expected_dir.mkdir()
+    monkeypatch.setattr("sas7bdat_converter_cli.writers._CSV_CHUNK_CELLS", 1)
+    args = ["dir-to-csv", str(source_dir), "-o", str(output_dir), "--chunk-size", "100"]
+    test_runner.invoke(app, args[:2] + ["-o", str(expected_dir)], catch_exceptions=False)
+    # The three sas7bdat files are written in one chunk each and the xpt file stops part way
+    restore = _fail_after(monkeypatch, CsvWriter, 5)
+
+    result = test_runner.invoke(app, args + ["--resume"])
+
+    assert result.exit_code != 0
+    assert sorted(x.name for x in output_dir.iterdir()) == [
+        MANIFEST_NAME,
+        "file1.csv",
+        "file2.csv",
+        "file3.csv",
+        "file4.csv.checkpoint",
+        "file4.partial.csv",
+    ]
+
+    restore()
+    result = test_runner.invoke(app, args + ["--resume"], catch_exceptions=False)
+
+    assert "Converted 1 of 4 files, 3 unchanged" in result.stdout
+    for expected_file in expected_dir.iterdir():
+        assert (output_dir / expected_file.name).read_bytes() == expected_file.read_bytes()
+    assert len(list(output_dir.iterdir())) == 5
+
+
+def test_inspect(sas_file_1, test_runner):
+    result = test_runner.invoke(app, ["inspect", str(sas_file_1)], catch_exceptions=False)
+
+    assert result.exit_code == 0
+    assert "FILE1" in result.stdout
+    assert "MMDDYY" in result.stdout
+    assert "cp1252" in result.stdout
+
+
+def test_inspect_json(xpt_file_2, test_runner):
+    result = test_runner.invoke(app, ["inspect", str(xpt_file_2), "--json"], catch_exceptions=False)
+
+    info = json.loads(result.stdout)
+    assert info["format"] == "xpt"
+    assert info["rows"] == len(pd.read_sas(xpt_file_2))
+    assert [x["name"] for x in info["columns"]] == list(pd.read_sas(xpt_file_2).columns)
+
+
+def test_inspect_json_xpt_version_8(test_runner, tmp_path):
+    from sas7bdat_converter_cli.bench import write_xpt
+
+    df = pd.DataFrame({"a_long_variable_name": [0.0, 1.5], "text": ["a", "b"]})
+    df.attrs["labels"] = {"text": "A label longer than the forty characters of version 5"}
+    xpt_file = tmp_path / "v8.xpt"
+    write_xpt(df, xpt_file, dataset_name="A_LONG_DATASET_NAME", version=8)
+
+    result = test_runner.invoke(app, ["inspect", str(xpt_file), "--json"], catch_exceptions=False)
+
+    info = json.loads(result.stdout)
+    assert (info["name"], info["rows"]) == ("A_LONG_DATASET_NAME", 2)
+    assert [x["name"] for x in info["columns"]] == ["a_long_variable_name", "text"]
+    assert info["columns"][1]["label"] == df.attrs["labels"]["text"]
+
+
+@pytest.mark.parametrize("command, suffix", [("to-csv", ".csv"), ("to-json", ".json")])
+def test_to_text_xpt_version_8(command, suffix, test_runner, tmp_path):
+    from sas7bdat_converter_cli.bench import write_xpt
+
+    df = pd.DataFrame({"number": [0.0, -1.25, np.nan], "text": ["a", "", "c & d"]})
+    for version in (5, 8):
+        write_xpt(df, tmp_path / f"v{version}.xpt", version=version)
+        args = [command, str(tmp_path / f"v{version}.xpt"), str(tmp_path / f"v{version}{suffix}")]
+        result = test_runner.invoke(app, args, catch_exceptions=False)
+        assert result.exit_code == 0
+
+    assert (tmp_path / f"v8{suffix}").read_bytes() == (tmp_path / f"v5{suffix}").read_bytes()
+    assert b"0.0" in (tmp_path / f"v8{suffix}").read_bytes()
+    assert b"e-79" not in (tmp_path / f"v8{suffix}").read_bytes()
+
+
+def test_inspect_invalid_file(test_runner, tmp_path):
+    result = test_runner.invoke(app, ["inspect", str(tmp_path / "file.csv")])
+
+    assert result.exit_code == 1
+    assert "File must be either a sas7bdat file or a xpt file" in result.stdout
+
+
+def test_dir_inspect(xpt_dir, test_runner):
+    result = test_runner.invoke(app, ["dir-inspect", str(xpt_dir)], catch_exceptions=False)
+
+    assert result.exit_code == 0
+    assert "file1.xpt" in result.stdout
+    assert "file2.xpt" in result.stdout
+
+
+def test_dir_inspect_json_error(sas7bdat_dir, bad_sas_file, test_runner, tmp_path):
+    for sas_file in sas7bdat_dir.iterdir():
+        shutil.copy(sas_file, tmp_path)
+    shutil.copy(bad_sas_file, tmp_path)
+
+    result = test_runner.invoke(app, ["dir-inspect", str(tmp_path), "--json", "-j", "2"])
+
+    assert result.exit_code == 1
+    infos = json.loads(result.stdout)
+    assert [Path(x["file_path"]).name for x in infos] == [
+        "bad_sas_file.sas7bdat",
+        "file1.sas7bdat",
+        "file2.sas7bdat",
+        "file3.sas7bdat",
+    ]
+    assert "error" in infos[0]
+    assert [x["rows"] for x in infos[1:]] == [
+        len(pd.read_sas(tmp_path / f"file{i}.sas7bdat")) for i in (1, 2, 3)
+    ]
+
+
+@pytest.mark.parametrize("buffer_chunks", ["0", "1", "4"])
+@pytest.mark.parametrize(
+    "command, file_name, extra_args",
+    [
+        ("to-csv", "out.csv", ["--chunk-size", "100"]),
+        ("to-json", "out.ndjson", ["--ndjson"]),
+        ("to-parquet", "out.parquet", ["--row-group-size", "100"]),
+    ],
+)
+def test_to_buffer_chunks(
+    buffer_chunks, command, file_name, extra_args, large_xpt_file, test_runner, tmp_path
+):
+    expected_file = tmp_path / f"expected{Path(file_name).suffix}"
+    export_file = tmp_path / file_name
+    test_runner.invoke(
+        app, [command, str(large_xpt_file), str(expected_file)] + extra_args, catch_exceptions=False
+    )
+    args = [command, str(large_xpt_file), str(export_file), "--buffer-chunks", buffer_chunks]
+
+    result = test_runner.invoke(app, args + extra_args, catch_exceptions=False)
+
+    assert result.exit_code == 0
+    if command == "to-parquet":
+        assert pq.read_table(export_file).equals(pq.read_table(expected_file))
+    else:
+        assert export_file.read_bytes() == expected_file.read_bytes()
+
+
+def test_to_csv_buffer_chunks_streams(sas_file_1, expected_dir, test_runner, tmp_path):
+    export_file = tmp_path / "file1.csv"
+    args = ["to-csv", str(sas_file_1), str(export_file), "--buffer-chunks", "1"]
+
+    test_runner.invoke(app, args, catch_exceptions=False)
+
+    assert export_file.read_bytes() == (expected_dir / "file1.csv").read_bytes()
+
+
+@pytest.fixture
+def nested_dir(tmp_path, sas_file_1, sas_file_2, xpt_file_1, large_xpt_file):
+    nested_dir = tmp_path / "lake"
+    for source, relative_path in [
+        (sas_file_1, "top.sas7bdat"),
+        (sas_file_2, "study1/visit1/dm.sas7bdat"),
+        (xpt_file_1, "study1/visit2/dm.xpt"),
+        (large_xpt_file, "study2/visit1/lb.xpt"),
+    ]:
+        (nested_dir / relative_path).parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy(source, nested_dir / relative_path)
+    return nested_dir
+
+
+def _relative_files(dir):
+    return sorted(x.relative_to(dir).as_posix() for x in dir.rglob("*") if x.is_file())
+
+
+@pytest.mark.parametrize(
+    "extra_args, expected",
+    [
+        ([], ["top.csv"]),
+        (
+            ["--recursive"],
+            ["study1/visit1/dm.csv", "study1/visit2/dm.csv", "study2/visit1/lb.csv", "top.csv"],
+        ),
+        (["-r", "--include", "dm.*"], ["study1/visit1/dm.csv", "study1/visit2/dm.csv"]),
+        (["-r", "--include", "study1/*", "--exclude", "*.xpt"], ["study1/visit1/dm.csv"]),
+        (["-r", "--exclude", "study1/*", "--exclude", "top.*"], ["study2/visit1/lb.csv"]),
+    ],
+)
+def test_dir_to_csv_recursive(extra_args, expected, nested_dir, test_runner, tmp_path):
+    output_dir = tmp_path / "out"
+    args = ["dir-to-csv", str(nested_dir), "-o", str(output_dir)]
+
+    result = test_runner.invoke(app, args + extra_args, catch_exceptions=False)
+
+    assert f"Converted {len(expected)} of {len(expected)} files" in result.stdout
+    assert _relative_files(output_dir) == expected
+    assert (output_dir / expected[0]).read_text().startswith('"')
+
+
+def test_dir_convert_recursive_incremental(nested_dir, test_runner, tmp_path):
+    output_dir = tmp_path / "out"
+    args = ["dir-to-parquet", str(nested_dir), "-o", str(output_dir), "-r", "--incremental"]
+    test_runner.invoke(app, args, catch_exceptions=False)
+
+    result = test_runner.invoke(app, args, catch_exceptions=False)
+
+    assert "Converted 0 of 4 files, 4 unchanged" in result.stdout
+    assert _relative_files(output_dir) == [
+        MANIFEST_NAME,
+        "study1/visit1/dm.parquet",
+        "study1/visit2/dm.parquet",
+        "study2/visit1/lb.parquet",
+        "top.parquet",
+    ]
+
+
+def test_convert_dir_largest_first(nested_dir, tmp_path, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from sas7bdat_converter_cli import conversion
+
+    submitted = []
+
+    class RecordingExecutor(ThreadPoolExecutor):
+        def submit(self, fn, /, *args, **kwargs):
+            submitted.append(args[0].relative_to(nested_dir).as_posix())
+            return super().submit(fn, *args, **kwargs)
+
+    monkeypatch.setattr(conversion, "ProcessPoolExecutor", RecordingExecutor)
+
+    summary = conversion.convert_dir(
+        nested_dir, [("csv", tmp_path / "out")], jobs=2, recursive=True
+    )
+
+    # The sas7bdat files are larger than the large xpt file, which is larger than the small one
+    assert submitted == [
+        "study1/visit1/dm.sas7bdat",
+        "top.sas7bdat",
+        "study2/visit1/lb.xpt",
+        "study1/visit2/dm.xpt",
+    ]
+    assert [x.source.name for x in summary.results] == [
+        "dm.sas7bdat",
+        "dm.xpt",
+        "lb.xpt",
+        "top.sas7bdat",
+    ]
+
+
+def test_to_csv_cache(sas_file_1, expected_dir, test_runner, tmp_path):
+    cache_dir = tmp_path / "cache"
+    metrics_file = tmp_path / "metrics.jsonl"
+    for name in ("first.csv", "second.csv"):
+        args = [
+            "to-csv",
+            str(sas_file_1),
+            str(tmp_path / name),
+            "--metrics-file",
+            str(metrics_file),
+        ]
+        test_runner.invoke(
+            app, args + ["--cache", "--cache-dir", str(cache_dir)], catch_exceptions=False
+        )
+
+    statuses = [json.loads(x)["status"] for x in metrics_file.read_text().splitlines()]
+    assert statuses == ["converted", "cached"]
+    assert (tmp_path / "second.csv").read_bytes() == (expected_dir / "file1.csv").read_bytes()
+
+    result = test_runner.invoke(
+        app, ["cache", "stats", "--cache-dir", str(cache_dir), "--json"], catch_exceptions=False
+    )
+    stats = json.loads(result.stdout)
+    assert stats["entries"] == 1
+    assert stats["size_bytes"] == (expected_dir / "file1.csv").stat().st_size
+
+    result = test_runner.invoke(
+        app, ["cache", "clear", "--cache-dir", str(cache_dir)], catch_exceptions=False
+    )
+    assert "Removed 1 files" in result.stdout
+
+
+def test_to_json_cache_from_env(sas_file_1, test_runner, tmp_path, monkeypatch):
+    monkeypatch.setenv("SAS7BDAT_CONVERTER_CACHE", "1")
+    monkeypatch.setenv("SAS7BDAT_CONVERTER_CACHE_DIR", str(tmp_path / "cache"))
+    args = ["to-json", str(sas_file_1), str(tmp_path / "file1.ndjson"), "--ndjson"]
+
+    test_runner.invoke(app, args, catch_exceptions=False)
+    result = test_runner.invoke(app, ["cache", "stats", "--json"], catch_exceptions=False)
+
+    stats = json.loads(result.stdout)
+    assert stats["cache_dir"] == str(tmp_path / "cache")
+    assert stats["entries"] == 1
+
+
+@pytest.mark.parametrize(
+    "extra_args, message",
+    [
+        (["--shards", "2"], "--cache can't be used with --shards"),
+        (["--cache-max-size", "big"], "Invalid size: big"),
+    ],
+)
+def test_to_csv_cache_invalid(extra_args, message, sas_file_1, test_runner, tmp_path):
+    args = ["to-csv", str(sas_file_1), str(tmp_path / "out.csv"), "--cache"]
+
+    result = test_runner.invoke(app, args + extra_args)
+
+    assert result.exit_code == 1
+    assert message in result.output
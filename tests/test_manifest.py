@@ -0,0 +1,83 @@
+import os
+import shutil
+
+import pytest
+
+from sas7bdat_converter_cli.manifest import MANIFEST_NAME, Fingerprint, Manifest, hash_file
+from sas7bdat_converter_cli.options import ConversionOptions
+
+
+@pytest.fixture
+def converted(sas_file_1, tmp_path):
+    source = tmp_path / "file1.sas7bdat"
+    export_file = tmp_path / "file1.csv"
+    shutil.copy(sas_file_1, source)
+    export_file.write_text("converted")
+    manifest = Manifest.load(tmp_path)
+    manifest.record(
+        "file1.sas7bdat", Fingerprint.from_file(source), export_file, "csv", ConversionOptions()
+    )
+    manifest.save()
+
+    return source, export_file
+
+
+def test_manifest_round_trip(converted, tmp_path):
+    source, export_file = converted
+    manifest = Manifest.load(tmp_path)
+
+    assert manifest.is_current("file1.sas7bdat", source, export_file, "csv", ConversionOptions())
+    assert not manifest.is_current(
+        "file2.sas7bdat", source, export_file, "csv", ConversionOptions()
+    )
+    assert not manifest.is_current(
+        "file1.sas7bdat", source, export_file, "json", ConversionOptions()
+    )
+    assert not manifest.is_current(
+        "file1.sas7bdat", source, export_file, "csv", ConversionOptions(chunk_size=10)
+    )
+
+
+def test_manifest_modified_time_only(converted, tmp_path):
+    source, export_file = converted
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    manifest = Manifest.load(tmp_path)
+
+    assert manifest.is_current("file1.sas7bdat", source, export_file, "csv", ConversionOptions())
+    assert manifest.entries["file1.sas7bdat"].source.mtime_ns == source.stat().st_mtime_ns
+
+
+def test_manifest_changed_content(converted, tmp_path):
+    source, export_file = converted
+    data = bytearray(source.read_bytes())
+    data[-1] ^= 0xFF
+    source.write_bytes(bytes(data))
+    manifest = Manifest.load(tmp_path)
+
+    assert not manifest.is_current(
+        "file1.sas7bdat", source, export_file, "csv", ConversionOptions()
+    )
+
+
+def test_manifest_changed_export(converted, tmp_path):
+    source, export_file = converted
+    export_file.write_text("changed")
+    manifest = Manifest.load(tmp_path)
+
+    assert not manifest.is_current(
+        "file1.sas7bdat", source, export_file, "csv", ConversionOptions()
+    )
+
+
+def test_manifest_unreadable(tmp_path):
+    (tmp_path / MANIFEST_NAME).write_text("not json")
+
+    assert Manifest.load(tmp_path).entries == {}
+
+
+def test_hash_file(tmp_path):
+    file = tmp_path / "file.txt"
+    file.write_text("abc")
+
+    assert hash_file(file) == "ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad"
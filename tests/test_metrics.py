@@ -0,0 +1,50 @@
+import json
+import sys
+
+import numpy as np
+import pytest
+
+from sas7bdat_converter_cli.metrics import (
+    FileMetrics,
+    MetricsLog,
+    PhaseTimer,
+    peak_memory,
+    reset_peak_memory,
+)
+
+
+def test_phase_timer_adds_up_phases():
+    timer = PhaseTimer()
+    for _ in range(2):
+        with timer.phase("read"):
+            pass
+
+    assert set(timer.seconds) == {"read"}
+    assert timer.seconds["read"] > 0
+    assert timer.seconds["write"] == 0
+
+
+def test_metrics_log_appends(tmp_path):
+    log = MetricsLog(tmp_path / "metrics.jsonl")
+
+    log.append(FileMetrics("a.xpt", "a.csv", "csv", rows=1))
+    log.append(FileMetrics("b.xpt", "b.csv", "csv", status="failed", error="bad"))
+
+    lines = [json.loads(x) for x in log.path.read_text().splitlines()]
+    assert [x["source"] for x in lines] == ["a.xpt", "b.xpt"]
+    assert lines[1]["error"] == "bad"
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="The peak can only be reset on Linux")
+def test_peak_memory_reset():
+    data = np.ones(20_000_000)
+    data.sum()
+    before = peak_memory()
+    del data
+
+    reset_peak_memory()
+
+    assert before is not None and before > 160_000_000
+    after = peak_memory()
+    assert after is not None
+    assert after < before
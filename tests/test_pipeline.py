@@ -0,0 +1,61 @@
+import threading
+import time
+
+import pytest
+
+from sas7bdat_converter_cli.pipeline import prefetch
+
+
+def test_prefetch_keeps_order():
+    assert list(prefetch(iter(range(100)), 3)) == list(range(100))
+
+
+def test_prefetch_empty():
+    assert list(prefetch(iter([]), 1)) == []
+
+
+def test_prefetch_raises_producer_error():
+    def items():
+        yield 1
+        raise ValueError("bad chunk")
+
+    got = []
+    with pytest.raises(ValueError, match="bad chunk"):
+        for x in prefetch(items(), 2):
+            got.append(x)
+
+    assert got == [1]
+
+
+def test_prefetch_bounded():
+    produced = []
+
+    def items():
+        for i in range(100):
+            produced.append(i)
+            yield i
+
+    chunks = prefetch(items(), 2)
+    assert next(chunks) == 0
+    # Give the producer time to fill the queue
+    time.sleep(0.3)
+
+    # One item in the consumer's hands, two in the queue, and one waiting to be queued
+    assert len(produced) <= 4
+    chunks.close()
+
+
+def test_prefetch_stops_producer_early():
+    closed = threading.Event()
+
+    def items():
+        try:
+            yield from range(1_000_000)
+        finally:
+            closed.set()
+
+    chunks = prefetch(items(), 2)
+    assert next(chunks) == 0
+    chunks.close()
+
+    assert closed.is_set()
@@ -0,0 +1,287 @@
+import io
+from typing import IO, cast
+
+import pandas as pd
+import pytest
+
+from sas7bdat_converter_cli import reader as reader_module
+from sas7bdat_converter_cli.reader import (
+    Column,
+    SasReader,
+    SelectionError,
+    Shard,
+    decode_strings,
+    plan_shards,
+)
+
+
+def test_reader_column_info(sas_file_1):
+    with SasReader(sas_file_1) as reader:
+        columns = reader.column_info
+
+    assert [x.name for x in columns] == ["integer_row", "text_row", "float_row", "date_row"]
+    assert [x.type for x in columns] == ["number", "string", "number", "number"]
+    assert columns[3].is_date
+    assert not columns[0].is_date
+
+
+def test_reader_column_info_xpt(xpt_file_1):
+    with SasReader(xpt_file_1) as reader:
+        columns = reader.column_info
+
+    assert columns == [
+        Column("irow", "number", length=8),
+        Column("trow", "string", length=14),
+        Column("frow", "number", length=8),
+    ]
+
+
+def test_reader_chunks(sas_file_1):
+    with SasReader(sas_file_1) as reader:
+        chunks = list(reader.iter_chunks(2))
+
+    assert [len(x) for x in chunks] == [2, 2, 1]
+    assert chunks[0]["text_row"].tolist() == ["Some text", "Some more text"]
+
+
+def test_reader_columns_where(sas_file_1):
+    with SasReader(sas_file_1, ["float_row", "integer_row"], "`text_row` == 'Text'") as reader:
+        chunks = list(reader.iter_chunks(2))
+
+    assert len(chunks) == 1
+    assert chunks[0].columns.tolist() == ["float_row", "integer_row"]
+    assert chunks[0]["integer_row"].tolist() == [4.0]
+
+
+def test_reader_where_no_rows(xpt_file_1):
+    with SasReader(xpt_file_1, where="irow > 10") as reader:
+        chunks = list(reader.iter_chunks(1))
+
+    assert len(chunks) == 1
+    assert chunks[0].empty
+    assert chunks[0].columns.tolist() == ["irow", "trow", "frow"]
+
+
+@pytest.mark.parametrize(
+    "fixture_name", ["sas_file_1", "sas_file_2", "sas_file_3", "xpt_file_1", "xpt_file_2"]
+)
+def test_reader_memory_map(fixture_name, request):
+    sas_file = request.getfixturevalue(fixture_name)
+    with SasReader(sas_file) as reader:
+        expected = pd.concat(reader.iter_chunks(2), ignore_index=True)
+
+    with SasReader(sas_file, memory_map=True) as reader:
+        got = pd.concat(reader.iter_chunks(2), ignore_index=True)
+        mapping = reader._mmap
+
+    pd.testing.assert_frame_equal(got, expected)
+    assert mapping is not None
+    assert mapping.closed
+
+
+class _Pipe(io.RawIOBase):
+    # Returns at most a few bytes from each read and can't seek, like a pipe
+    def __init__(self, data):
+        self._data = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._data.read(min(len(buffer), 4096))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def _pipe(data: bytes) -> IO[bytes]:
+    # A raw file has the methods of a binary file the reader uses, but isn't typed as one
+    return cast(IO[bytes], _Pipe(data))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 1000])
+@pytest.mark.parametrize(
+    "fixture_name",
+    ["sas_file_1", "sas_file_2", "sas_file_3", "xpt_file_1", "xpt_file_2", "large_xpt_file"],
+)
+def test_reader_stream(fixture_name, chunk_size, request):
+    sas_file = request.getfixturevalue(fixture_name)
+    with SasReader(sas_file) as reader:
+        expected = pd.concat(reader.iter_chunks(chunk_size), ignore_index=True)
+    input_format = sas_file.suffix[1:]
+
+    stream = _pipe(sas_file.read_bytes())
+    with SasReader(sas_file, input_format=input_format, stream=stream) as reader:
+        got = pd.concat(reader.iter_chunks(chunk_size), ignore_index=True)
+
+    pd.testing.assert_frame_equal(got, expected)
+
+
+def test_reader_stream_requires_format(xpt_file_1):
+    with pytest.raises(ValueError, match="The input format is required to read a stream"):
+        SasReader(xpt_file_1, stream=_pipe(xpt_file_1.read_bytes()))
+
+
+def test_reader_memory_map_bad_file(bad_sas_file):
+    with pytest.raises(Exception):
+        SasReader(bad_sas_file, memory_map=True)
+
+
+def test_plan_shards_sas7bdat(multi_page_sas_file):
+    shards = plan_shards(multi_page_sas_file, 3)
+
+    assert shards == [Shard(0, 25, 0), Shard(25, 65, 2), Shard(65, 85, 4)]
+
+
+def test_plan_shards_sas7bdat_aligned(multi_page_sas_file):
+    shards = plan_shards(multi_page_sas_file, 3, align=10)
+
+    assert shards == [Shard(0, 30, 0), Shard(30, 50, 2, 5), Shard(50, 85, 3, 5)]
+
+
+def test_plan_shards_single_page(sas_file_1):
+    assert plan_shards(sas_file_1, 4) == [Shard(0, 5, 0)]
+
+
+def test_plan_shards_xpt(xpt_file_2):
+    assert plan_shards(xpt_file_2, 2) == [Shard(0, 1), Shard(1, 3)]
+    assert plan_shards(xpt_file_2, 5) == [Shard(0, 1), Shard(1, 2), Shard(2, 3)]
+
+
+def test_plan_shards_xpt_aligned(large_xpt_file):
+    shards = plan_shards(large_xpt_file, 3, align=100)
+
+    assert shards == [Shard(0, 300), Shard(300, 600), Shard(600, 1000)]
+    assert plan_shards(large_xpt_file, 3, align=1_000) == [Shard(0, 1000)]
+
+
+@pytest.mark.parametrize("fixture_name", ["multi_page_sas_file", "large_xpt_file"])
+@pytest.mark.parametrize("shards", [2, 3, 8])
+@pytest.mark.parametrize("memory_map", [False, True])
+@pytest.mark.parametrize("align", [1, 10])
+def test_reader_seek(fixture_name, shards, memory_map, align, request):
+    sas_file = request.getfixturevalue(fixture_name)
+    with SasReader(sas_file) as reader:
+        expected = pd.concat(reader.iter_chunks(100), ignore_index=True)
+
+    parts = []
+    for shard in plan_shards(sas_file, shards, align=align):
+        with SasReader(sas_file, memory_map=memory_map) as reader:
+            reader.seek(shard)
+            parts.append(pd.concat(reader.iter_chunks(7), ignore_index=True))
+
+    pd.testing.assert_frame_equal(pd.concat(parts, ignore_index=True), expected)
+
+
+@pytest.mark.parametrize(
+    "fixture_name, row",
+    [
+        ("multi_page_sas_file", 0),
+        ("multi_page_sas_file", 4),
+        ("multi_page_sas_file", 5),
+        ("multi_page_sas_file", 46),
+        ("multi_page_sas_file", 84),
+        ("multi_page_sas_file", 85),
+        ("large_xpt_file", 1),
+        ("large_xpt_file", 999),
+        ("large_xpt_file", 2000),
+        ("sas_file_1", 3),
+    ],
+)
+def test_reader_seek_row(fixture_name, row, request):
+    sas_file = request.getfixturevalue(fixture_name)
+    with SasReader(sas_file) as reader:
+        expected = pd.concat(reader.iter_chunks(100), ignore_index=True)
+
+    with SasReader(sas_file) as reader:
+        reader.seek_row(row)
+        got = pd.concat(reader.iter_chunks(7), ignore_index=True)
+        assert reader.position == len(expected)
+
+    pd.testing.assert_frame_equal(got, expected[row:].reset_index(drop=True), check_dtype=False)
+
+
+def test_reader_seek_without_page_attributes(multi_page_sas_file, monkeypatch):
+    # A pandas version without the private attributes the pages are counted with
+    with SasReader(multi_page_sas_file) as reader:
+        expected = pd.concat(reader.iter_chunks(100), ignore_index=True)
+    monkeypatch.setattr(reader_module, "_PAGE_ATTRIBUTES", ("_not_an_attribute",))
+
+    assert plan_shards(multi_page_sas_file, 3) == [Shard(0, 85)]
+    with SasReader(multi_page_sas_file) as reader:
+        reader.seek(Shard(25, 65, 2))
+        got = pd.concat(reader.iter_chunks(7), ignore_index=True)
+    with SasReader(multi_page_sas_file) as reader:
+        reader.seek_row(46)
+        resumed = pd.concat(reader.iter_chunks(7), ignore_index=True)
+
+    pd.testing.assert_frame_equal(got, expected[25:65].reset_index(drop=True), check_dtype=False)
+    pd.testing.assert_frame_equal(resumed, expected[46:].reset_index(drop=True), check_dtype=False)
+
+
+@pytest.mark.parametrize("buffer_chunks", [1, 3])
+@pytest.mark.parametrize("where", [None, "C00003 > 0"])
+def test_reader_pipelined(large_xpt_file, buffer_chunks, where):
+    with SasReader(large_xpt_file, where=where) as reader:
+        expected = list(reader.iter_chunks(64))
+
+    with SasReader(large_xpt_file, where=where) as reader:
+        got = []
+        positions = []
+        for chunk in reader.iter_chunks(64, buffer_chunks):
+            got.append(chunk)
+            positions.append(reader.position)
+
+    assert len(got) == len(expected)
+    for x, y in zip(got, expected):
+        pd.testing.assert_frame_equal(x, y)
+    if where is None:
+        assert positions == [min(64 * (i + 1), 1000) for i in range(len(got))]
+
+
+def test_reader_pipelined_stops_early(large_xpt_file):
+    with SasReader(large_xpt_file) as reader:
+        chunks = reader.iter_chunks(10, buffer_chunks=2)
+        assert len(next(chunks)) == 10
+        chunks.close()
+
+        assert reader.position == 10
+
+
+def test_reader_unknown_columns(sas_file_1):
+    with pytest.raises(SelectionError, match="Columns not found in file1.sas7bdat: a, b"):
+        SasReader(sas_file_1, ["a", "integer_row", "b"])
+
+
+@pytest.mark.parametrize("where", ["a > 1", "integer_row >", "integer_row = 1"])
+def test_reader_invalid_where(sas_file_1, where):
+    with pytest.raises(SelectionError, match="Invalid where expression"):
+        SasReader(sas_file_1, ["text_row"], where=where)
+
+
+def test_decode_strings_selected_columns():
+    import pandas as pd
+
+    df = pd.DataFrame({"a": [b"x", None], "b": [b"y", b"z"], "c": [None, None]})
+
+    got = decode_strings(df, ["a", "c"])
+
+    assert got["a"].tolist() == ["x", None]
+    assert got["b"].tolist() == [b"y", b"z"]
+    assert df["a"].tolist() == [b"x", None]
+
+
+def test_decode_strings_categorical():
+    df = pd.DataFrame({"a": [b"x", None, b"y", b"x"], "b": [1.0, 2.0, 3.0, 4.0]})
+
+    got = decode_strings(df, categorical=True)
+
+    assert isinstance(got["a"].dtype, pd.CategoricalDtype)
+    assert list(got["a"].cat.categories) == ["x", "y"]
+    assert [None if pd.isna(x) else x for x in got["a"]] == ["x", None, "y", "x"]
+    assert got["b"].tolist() == [1.0, 2.0, 3.0, 4.0]
+
+
+def test_reader_row_count(sas_file_1, xpt_file_1):
+    with SasReader(sas_file_1) as sas_reader, SasReader(xpt_file_1) as xpt_reader:
+        assert sas_reader.row_count == len(pd.read_sas(sas_file_1))
+        assert xpt_reader.row_count == len(pd.read_sas(xpt_file_1))
@@ -0,0 +1,165 @@
+import io
+import json
+import signal
+import socket
+import subprocess
+import sys
+import threading
+
+import pandas as pd
+import pytest
+
+from sas7bdat_converter_cli.main import app
+from sas7bdat_converter_cli.server import Job, JobServer
+
+
+def _job(job_id, command, file_path, export_file, **options):
+    job = {
+        "id": job_id,
+        "command": command,
+        "file_path": str(file_path),
+        "export_file": str(export_file),
+    }
+    if options:
+        job["options"] = options
+    return json.dumps(job)
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_serve_stream(jobs, xpt_file_1, xpt_file_2, bad_xpt_file, xpt_expected_dir, tmp_path):
+    lines = [
+        _job(1, "to-csv", xpt_file_1, tmp_path / "file1.csv"),
+        "not json",
+        _job(3, "to-json", xpt_file_2, tmp_path / "file2.json", columns=["trow"]),
+        _job(4, "to-csv", bad_xpt_file, tmp_path / "bad.csv"),
+        "",
+    ]
+    input = io.BytesIO("\n".join(lines).encode("utf-8"))
+    output = io.BytesIO()
+
+    with JobServer(jobs) as server:
+        server.serve_stream(input, output)
+
+    results = {x["id"]: x for x in map(json.loads, output.getvalue().decode().splitlines())}
+    assert len(results) == 4
+    assert results[1]["status"] == "converted"
+    assert results[1]["rows"] == 2
+    assert (tmp_path / "file1.csv").read_text() == (xpt_expected_dir / "file1.csv").read_text()
+    assert results[None]["status"] == "failed"
+    assert results[None]["error"].startswith("Invalid json")
+    assert results[3]["status"] == "converted"
+    assert results[3]["columns"] == 1
+    assert results[4]["status"] == "failed"
+
+
+@pytest.mark.parametrize(
+    "job, error",
+    [
+        ("[]", "A job must be a json object"),
+        ('{"command": "to-csv", "file_path": "a.xpt"}', "A job must include export_file"),
+        (_job(1, "to-yaml", "a.xpt", "a.yaml"), "Unknown command: to-yaml"),
+        (_job(1, "to-csv", "a.txt", "a.csv"), "File must be either a sas7bdat file or a xpt file"),
+        (_job(1, "to-csv", "a.xpt", "a.json"), "The export file must be a csv file"),
+        (_job(1, "to-csv", "a.xpt", "a.csv", size=1), "Unknown options: size"),
+        (
+            '{"command": "to-csv", "file_path": "a.xpt", "export_file": "a.csv", "options": 1}',
+            "options must be a json object",
+        ),
+    ],
+)
+def test_job_invalid(job, error):
+    with pytest.raises(ValueError, match=error):
+        Job.from_json(job)
+
+
+def test_serve_stdin(xpt_file_1, test_runner, tmp_path):
+    input = _job("a", "to-parquet", xpt_file_1, tmp_path / "file1.parquet", chunk_size=1) + "\n"
+
+    result = test_runner.invoke(app, ["serve"], input=input, catch_exceptions=False)
+
+    assert result.exit_code == 0
+    assert json.loads(result.stdout)["id"] == "a"
+    assert (tmp_path / "file1.parquet").exists()
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Windows has no Unix sockets")
+def test_serve_socket(xpt_file_1, xpt_file_2, tmp_path):
+    socket_path = tmp_path / "serve.sock"
+    with JobServer() as server:
+        with server.socket_server(socket_path) as unix_server:
+            thread = threading.Thread(target=unix_server.serve_forever)
+            thread.start()
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+                    client.connect(str(socket_path))
+                    for i, file_path in enumerate([xpt_file_1, xpt_file_2]):
+                        job = _job(i, "to-csv", file_path, tmp_path / f"{file_path.stem}.csv")
+                        client.sendall(job.encode("utf-8") + b"\n")
+                    client.shutdown(socket.SHUT_WR)
+                    with client.makefile("rb") as f:
+                        results = [json.loads(x) for x in f]
+            finally:
+                unix_server.shutdown()
+                thread.join()
+
+    assert sorted(x["id"] for x in results) == [0, 1]
+    assert all(x["status"] == "converted" for x in results)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Windows has no Unix sockets")
+def test_serve_socket_cli(xpt_file_1, tmp_path):
+    socket_path = tmp_path / "serve.sock"
+    process = subprocess.Popen(
+        [sys.executable, "-m", "sas7bdat_converter_cli", "serve", "--socket", str(socket_path)],
+        stderr=subprocess.PIPE,
+    )
+    assert process.stderr is not None
+    try:
+        assert b"Listening on" in process.stderr.readline()
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(str(socket_path))
+            job = _job(1, "to-csv", xpt_file_1, tmp_path / "file1.csv")
+            client.sendall(job.encode("utf-8") + b"\n")
+            client.shutdown(socket.SHUT_WR)
+            with client.makefile("rb") as f:
+                result = json.loads(f.readline())
+    finally:
+        process.send_signal(signal.SIGINT)
+        process.wait(timeout=30)
+        process.stderr.close()
+
+    assert result["status"] == "converted"
+    assert not socket_path.exists()
+
+
+def test_serve_socket_windows(test_runner, tmp_path, monkeypatch):
+    monkeypatch.setattr(sys, "platform", "win32")
+
+    result = test_runner.invoke(app, ["serve", "--socket", str(tmp_path / "serve.sock")])
+
+    assert result.exit_code == 1
+    assert "--socket isn't supported on Windows" in result.output
+
+
+def test_serve_ndjson_job(xpt_file_1, tmp_path):
+    job = json.loads(_job(1, "to-json", xpt_file_1, tmp_path / "file1.ndjson.gz", compress="gzip"))
+    job["ndjson"] = True
+    output = io.BytesIO()
+
+    with JobServer() as server:
+        server.serve_stream(io.BytesIO(json.dumps(job).encode("utf-8")), output)
+
+    assert json.loads(output.getvalue())["status"] == "converted"
+    assert len(pd.read_json(tmp_path / "file1.ndjson.gz", lines=True)) == 2
+
+
+def test_serve_compress_unsupported(xpt_file_1, tmp_path):
+    job = _job(1, "to-parquet", xpt_file_1, tmp_path / "file1.parquet.gz", compress="gzip")
+    output = io.BytesIO()
+
+    with JobServer() as server:
+        server.serve_stream(io.BytesIO(job.encode("utf-8")), output)
+
+    assert (
+        json.loads(output.getvalue())["error"] == "Compression is not supported for parquet files"
+    )
@@ -0,0 +1,36 @@
+import subprocess
+import sys
+import time
+
+import pytest
+
+# Generous enough for a slow CI machine, importing the backends is checked separately
+STARTUP_BUDGET_SECONDS = 1.0
+
+HEAVY_MODULES = ("numpy", "pandas", "pyarrow", "openpyxl", "sas7bdat_converter")
+
+
+def test_main_does_not_import_backends():
+    code = (
+        "import sys\n"
+        "import sas7bdat_converter_cli.main\n"
+        "print(' '.join(sorted({x.split('.')[0] for x in sys.modules})))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+
+    assert set(result.stdout.split()).isdisjoint(HEAVY_MODULES)
+
+
+@pytest.mark.parametrize("args", [["--version"], ["--help"], ["to-csv", "--help"]])
+def test_startup_time(args):
+    timings = []
+    for _ in range(3):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-m", "sas7bdat_converter_cli", *args], capture_output=True, check=True
+        )
+        timings.append(time.perf_counter() - start)
+
+    assert min(timings) < STARTUP_BUDGET_SECONDS
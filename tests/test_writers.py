@@ -0,0 +1,230 @@
+import csv
+import datetime
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from sas7bdat_converter_cli import writers
+from sas7bdat_converter_cli.options import ConversionOptions
+from sas7bdat_converter_cli.reader import Column
+from sas7bdat_converter_cli.writers import (
+    ArrowWriter,
+    ChunkWriter,
+    CsvWriter,
+    ExcelWriter,
+    ParquetWriter,
+    XmlWriter,
+    arrow_schema,
+    to_arrow,
+)
+
+
+def test_chunk_writer_missing_write(tmp_path):
+    class NoWrite(ChunkWriter):
+        def close(self) -> None:
+            pass
+
+    with pytest.raises(TypeError, match="abstract method"):
+        NoWrite(tmp_path / "out", [], ConversionOptions())  # type: ignore[abstract]
+
+
+def test_csv_writer_aligned_chunks_match_full_write(tmp_path):
+    rows = 6_000
+    dates = pd.Series(pd.Timestamp("2020-01-01") + pd.to_timedelta(np.arange(rows) % 500, unit="D"))
+    # Only the last rows have a time so formatting differs depending on where the file is split
+    dates[5_000:] = dates[5_000:] + pd.Timedelta(hours=1)
+    df = pd.DataFrame({f"col{i}": np.arange(rows, dtype=float) for i in range(48)})
+    df["date"] = dates
+    df["text"] = "a"
+    full_file = tmp_path / "full.csv"
+    chunked_file = tmp_path / "chunked.csv"
+    df.to_csv(full_file, quoting=csv.QUOTE_NONNUMERIC, index=False)
+
+    with CsvWriter(chunked_file, [], ConversionOptions()) as writer:
+        chunk_size = writer.align_chunk_size(1_500, len(df.columns))
+        for i in range(0, rows, chunk_size):
+            writer.write(df.iloc[i : i + chunk_size])
+
+    assert chunk_size == 2_000
+    assert chunked_file.read_bytes() == full_file.read_bytes()
+
+
+def test_to_arrow_converts_xpt_dates():
+    columns = [
+        Column("date", "number", "DATE"),
+        Column("datetime", "number", "DATETIME"),
+        Column("text", "string"),
+    ]
+    chunk = pd.DataFrame(
+        {"date": [0.0, 21915.0, np.nan], "datetime": [0.0, 1.5, np.nan], "text": [np.nan] * 3}
+    )
+
+    table = to_arrow(chunk, columns, arrow_schema(columns))
+
+    assert table.column("date").to_pylist() == [
+        datetime.date(1960, 1, 1),
+        datetime.date(2020, 1, 1),
+        None,
+    ]
+    assert table.column("datetime").to_pylist() == [
+        datetime.datetime(1960, 1, 1),
+        datetime.datetime(1960, 1, 1, 0, 0, 1, 500000),
+        None,
+    ]
+    assert table.column("text").type == pa.string()
+
+
+def test_excel_writer_splits_sheets(tmp_path, monkeypatch):
+    monkeypatch.setattr(ExcelWriter, "max_sheet_rows", 3)
+    export_file = tmp_path / "split.xlsx"
+    columns = [Column("number", "number"), Column("text", "string")]
+    df = pd.DataFrame(
+        {"number": [1.0, np.nan, 3.0, 4.0, 5.0], "text": ["a", "b", np.nan, "d", "e"]}
+    )
+
+    with ExcelWriter(export_file, columns, ConversionOptions()) as writer:
+        writer.write(df.iloc[:3])
+        writer.write(df.iloc[3:])
+
+    sheets = pd.read_excel(export_file, sheet_name=None, engine="openpyxl")
+    assert list(sheets) == ["Sheet1", "Sheet2", "Sheet3"]
+    assert [len(x) for x in sheets.values()] == [2, 2, 1]
+    pd.testing.assert_frame_equal(pd.concat(sheets.values(), ignore_index=True), df)
+
+
+def test_excel_writer_no_rows(tmp_path):
+    export_file = tmp_path / "empty.xlsx"
+    columns = [Column("number", "number"), Column("text", "string")]
+
+    with ExcelWriter(export_file, columns, ConversionOptions()):
+        pass
+
+    assert list(pd.read_excel(export_file, engine="openpyxl").columns) == ["number", "text"]
+
+
+def _write_xml(export_file, chunks, options):
+    with XmlWriter(export_file, [], options) as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+
+
+def test_xml_writer_chunks_match_one_write(monkeypatch, tmp_path):
+    monkeypatch.setattr(writers, "_XML_ROWS_PER_WRITE", 3)
+    df = pd.DataFrame({"number": np.arange(10, dtype=float), "text": [f"<{i}>" for i in range(10)]})
+    one_file = tmp_path / "one.xml"
+    chunked_file = tmp_path / "chunked.xml"
+
+    _write_xml(one_file, [df], ConversionOptions())
+    _write_xml(chunked_file, [df.iloc[:4], df.iloc[4:4], df.iloc[4:]], ConversionOptions())
+
+    assert chunked_file.read_bytes() == one_file.read_bytes()
+    root = ET.parse(one_file).getroot()
+    assert [x.findtext("text") for x in root] == [f"<{i}>" for i in range(10)]
+
+
+def test_xml_writer_attributes(tmp_path):
+    df = pd.DataFrame({"id": [1, 2], "text": ['a "b" & <c>', "line\nbreak\ttab"]})
+    export_file = tmp_path / "out.xml"
+    options = ConversionOptions(xml_root="dataset", xml_row="row", xml_attributes=True)
+
+    _write_xml(export_file, [df], options)
+
+    root = ET.parse(export_file).getroot()
+    assert root.tag == "dataset"
+    assert [x.attrib for x in root.iter("row")] == [
+        {"id": "1", "text": 'a "b" & <c>'},
+        {"id": "2", "text": "line\nbreak\ttab"},
+    ]
+
+
+@pytest.mark.parametrize("options", [{"xml_root": "1root"}, {"xml_row": "a row"}])
+def test_xml_writer_invalid_name(options, tmp_path):
+    with pytest.raises(ValueError, match="is not a valid XML element name"):
+        XmlWriter(tmp_path / "out.xml", [], ConversionOptions(**options))
+
+    assert not (tmp_path / "out.xml").exists()
+
+
+def test_xml_writer_categorical_escapes(tmp_path):
+    text = ["<a>", "b & c", np.nan, "<a>"]
+    plain_file = tmp_path / "plain.xml"
+    categorical_file = tmp_path / "categorical.xml"
+
+    _write_xml(plain_file, [pd.DataFrame({"text": text})], ConversionOptions())
+    df = pd.DataFrame({"text": pd.Categorical(text)})
+    _write_xml(categorical_file, [df], ConversionOptions())
+
+    assert categorical_file.read_bytes() == plain_file.read_bytes()
+
+
+def test_arrow_writer_grows_dictionaries(tmp_path):
+    columns = [Column("text", "string")]
+    chunks: list[list[str | None]] = [["b", "a", None], ["c", "a"], ["d"]]
+    export_file = tmp_path / "out.arrow"
+
+    with ArrowWriter(export_file, columns, ConversionOptions(dictionary_encode=True)) as writer:
+        for chunk in chunks:
+            writer.write(pd.DataFrame({"text": pd.Categorical(chunk)}))
+
+    with pa.ipc.open_file(export_file) as reader:
+        assert reader.schema.field("text").type == pa.dictionary(pa.int32(), pa.string())
+        table = reader.read_all()
+    assert table.column("text").to_pylist() == ["b", "a", None, "c", "a", "d"]
+    assert table.column("text").chunks[-1].dictionary.to_pylist() == ["a", "b", "c", "d"]
+
+
+def _read_binary(file_path):
+    if file_path.suffix == ".parquet":
+        return pq.read_table(file_path)
+    with pa.ipc.open_file(file_path) as reader:
+        return reader.read_all()
+
+
+@pytest.mark.parametrize(
+    "writer_class, suffix", [(ArrowWriter, ".arrow"), (ParquetWriter, ".parquet")]
+)
+def test_binary_writer_mostly_unique_strings(writer_class, suffix, tmp_path, monkeypatch):
+    monkeypatch.setattr(writers, "_DICTIONARY_MAX_VALUES", 2)
+    columns = [Column("unique", "string"), Column("repeated", "string")]
+    chunks = [
+        pd.DataFrame({"unique": ["a", "b", "c", "d"], "repeated": ["x", "y", "x", "x"]}),
+        pd.DataFrame({"unique": ["a", "a"], "repeated": ["z", "x"]}),
+    ]
+    export_file = tmp_path / f"out{suffix}"
+
+    with writer_class(export_file, columns, ConversionOptions(dictionary_encode=True)) as writer:
+        for chunk in chunks:
+            writer.write(chunk.astype("category"))
+
+    table = _read_binary(export_file)
+    assert table.schema.field("unique").type == pa.string()
+    assert pa.types.is_dictionary(table.schema.field("repeated").type)
+    assert table.column("unique").to_pylist() == ["a", "b", "c", "d", "a", "a"]
+    assert table.column("repeated").to_pylist() == ["x", "y", "x", "x", "z", "x"]
+
+
+@pytest.mark.parametrize(
+    "writer_class, suffix", [(ArrowWriter, ".arrow"), (ParquetWriter, ".parquet")]
+)
+def test_binary_writer_concat_parts_with_different_types(
+    writer_class, suffix, tmp_path, monkeypatch
+):
+    # Each part decides from its own first chunk whether the column is a dictionary
+    monkeypatch.setattr(writers, "_DICTIONARY_MAX_VALUES", 2)
+    columns = [Column("text", "string")]
+    parts = [tmp_path / f"part0{suffix}", tmp_path / f"part1{suffix}"]
+    values = [["a", "a", "b", "a"], ["c", "d", "e", "f"]]
+    for part, chunk in zip(parts, values):
+        with writer_class(part, columns, ConversionOptions(dictionary_encode=True)) as writer:
+            writer.write(pd.DataFrame({"text": pd.Categorical(chunk)}))
+    export_file = tmp_path / f"out{suffix}"
+
+    writer_class.concat(parts, export_file, ConversionOptions(dictionary_encode=True))
+
+    table = _read_binary(export_file)
+    assert pa.types.is_dictionary(table.schema.field("text").type)
+    assert table.column("text").to_pylist() == values[0] + values[1]
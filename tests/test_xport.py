@@ -0,0 +1,133 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sas7bdat_converter_cli.bench import DatasetSpec, _ieee_to_ibm, synthetic_dataframe, write_xpt
+from sas7bdat_converter_cli.reader import StreamInput, map_file
+from sas7bdat_converter_cli.xport import Source, XportFile, ibm_to_ieee
+
+
+def _read_all(xport_file, chunk_size=1_000):
+    chunks = []
+    while True:
+        try:
+            chunks.append(xport_file.read(chunk_size))
+        except StopIteration:
+            break
+    xport_file.close()
+    return pd.concat(chunks)
+
+
+@pytest.mark.parametrize("fixture_name", ["xpt_file_1", "xpt_file_2", "large_xpt_file"])
+@pytest.mark.parametrize("source", ["file", "mmap", "stream"])
+def test_xport_file_matches_pandas(fixture_name, source, request):
+    xpt_file = request.getfixturevalue(fixture_name)
+    opened: Source
+    if source == "file":
+        opened = open(xpt_file, "rb")
+    elif source == "mmap":
+        opened = map_file(xpt_file)
+    else:
+        opened = StreamInput(io.BytesIO(xpt_file.read_bytes()))
+
+    got = _read_all(XportFile(opened), chunk_size=3)
+
+    pd.testing.assert_frame_equal(got, pd.read_sas(xpt_file))
+
+
+def test_xport_file_version_8(tmp_path):
+    df = pd.DataFrame(
+        {
+            "a_very_long_variable_name": [1.5, np.nan, -2.0],
+            "text": ["x", "", "a longer value"],
+        }
+    )
+    df.attrs["labels"] = {"a_very_long_variable_name": "A label " * 10, "text": "Text"}
+    v5_file, v8_file = tmp_path / "v5.xpt", tmp_path / "v8.xpt"
+    write_xpt(df, v5_file, dataset_name="A_LONG_DATASET_NAME", version=5)
+    write_xpt(df, v8_file, dataset_name="A_LONG_DATASET_NAME", version=8)
+
+    v5, v8 = XportFile(open(v5_file, "rb")), XportFile(open(v8_file, "rb"))
+
+    assert (v5.version, v8.version) == (5, 8)
+    assert (v5.name, v8.name) == ("A_LONG_D", "A_LONG_DATASET_NAME")
+    assert [x.name for x in v5.variables] == ["a_very_l", "text"]
+    assert [x.name for x in v8.variables] == ["a_very_long_variable_name", "text"]
+    assert v5.variables[0].label == ("A label " * 10)[:40].strip()
+    assert [x.label for x in v8.variables] == [("A label " * 10).strip(), "Text"]
+    got = _read_all(v8)
+    assert got["a_very_long_variable_name"].tolist()[::2] == [1.5, -2.0]
+    assert got["text"].tolist() == [b"x", b"", b"a longer value"]
+    pd.testing.assert_frame_equal(_read_all(v5).set_axis(got.columns, axis=1), got)
+
+
+def test_ibm_to_ieee():
+    values = np.array([0.0, 1.0, -1.0, 100.0, 0.1, 1e-70, -3.5e70, 123456789.123456])
+    ibm = np.concatenate(
+        [_ieee_to_ibm(values), np.array([b".", b"A", b"_", b"\x80"], dtype="S8")]
+    ).view(">u8")
+
+    got = ibm_to_ieee(ibm)
+
+    np.testing.assert_array_equal(got[:8], values)
+    assert np.isnan(got[8:11]).all()
+    assert got[11] == 0.0
+
+
+def test_ibm_to_ieee_truncated():
+    ibm = _ieee_to_ibm(np.array([1.0, 0.5, -1024.0]))
+
+    got = ibm_to_ieee(ibm.view(np.uint8).reshape(3, 8)[:, :3], length=3)
+
+    np.testing.assert_array_equal(got, [1.0, 0.5, -1024.0])
+
+
+def test_xport_file_blank_rows_before_padding(tmp_path):
+    # 16 byte rows, the last 80 byte record holds rows 5 and 6 and 48 blanks of padding. pandas
+    # also takes the blank text of row 5 as padding and drops row 6.
+    df = pd.DataFrame({"number": np.arange(7, dtype=float), "text": ["abcdefgh"] * 7})
+    df.loc[5, "text"] = ""
+    xpt_file = tmp_path / "short_rows.xpt"
+    write_xpt(df, xpt_file)
+
+    got = _read_all(XportFile(open(xpt_file, "rb")))
+
+    assert got["number"].tolist() == list(range(7))
+    assert got["text"].tolist()[5] == b""
+
+
+def test_xport_file_seek(large_xpt_file):
+    expected = pd.read_sas(large_xpt_file)
+    xport_file = XportFile(map_file(large_xpt_file))
+
+    xport_file.seek(990)
+
+    pd.testing.assert_frame_equal(_read_all(xport_file), expected.iloc[990:])
+
+
+@pytest.mark.parametrize(
+    "data, message",
+    [
+        (b"", "Header record is not an XPORT file."),
+        (b"**COMPRESSED** **COMPRESSED**".ljust(80), "indicates a CPORT file"),
+    ],
+)
+def test_xport_file_invalid(data, message):
+    with pytest.raises(ValueError, match=message):
+        XportFile(io.BytesIO(data))
+
+
+def test_xport_file_synthetic_round_trip(tmp_path):
+    df = synthetic_dataframe(DatasetSpec(rows=2_000, columns=6, string_ratio=0.5))
+    xpt_file = tmp_path / "synthetic.xpt"
+    write_xpt(df, xpt_file, version=8)
+
+    got = _read_all(XportFile(open(xpt_file, "rb")), chunk_size=999)
+
+    for name in df.columns:
+        if df[name].dtype == object:
+            assert got[name].str.decode("latin-1").tolist() == df[name].tolist()
+        else:
+            np.testing.assert_array_equal(got[name].to_numpy(), df[name].to_numpy())